@@ -46,10 +46,13 @@ except Exception:  # pragma: no cover
             pass
 
 from core.configuration.configuration import get_app_version
+from core.managers.cache_manager import CacheManager
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
 from core.managers.module_manager import ModuleManager
+from core.managers.storage_manager import StorageManager
+from core.managers.task_manager import TaskManager
 
 # Load environment variables
 load_dotenv()
@@ -70,6 +73,18 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Initialize the fragment cache (Redis when REDIS_URL is set, in-process otherwise)
+    cache_manager = CacheManager(app)
+    cache_manager.init_cache()
+
+    # Initialize the storage backend for uploaded files (content-addressed local store or S3)
+    storage_manager = StorageManager(app)
+    storage_manager.init_storage()
+
+    # Initialize the background task runner for pipeline stages (inline when TASKS_EAGER is set)
+    task_manager = TaskManager(app)
+    task_manager.init_tasks()
+
     # Register modules
     module_manager = ModuleManager(app)
     module_manager.register_modules()
@@ -90,6 +105,11 @@ def create_app(config_name="development"):
     except Exception:
         pass
 
+    # Resume publication jobs a stopped process left behind, from the first request on and then periodically
+    from app.modules.dataset.services_publication import init_publication_sweeper
+
+    init_publication_sweeper(app)
+
     # Set up logging
     logging_manager = LoggingManager(app)
     logging_manager.setup_logging()
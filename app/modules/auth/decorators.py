@@ -0,0 +1,22 @@
+from functools import wraps
+
+from flask import g, request
+
+from app.modules.auth.services import ApiTokenService
+
+
+def token_required(f):
+    """Authenticate the request with an API token (``Authorization: Bearer <token>``).
+
+    The token's owner is available as ``g.api_user`` inside the view.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = ApiTokenService().authenticate(request.headers.get("Authorization"))
+        if user is None:
+            return {"message": "A valid API token is required"}, 401, {"WWW-Authenticate": "Bearer"}
+        g.api_user = user
+        return f(*args, **kwargs)
+
+    return decorated_function
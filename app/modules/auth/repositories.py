@@ -1,4 +1,6 @@
-from app.modules.auth.models import User
+from datetime import datetime, timezone
+
+from app.modules.auth.models import ApiToken, User
 from core.repositories.BaseRepository import BaseRepository
 
 
@@ -19,3 +21,22 @@ class UserRepository(BaseRepository):
 
     def get_by_email(self, email: str):
         return self.model.query.filter_by(email=email).first()
+
+
+class ApiTokenRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(ApiToken)
+
+    def get_active_by_hash(self, token_hash: str):
+        return self.model.query.filter_by(token_hash=token_hash, revoked_at=None).first()
+
+    def get_by_user(self, user_id: int) -> list[ApiToken]:
+        return self.model.query.filter_by(user_id=user_id).order_by(self.model.created_at.desc()).all()
+
+    def revoke(self, user_id: int, token_id: int) -> bool:
+        token = self.model.query.filter_by(id=token_id, user_id=user_id, revoked_at=None).first()
+        if token is None:
+            return False
+        token.revoked_at = datetime.now(timezone.utc)
+        self.session.commit()
+        return True
@@ -1,13 +1,14 @@
-from flask import redirect, render_template, request, url_for
-from flask_login import current_user, login_user, logout_user
+from flask import jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
 
 from app.modules.auth import auth_bp
 from app.modules.auth.forms import LoginForm, SignupForm
-from app.modules.auth.services import AuthenticationService
+from app.modules.auth.services import ApiTokenService, AuthenticationService
 from app.modules.profile.services import UserProfileService
 
 authentication_service = AuthenticationService()
 user_profile_service = UserProfileService()
+api_token_service = ApiTokenService()
 
 
 @auth_bp.route("/signup/", methods=["GET", "POST"])
@@ -52,3 +53,29 @@ def login():
 def logout():
     logout_user()
     return redirect(url_for("public.index"))
+
+
+@auth_bp.route("/api-tokens", methods=["GET"])
+@login_required
+def list_api_tokens():
+    return jsonify({"tokens": [token.to_dict() for token in api_token_service.list_for_user(current_user.id)]})
+
+
+@auth_bp.route("/api-tokens", methods=["POST"])
+@login_required
+def create_api_token():
+    data = request.get_json(silent=True) or {}
+    name = (data.get("name") or request.form.get("name") or "").strip()
+    if not name or len(name) > 120:
+        return jsonify({"message": "A token name of at most 120 characters is required"}), 400
+    token, secret = api_token_service.issue(current_user, name)
+    # The secret is only ever returned here
+    return jsonify(dict(token.to_dict(), token=secret)), 201
+
+
+@auth_bp.route("/api-tokens/<int:token_id>", methods=["DELETE"])
+@login_required
+def revoke_api_token(token_id):
+    if not api_token_service.revoke(current_user.id, token_id):
+        return jsonify({"message": "Token not found"}), 404
+    return jsonify({"message": "Token revoked"})
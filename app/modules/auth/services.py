@@ -1,9 +1,12 @@
+import hashlib
 import os
+import secrets
+from datetime import datetime, timedelta, timezone
 
 from flask_login import current_user, login_user
 
-from app.modules.auth.models import User
-from app.modules.auth.repositories import UserRepository
+from app.modules.auth.models import ApiToken, User
+from app.modules.auth.repositories import ApiTokenRepository, UserRepository
 from app.modules.profile.models import UserProfile
 from app.modules.profile.repositories import UserProfileRepository
 from core.configuration.configuration import uploads_folder_name
@@ -76,3 +79,44 @@ class AuthenticationService(BaseService):
 
     def temp_folder_by_user(self, user: User) -> str:
         return os.path.join(uploads_folder_name(), "temp", str(user.id))
+
+
+class ApiTokenService(BaseService):
+    TOKEN_PREFIX = "ph_"
+    # last_used_at is only written when older than this, so API calls do not all write a row
+    TOUCH_INTERVAL = timedelta(minutes=5)
+
+    def __init__(self):
+        super().__init__(ApiTokenRepository())
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def issue(self, user: User, name: str) -> tuple[ApiToken, str]:
+        """Create a token for ``user``. Returns the record and the secret, which is not stored."""
+        secret = self.TOKEN_PREFIX + secrets.token_urlsafe(32)
+        token = self.create(user_id=user.id, name=name, token_hash=self.hash_token(secret), prefix=secret[:10])
+        return token, secret
+
+    def authenticate(self, authorization: str | None) -> User | None:
+        """User owning the bearer token in an ``Authorization`` header, or None."""
+        if not authorization or not authorization.startswith("Bearer "):
+            return None
+        token = self.repository.get_active_by_hash(self.hash_token(authorization[len("Bearer "):].strip()))
+        if token is None:
+            return None
+        now = datetime.now(timezone.utc)
+        last_used = token.last_used_at
+        if last_used is not None and last_used.tzinfo is None:
+            last_used = last_used.replace(tzinfo=timezone.utc)
+        if last_used is None or now - last_used > self.TOUCH_INTERVAL:
+            token.last_used_at = now
+            self.repository.session.commit()
+        return token.user
+
+    def list_for_user(self, user_id: int) -> list[ApiToken]:
+        return self.repository.get_by_user(user_id)
+
+    def revoke(self, user_id: int, token_id: int) -> bool:
+        return self.repository.revoke(user_id, token_id)
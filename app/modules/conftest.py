@@ -18,6 +18,17 @@ except Exception as exc:  # pragma: no cover - only triggers in minimal envs
     _APP_IMPORT_ERROR = exc
 
 
+@pytest.fixture(scope="session", autouse=True)
+def uploads_dir(tmp_path_factory):
+    """Send everything written under the uploads folder (stored files, sidecars, the users' temp
+    folders) to a temporary directory instead of the repository's ``uploads/``."""
+    path = tmp_path_factory.mktemp("uploads")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("UPLOADS_DIR", str(path))
+        mp.delenv("STORAGE_ROOT", raising=False)
+        yield path
+
+
 @pytest.fixture(scope="session")
 def test_app():
     """Create and configure a new app instance for each test session."""
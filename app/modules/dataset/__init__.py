@@ -8,3 +8,6 @@ dataset_bp = BaseBlueprint("dataset", __name__, template_folder="templates")
 
 api = Api(dataset_bp)
 init_blueprint_api(api)
+
+# Register the ORM listeners that maintain the activity rollups and counters
+from app.modules.dataset import listeners  # noqa: E402,F401
@@ -1,4 +1,12 @@
-from app.modules.dataset.models import DataSet
+import json
+
+from flask import g, request
+from flask_restful import Resource
+
+from app.modules.auth.decorators import token_required
+from app.modules.dataset.models import DataSet, PadelCatalogAggregate
+from app.modules.dataset.services_api import ApiDatasetService
+from app.modules.dataset.services_padel import PadelCatalogService
 from core.resources.generic_resource import create_resource
 from core.serialisers.serializer import Serializer
 
@@ -18,7 +26,62 @@ dataset_serializer = Serializer(dataset_fields, related_serializers={"files": fi
 DataSetResource = create_resource(DataSet, dataset_serializer)
 
 
+class DataSetCollectionResource(DataSetResource):
+    """Dataset list, plus dataset creation for API token holders.
+
+    POST takes either JSON (metadata fields with ``files`` as ``[{"name", "content"}]``) or
+    multipart form data (a ``metadata`` JSON field and one ``files`` part per CSV). Send an
+    ``Idempotency-Key`` header to make retries safe.
+    """
+
+    method_decorators = {"post": [token_required]}
+
+    def post(self):
+        if request.mimetype == "multipart/form-data":
+            try:
+                metadata = json.loads(request.form.get("metadata") or "{}")
+            except ValueError:
+                return {"message": "The metadata field must be a JSON object"}, 400
+            files = [(file.filename, file.stream) for file in request.files.getlist("files")]
+        else:
+            metadata = request.get_json(silent=True)
+            if not isinstance(metadata, dict):
+                return {"message": "Send a JSON object or multipart form data"}, 400
+            metadata = dict(metadata)
+            raw_files = metadata.pop("files", None) or []
+            if not isinstance(raw_files, list) or not all(isinstance(f, dict) for f in raw_files):
+                return {"message": "files must be a list of {\"name\", \"content\"} objects"}, 400
+            files = [(f.get("name"), f.get("content") or "") for f in raw_files]
+        if not isinstance(metadata, dict):
+            return {"message": "The metadata field must be a JSON object"}, 400
+
+        status, body, replayed = ApiDatasetService().create(
+            g.api_user, metadata, files, idempotency_key=request.headers.get("Idempotency-Key")
+        )
+        headers = {"Idempotent-Replayed": "true"} if replayed else {}
+        return body, status, headers
+
+
+class PadelAnalyticsResource(Resource):
+    """Hub-wide padel analytics, read from the precomputed catalog aggregate.
+
+    Query parameters: ``dimension`` (year, tournament or category; all of them by default)
+    and ``limit`` for the tournament and category rankings.
+    """
+
+    def get(self, dimension=None):
+        dimension = dimension or request.args.get("dimension")
+        if dimension and dimension not in PadelCatalogAggregate.DIMENSIONS:
+            return {"message": f"Unknown dimension, use one of {list(PadelCatalogAggregate.DIMENSIONS)}"}, 400
+        limit = min(max(request.args.get("limit", 10, type=int), 1), 100)
+        return PadelCatalogService().get_analytics(dimension=dimension, limit=limit), 200
+
+
 def init_blueprint_api(api):
     """Function to register resources with the provided Flask-RESTful Api instance."""
-    api.add_resource(DataSetResource, "/api/v1/datasets/", endpoint="datasets")
+    api.add_resource(DataSetCollectionResource, "/api/v1/datasets/", endpoint="datasets")
     api.add_resource(DataSetResource, "/api/v1/datasets/<int:id>", endpoint="dataset")
+    api.add_resource(PadelAnalyticsResource, "/api/v1/padel/analytics", endpoint="padel_analytics")
+    api.add_resource(
+        PadelAnalyticsResource, "/api/v1/padel/analytics/<string:dimension>", endpoint="padel_analytics_dimension"
+    )
@@ -0,0 +1,119 @@
+"""ORM listeners that keep ``DSActivityRollup`` and ``DSCounter`` up to date.
+
+They fire on every flush that inserts or deletes a record, a dataset or sets a DOI, whichever
+code path wrote it, and update the hourly/daily buckets and the counters in the same transaction.
+Bulk ``Query.delete()`` calls bypass them; run ``DSCounterService.rebuild_from_records`` afterwards.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import event, func, inspect, select
+
+from app.modules.dataset.models import (
+    ActivityMetric,
+    CounterName,
+    DataSet,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+)
+from app.modules.dataset.repositories import DSActivityRollupRepository, DSCounterRepository
+
+
+def _dataset_owner(connection, dataset_id):
+    if not dataset_id:
+        return None
+    return connection.execute(select(DataSet.user_id).where(DataSet.id == dataset_id)).scalar()
+
+
+@event.listens_for(DSViewRecord, "after_insert")
+def rollup_view(mapper, connection, target):
+    DSCounterRepository.bump_for_dataset(connection, CounterName.DATASET_VIEWS, target.dataset_id)
+    owner_id = _dataset_owner(connection, target.dataset_id)
+    if owner_id:
+        DSActivityRollupRepository.bump(
+            connection, ActivityMetric.VIEWS_RECEIVED, owner_id, target.dataset_id, target.view_date
+        )
+
+
+@event.listens_for(DSDownloadRecord, "after_insert")
+def rollup_download(mapper, connection, target):
+    DSCounterRepository.bump_for_dataset(connection, CounterName.DATASET_DOWNLOADS, target.dataset_id)
+    owner_id = _dataset_owner(connection, target.dataset_id)
+    if owner_id:
+        DSActivityRollupRepository.bump(
+            connection, ActivityMetric.DOWNLOADS_RECEIVED, owner_id, target.dataset_id, target.download_date
+        )
+    if target.user_id and target.dataset_id:
+        DSActivityRollupRepository.bump(
+            connection, ActivityMetric.DOWNLOADS_MADE, target.user_id, target.dataset_id, target.download_date
+        )
+
+
+@event.listens_for(DataSet, "after_insert")
+def rollup_upload(mapper, connection, target):
+    DSActivityRollupRepository.bump(connection, ActivityMetric.UPLOADS, target.user_id, target.id, target.created_at)
+
+    # Datasets can be created with an already published DOI (seeders, imports)
+    doi = connection.execute(
+        select(DSMetaData.dataset_doi).where(DSMetaData.id == target.ds_meta_data_id)
+    ).scalar()
+    if doi:
+        DSCounterRepository.bump(connection, CounterName.SYNCHRONIZED_DATASETS)
+        DSActivityRollupRepository.bump(
+            connection, ActivityMetric.SYNCHRONIZATIONS, target.user_id, target.id, target.created_at
+        )
+
+
+@event.listens_for(DSMetaData, "after_update")
+def rollup_synchronization(mapper, connection, target):
+    history = inspect(target).attrs.dataset_doi.history
+    added, deleted = any(history.added), any(history.deleted)
+    if added == deleted:
+        return
+
+    dataset = connection.execute(
+        select(DataSet.id, DataSet.user_id).where(DataSet.ds_meta_data_id == target.id)
+    ).first()
+    if not dataset:
+        return
+    if deleted:
+        DSCounterRepository.bump(connection, CounterName.SYNCHRONIZED_DATASETS, amount=-1)
+        return
+    DSCounterRepository.bump(connection, CounterName.SYNCHRONIZED_DATASETS)
+    DSActivityRollupRepository.bump(
+        connection, ActivityMetric.SYNCHRONIZATIONS, dataset.user_id, dataset.id, datetime.now(timezone.utc)
+    )
+
+
+@event.listens_for(DSViewRecord, "after_delete")
+def uncount_view(mapper, connection, target):
+    DSCounterRepository.bump_for_dataset(connection, CounterName.DATASET_VIEWS, target.dataset_id, -1)
+
+
+@event.listens_for(DSDownloadRecord, "after_delete")
+def uncount_download(mapper, connection, target):
+    DSCounterRepository.bump_for_dataset(connection, CounterName.DATASET_DOWNLOADS, target.dataset_id, -1)
+
+
+@event.listens_for(DataSet, "before_delete")
+def uncount_dataset(mapper, connection, target):
+    # The records reference the dataset, so they go with it; the activity rollups are history and stay
+    for name, model in (
+        (CounterName.DATASET_VIEWS, DSViewRecord),
+        (CounterName.DATASET_DOWNLOADS, DSDownloadRecord),
+    ):
+        table = model.__table__
+        count = connection.execute(
+            select(func.count()).select_from(table).where(table.c.dataset_id == target.id)
+        ).scalar()
+        if count:
+            connection.execute(table.delete().where(table.c.dataset_id == target.id))
+            DSCounterRepository.bump(connection, name, amount=-count)
+    DSCounterRepository.drop_scope(connection, target.id)
+
+    doi = connection.execute(
+        select(DSMetaData.dataset_doi).where(DSMetaData.id == target.ds_meta_data_id)
+    ).scalar()
+    if doi:
+        DSCounterRepository.bump(connection, CounterName.SYNCHRONIZED_DATASETS, amount=-1)
@@ -3,7 +3,7 @@ from enum import Enum
 
 from flask import request
 from sqlalchemy import Enum as SQLAlchemyEnum
-from sqlalchemy import Boolean
+from sqlalchemy import Boolean, false
 
 from app import db
 
@@ -45,7 +45,7 @@ class DSMetaData(db.Model):
     description = db.Column(db.Text, nullable=False)
     tournament_type = db.Column(SQLAlchemyEnum(TournamentType), nullable=False)
     publication_doi = db.Column(db.String(120))
-    dataset_doi = db.Column(db.String(120))
+    dataset_doi = db.Column(db.String(120), index=True)
     # When True, the dataset will be uploaded to Zenodo/fakenodo anonymized (authors not exposed)
     anonymous = db.Column(Boolean, default=False)
     tags = db.Column(db.String(120))
@@ -55,6 +55,9 @@ class DSMetaData(db.Model):
 
 
 class DataSet(db.Model):
+    # get_synchronized/get_unsynchronized filter by owner and order by creation date
+    __table_args__ = (db.Index("ix_data_set_user_created", "user_id", "created_at"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
@@ -80,6 +83,12 @@ class DataSet(db.Model):
     def get_zenodo_url(self):
         return f"https://zenodo.org/record/{self.ds_meta_data.deposition_id}" if self.ds_meta_data.dataset_doi else None
 
+    def get_publication_status(self) -> str:
+        """"published" once a DOI is stored, else the publication job's status ("draft" without one)."""
+        if self.ds_meta_data.dataset_doi:
+            return PublicationJob.PUBLISHED
+        return self.publication_job.status if self.publication_job else "draft"
+
     def get_files_count(self):
         return len(self.files())
 
@@ -138,6 +147,9 @@ class DSDownloadRecord(db.Model):
 
 
 class DSViewRecord(db.Model):
+    # the_record_exists dedupes views by (user, dataset, cookie)
+    __table_args__ = (db.Index("ix_ds_view_record_user_dataset_cookie", "user_id", "dataset_id", "view_cookie"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id"))
@@ -148,6 +160,84 @@ class DSViewRecord(db.Model):
         return f"<View id={self.id} dataset_id={self.dataset_id} date={self.view_date} cookie={self.view_cookie}>"
 
 
+class CounterName:
+    """Names of the materialized counters stored in ``DSCounter``."""
+
+    DATASET_VIEWS = "dataset_views"
+    DATASET_DOWNLOADS = "dataset_downloads"
+    HUBFILE_VIEWS = "hubfile_views"
+    HUBFILE_DOWNLOADS = "hubfile_downloads"
+    SYNCHRONIZED_DATASETS = "synchronized_datasets"
+
+
+class DSCounter(db.Model):
+    """Materialized view/download counter.
+
+    ``scope_id`` is 0 for hub-wide counters and the dataset id for per-dataset counters.
+    Rows are bumped with an atomic ``value = value + n`` upsert by the ORM listeners in
+    ``app.modules.dataset.listeners`` and ``app.modules.hubfile.listeners`` (decremented again
+    when records, files or datasets are deleted), so reading a total is a single primary-key
+    lookup instead of an aggregate over the record tables.
+    """
+
+    __tablename__ = "ds_counter"
+    __table_args__ = (db.UniqueConstraint("name", "scope_id", name="uq_ds_counter_name_scope"),)
+
+    GLOBAL_SCOPE = 0
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    scope_id = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DSCounter {self.name} scope={self.scope_id} value={self.value}>"
+
+
+class ActivityMetric:
+    """Metrics pre-aggregated in ``DSActivityRollup``, always from the point of view of ``user_id``."""
+
+    UPLOADS = "uploads"  # datasets created by the user
+    SYNCHRONIZATIONS = "synchronizations"  # user's datasets that got a DOI
+    VIEWS_RECEIVED = "views_received"  # views of the user's datasets
+    DOWNLOADS_RECEIVED = "downloads_received"  # downloads of the user's datasets
+    DOWNLOADS_MADE = "downloads_made"  # downloads performed by the user
+
+
+class DSActivityRollup(db.Model):
+    """Time-bucketed activity counts per dataset and user (hourly and daily granularity).
+
+    Rows are maintained incrementally by the listeners in ``app.modules.dataset.listeners``
+    whenever a record, dataset or DOI is written, so dashboards never scan the record tables.
+    """
+
+    __tablename__ = "ds_activity_rollup"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "metric", "granularity", "bucket_start", "user_id", "dataset_id", name="uq_ds_activity_rollup_bucket"
+        ),
+        db.Index("ix_ds_activity_rollup_user_bucket", "user_id", "granularity", "bucket_start"),
+        db.Index("ix_ds_activity_rollup_dataset_bucket", "dataset_id", "granularity", "bucket_start"),
+    )
+
+    HOUR = "hour"
+    DAY = "day"
+
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(32), nullable=False)
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    dataset_id = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<DSActivityRollup {self.metric} {self.granularity} {self.bucket_start} "
+            f"user={self.user_id} dataset={self.dataset_id} value={self.value}>"
+        )
+
+
 class DOIMapping(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     dataset_doi_old = db.Column(db.String(120))
@@ -177,6 +267,15 @@ class PadelDatasetMetrics(db.Model):
     # Additional metadata
     has_set3_matches = db.Column(Boolean, default=False)
     avg_sets_per_match = db.Column(db.Float, nullable=True)
+    total_sets = db.Column(db.Integer, default=0)
+
+    # Mergeable summary (see app.modules.dataset.sketches): HyperLogLog of the player names,
+    # so catalog-wide unique players are a merge of these instead of a union of names
+    players_sketch = db.Column(db.LargeBinary, nullable=True)
+    # JSON {"year"|"tournament"|"category": {value: matches}}, the dataset's share of the catalog aggregate
+    breakdown = db.Column(db.Text, nullable=True)
+    # Whether the aggregate counts this dataset: only published ones (with a DOI) are public
+    in_catalog = db.Column(Boolean, nullable=False, default=False, server_default=false())
     
     # Relationships
     dataset = db.relationship("DataSet", backref=db.backref("padel_metrics", uselist=False))
@@ -204,3 +303,131 @@ class PadelDatasetMetrics(db.Model):
             "has_set3_matches": self.has_set3_matches,
             "avg_sets_per_match": self.avg_sets_per_match
         }
+
+
+class PadelFileMetrics(db.Model):
+    """Padel statistics of a single CSV file of a dataset.
+
+    ``PadelDatasetMetrics`` is the merge of these rows, so attaching a file only reads that
+    file. Counts of distinct values cannot be added across files, so tournaments and
+    categories are kept as JSON lists and players (unbounded) as a HyperLogLog sketch.
+    """
+
+    __tablename__ = "padel_file_metrics"
+
+    id = db.Column(db.Integer, primary_key=True)
+    hubfile_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), nullable=False, unique=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id"), nullable=False, index=True)
+    # Content the row was computed from; a different checksum means the file changed
+    checksum = db.Column(db.String(120), nullable=False)
+
+    total_matches = db.Column(db.Integer, nullable=False, default=0)
+    total_sets = db.Column(db.Integer, nullable=False, default=0)
+    has_set3_matches = db.Column(Boolean, nullable=False, default=False)
+    date_range_start = db.Column(db.Date, nullable=True)
+    date_range_end = db.Column(db.Date, nullable=True)
+
+    # JSON lists of the distinct values found in the file
+    tournament_names = db.Column(db.Text, nullable=True)
+    categories = db.Column(db.Text, nullable=True)
+    players_sketch = db.Column(db.LargeBinary, nullable=True)
+    # JSON {"year"|"tournament"|"category": {value: matches}}
+    breakdown = db.Column(db.Text, nullable=True)
+
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PadelFileMetrics hubfile_id={self.hubfile_id} matches={self.total_matches}>"
+
+
+class PadelCatalogAggregate(db.Model):
+    """Hub-wide padel analytics, one row per (dimension, key).
+
+    Breakdown dimensions ("year", "tournament", "category") hold the matches and the number of
+    datasets for each value. The "total" dimension holds hub totals under the keys "matches",
+    "sets" and "players" (a HyperLogLog estimate, whose merged sketch is kept in ``sketch``),
+    with ``datasets`` the published datasets with metrics. Rows are adjusted by the difference
+    each time a dataset's metrics are recomputed.
+    """
+
+    __tablename__ = "padel_catalog_aggregate"
+    __table_args__ = (
+        db.UniqueConstraint("dimension", "key", name="uq_padel_catalog_aggregate_key"),
+        db.Index("ix_padel_catalog_aggregate_dimension_value", "dimension", "value"),
+    )
+
+    TOTAL = "total"
+    DIMENSIONS = ("year", "tournament", "category")
+
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(16), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    datasets = db.Column(db.Integer, nullable=False, default=0)
+    sketch = db.Column(db.LargeBinary, nullable=True)
+
+    def __repr__(self):
+        return f"<PadelCatalogAggregate {self.dimension}:{self.key} value={self.value} datasets={self.datasets}>"
+
+
+class DatasetIdempotencyKey(db.Model):
+    """Outcome of an API dataset creation, replayed when a client retries with the same key.
+
+    A row without ``status_code`` is a request still being processed.
+    """
+
+    __tablename__ = "dataset_idempotency_key"
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_dataset_idempotency_key_user_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # SHA-256 of the request, so a key reused for a different request is refused
+    request_hash = db.Column(db.String(64), nullable=False)
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="SET NULL"), nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    response = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<DatasetIdempotencyKey user={self.user_id} key={self.key} status={self.status_code}>"
+
+
+class PublicationJob(db.Model):
+    """Background publication of a dataset to Zenodo/fakenodo, retried with exponential backoff.
+
+    The row is the durable part of the job: a job whose process died is picked up again by
+    ``DataSetPublicationService.resume``, which the app's publication sweeper runs periodically.
+    """
+
+    __tablename__ = "publication_job"
+    __table_args__ = (db.Index("ix_publication_job_status_next_attempt", "status", "next_attempt_at"),)
+
+    PENDING = "pending"
+    PUBLISHING = "publishing"
+    PUBLISHED = "published"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=False, unique=True)
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    dataset = db.relationship(
+        "DataSet", backref=db.backref("publication_job", uselist=False, cascade="all, delete-orphan")
+    )
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            "last_error": self.last_error,
+        }
+
+    def __repr__(self):
+        return f"<PublicationJob dataset={self.dataset_id} status={self.status} attempts={self.attempts}>"
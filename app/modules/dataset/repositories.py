@@ -1,11 +1,28 @@
 import logging
-from datetime import datetime, timezone
-from typing import Optional
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
 
 from flask_login import current_user
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 
-from app.modules.dataset.models import Author, DataSet, DOIMapping, DSDownloadRecord, DSMetaData, DSViewRecord
+from app.modules.dataset.models import (
+    Author,
+    CounterName,
+    DSActivityRollup,
+    DataSet,
+    DatasetIdempotencyKey,
+    DOIMapping,
+    DSCounter,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+    PadelCatalogAggregate,
+    PublicationJob,
+)
 from core.repositories.BaseRepository import BaseRepository
 
 logger = logging.getLogger(__name__)
@@ -16,13 +33,168 @@ class AuthorRepository(BaseRepository):
         super().__init__(Author)
 
 
+class DSCounterRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSCounter)
+
+    @staticmethod
+    def bump(connection, name: str, scope_id: int = DSCounter.GLOBAL_SCOPE, amount: int = 1) -> None:
+        """Add `amount` (possibly negative) to a counter, creating its row on first use.
+
+        Called from ORM flush events, so it writes through the flush connection (same transaction)
+        with a single atomic upsert. A decrement never creates a row.
+        """
+        if not amount:
+            return
+        table = DSCounter.__table__
+        key = and_(table.c.name == name, table.c.scope_id == scope_id)
+        if amount < 0:
+            connection.execute(table.update().where(key).values(value=table.c.value + amount))
+            return
+
+        values = {"name": name, "scope_id": scope_id, "value": amount}
+        dialect = connection.dialect.name
+        if dialect in ("mysql", "mariadb"):
+            stmt = mysql_insert(table).values(**values).on_duplicate_key_update(value=table.c.value + amount)
+            connection.execute(stmt)
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(table).values(**values).on_conflict_do_update(
+                index_elements=["name", "scope_id"], set_={"value": table.c.value + amount}
+            )
+            connection.execute(stmt)
+        else:
+            result = connection.execute(table.update().where(key).values(value=table.c.value + amount))
+            if not result.rowcount:
+                connection.execute(table.insert().values(**values))
+
+    @classmethod
+    def bump_for_dataset(cls, connection, name: str, dataset_id: Optional[int], amount: int = 1) -> None:
+        """Bump both the hub-wide counter and the per-dataset counter."""
+        cls.bump(connection, name, DSCounter.GLOBAL_SCOPE, amount)
+        if dataset_id:
+            cls.bump(connection, name, dataset_id, amount)
+
+    @staticmethod
+    def drop_scope(connection, scope_id: int) -> None:
+        """Delete every per-dataset counter of `scope_id`. Does not touch the hub-wide counters."""
+        if scope_id == DSCounter.GLOBAL_SCOPE:
+            return
+        table = DSCounter.__table__
+        connection.execute(table.delete().where(table.c.scope_id == scope_id))
+
+    def get_value(self, name: str, scope_id: int = DSCounter.GLOBAL_SCOPE) -> int:
+        value = self.session.query(self.model.value).filter_by(name=name, scope_id=scope_id).scalar()
+        return int(value or 0)
+
+    def get_values(self, scope_id: int = DSCounter.GLOBAL_SCOPE) -> Dict[str, int]:
+        rows = self.session.query(self.model.name, self.model.value).filter_by(scope_id=scope_id).all()
+        return {name: int(value) for name, value in rows}
+
+    def replace_all(self, name: str, values: Iterable[Tuple[int, int]]) -> None:
+        """Overwrite every row of counter `name` with the given (scope_id, value) pairs. Does not commit."""
+        self.session.query(self.model).filter_by(name=name).delete(synchronize_session=False)
+        self.session.bulk_insert_mappings(
+            self.model, [{"name": name, "scope_id": scope_id, "value": value} for scope_id, value in values]
+        )
+
+
+class DSActivityRollupRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSActivityRollup)
+
+    @staticmethod
+    def bucket_starts(when: Optional[datetime]):
+        """Return the (granularity, bucket_start) pairs, in naive UTC, that contain `when`."""
+        when = when or datetime.now(timezone.utc)
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        hour = when.replace(minute=0, second=0, microsecond=0)
+        return [(DSActivityRollup.HOUR, hour), (DSActivityRollup.DAY, hour.replace(hour=0))]
+
+    @classmethod
+    def bump(cls, connection, metric: str, user_id: int, dataset_id: int, when=None, amount: int = 1) -> None:
+        """Add `amount` to the hourly and daily buckets containing `when`.
+
+        Called from ORM flush events, so it writes through the flush connection (same transaction)
+        with a single atomic upsert per bucket.
+        """
+        table = DSActivityRollup.__table__
+        key_columns = ["metric", "granularity", "bucket_start", "user_id", "dataset_id"]
+
+        for granularity, bucket_start in cls.bucket_starts(when):
+            values = {
+                "metric": metric,
+                "granularity": granularity,
+                "bucket_start": bucket_start,
+                "user_id": user_id,
+                "dataset_id": dataset_id,
+                "value": amount,
+            }
+            dialect = connection.dialect.name
+            if dialect in ("mysql", "mariadb"):
+                stmt = mysql_insert(table).values(**values).on_duplicate_key_update(value=table.c.value + amount)
+                connection.execute(stmt)
+            elif dialect == "sqlite":
+                stmt = sqlite_insert(table).values(**values).on_conflict_do_update(
+                    index_elements=key_columns, set_={"value": table.c.value + amount}
+                )
+                connection.execute(stmt)
+            else:
+                key = and_(*[table.c[column] == values[column] for column in key_columns])
+                result = connection.execute(table.update().where(key).values(value=table.c.value + amount))
+                if not result.rowcount:
+                    connection.execute(table.insert().values(**values))
+
+    def get_user_activity(self, user_id: int, hourly_since: datetime):
+        """All daily buckets plus the hourly buckets since `hourly_since` for a user, in one query."""
+        return (
+            self.session.query(
+                self.model.metric,
+                self.model.granularity,
+                self.model.bucket_start,
+                func.sum(self.model.value),
+            )
+            .filter(
+                self.model.user_id == user_id,
+                or_(
+                    self.model.granularity == DSActivityRollup.DAY,
+                    and_(
+                        self.model.granularity == DSActivityRollup.HOUR,
+                        self.model.bucket_start >= hourly_since,
+                    ),
+                ),
+            )
+            .group_by(self.model.metric, self.model.granularity, self.model.bucket_start)
+            .all()
+        )
+
+    def get_dataset_activity(self, dataset_id: int, granularity: str, since: datetime):
+        return (
+            self.session.query(self.model.metric, self.model.bucket_start, func.sum(self.model.value))
+            .filter(
+                self.model.dataset_id == dataset_id,
+                self.model.granularity == granularity,
+                self.model.bucket_start >= since,
+            )
+            .group_by(self.model.metric, self.model.bucket_start)
+            .all()
+        )
+
+
 class DSDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSDownloadRecord)
+        self.counter_repository = DSCounterRepository()
 
     def total_dataset_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.counter_repository.get_value(CounterName.DATASET_DOWNLOADS)
+
+    def count_by_dataset(self):
+        return (
+            self.session.query(self.model.dataset_id, func.count(self.model.id))
+            .group_by(self.model.dataset_id)
+            .all()
+        )
 
 
 class DSMetaDataRepository(BaseRepository):
@@ -36,10 +208,17 @@ class DSMetaDataRepository(BaseRepository):
 class DSViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSViewRecord)
+        self.counter_repository = DSCounterRepository()
 
     def total_dataset_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.counter_repository.get_value(CounterName.DATASET_VIEWS)
+
+    def count_by_dataset(self):
+        return (
+            self.session.query(self.model.dataset_id, func.count(self.model.id))
+            .group_by(self.model.dataset_id)
+            .all()
+        )
 
     def the_record_exists(self, dataset: DataSet, user_cookie: str):
         return self.model.query.filter_by(
@@ -77,6 +256,14 @@ class DataSetRepository(BaseRepository):
             .all()
         )
 
+    def get_all_unsynchronized(self) -> list[DataSet]:
+        return (
+            self.model.query.join(DSMetaData)
+            .filter(DSMetaData.dataset_doi.is_(None))
+            .order_by(self.model.created_at.asc())
+            .all()
+        )
+
     def get_unsynchronized_dataset(self, current_user_id: int, dataset_id: int) -> DataSet:
         return (
             self.model.query.join(DSMetaData)
@@ -106,3 +293,169 @@ class DOIMappingRepository(BaseRepository):
 
     def get_new_doi(self, old_doi: str) -> str:
         return self.model.query.filter_by(dataset_doi_old=old_doi).first()
+
+
+class PadelCatalogAggregateRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(PadelCatalogAggregate)
+
+    def apply_deltas(self, deltas: Dict[Tuple[str, str], Tuple[int, int]]) -> None:
+        """Add (value, datasets) deltas to their (dimension, key) rows with one atomic upsert each.
+
+        Concurrent metric refreshes only ever add, so they cannot overwrite each other's counts.
+        """
+        table = PadelCatalogAggregate.__table__
+        connection = self.session.connection()
+        dialect = connection.dialect.name
+
+        for (dimension, key), (value, datasets) in deltas.items():
+            if not value and not datasets:
+                continue
+            values = {"dimension": dimension, "key": key[:255], "value": value, "datasets": datasets}
+            increments = {"value": table.c.value + value, "datasets": table.c.datasets + datasets}
+            if dialect in ("mysql", "mariadb"):
+                connection.execute(mysql_insert(table).values(**values).on_duplicate_key_update(**increments))
+            elif dialect == "sqlite":
+                connection.execute(
+                    sqlite_insert(table).values(**values).on_conflict_do_update(
+                        index_elements=["dimension", "key"], set_=increments
+                    )
+                )
+            else:
+                match = and_(table.c.dimension == dimension, table.c.key == values["key"])
+                result = connection.execute(table.update().where(match).values(**increments))
+                if not result.rowcount:
+                    connection.execute(table.insert().values(**values))
+
+        # Values that no dataset contains any more
+        connection.execute(
+            table.delete().where(table.c.dimension != PadelCatalogAggregate.TOTAL, table.c.datasets <= 0)
+        )
+
+    def get_total_for_update(self, key: str) -> Optional[PadelCatalogAggregate]:
+        """The total row ``key``, locked until the transaction ends."""
+        return (
+            self.model.query.filter_by(dimension=PadelCatalogAggregate.TOTAL, key=key)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+
+    def set_total(self, key: str, value: int, sketch: Optional[bytes] = None) -> None:
+        row = self.model.query.filter_by(dimension=PadelCatalogAggregate.TOTAL, key=key).first()
+        if row is None:
+            row = PadelCatalogAggregate(dimension=PadelCatalogAggregate.TOTAL, key=key, datasets=0)
+            self.session.add(row)
+        row.value = value
+        row.sketch = sketch
+
+    def get_totals(self) -> Dict[str, PadelCatalogAggregate]:
+        rows = self.model.query.filter_by(dimension=PadelCatalogAggregate.TOTAL).all()
+        return {row.key: row for row in rows}
+
+    def get_dimension(self, dimension: str, limit: Optional[int] = None, order_by_key: bool = False):
+        query = self.model.query.filter_by(dimension=dimension)
+        if order_by_key:
+            query = query.order_by(self.model.key)
+        else:
+            query = query.order_by(desc(self.model.value), self.model.key)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+
+    def clear(self) -> None:
+        self.model.query.delete()
+
+
+class DatasetIdempotencyKeyRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DatasetIdempotencyKey)
+
+    def get(self, user_id: int, key: str) -> Optional[DatasetIdempotencyKey]:
+        return self.model.query.filter_by(user_id=user_id, key=key).first()
+
+    def claim(self, user_id: int, key: str, request_hash: str) -> Optional[DatasetIdempotencyKey]:
+        """Insert the pending row for ``key``. Returns None if another request claimed it first."""
+        row = DatasetIdempotencyKey(user_id=user_id, key=key, request_hash=request_hash)
+        self.session.add(row)
+        try:
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            return None
+        return row
+
+    def complete(self, row: DatasetIdempotencyKey, status_code: int, body: dict, dataset_id: Optional[int] = None):
+        row.status_code = status_code
+        row.response = json.dumps(body)
+        row.dataset_id = dataset_id
+        self.session.commit()
+
+    def release(self, row: DatasetIdempotencyKey):
+        """Forget a claim whose request failed unexpectedly, so the client can retry."""
+        self.session.rollback()
+        self.model.query.filter_by(id=row.id).delete()
+        self.session.commit()
+
+    def purge_expired(self, max_age: timedelta) -> int:
+        cutoff = datetime.utcnow() - max_age
+        deleted = self.model.query.filter(self.model.created_at < cutoff).delete()
+        self.session.commit()
+        return deleted
+
+
+class PublicationJobRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(PublicationJob)
+
+    def get_by_dataset(self, dataset_id: int) -> Optional[PublicationJob]:
+        return self.model.query.filter_by(dataset_id=dataset_id).first()
+
+    def reset(self, dataset_id: int) -> PublicationJob:
+        """Pending job for the dataset, reusing the row of an earlier (failed) job."""
+        job = self.get_by_dataset(dataset_id)
+        if job is None:
+            job = PublicationJob(dataset_id=dataset_id)
+            self.session.add(job)
+        job.status = PublicationJob.PENDING
+        job.attempts = 0
+        job.last_error = None
+        job.next_attempt_at = datetime.utcnow()
+        self.session.commit()
+        return job
+
+    def claim(self, dataset_id: int) -> bool:
+        """Move a pending job to publishing. Only one worker can win this for a given attempt."""
+        updated = (
+            self.model.query.filter_by(dataset_id=dataset_id, status=PublicationJob.PENDING)
+            .update({"status": PublicationJob.PUBLISHING, "updated_at": datetime.utcnow()}, synchronize_session=False)
+        )
+        self.session.commit()
+        return updated == 1
+
+    def due(self, now: datetime, stale_before: datetime) -> list[int]:
+        """Datasets whose pending job is due, or whose job was left publishing by a dead worker."""
+        rows = (
+            self.session.query(self.model.dataset_id)
+            .filter(
+                or_(
+                    and_(self.model.status == PublicationJob.PENDING, self.model.next_attempt_at <= now),
+                    and_(self.model.status == PublicationJob.PUBLISHING, self.model.updated_at < stale_before),
+                )
+            )
+            .all()
+        )
+        return [dataset_id for (dataset_id,) in rows]
+
+    def requeue(self, dataset_id: int, stale_before: datetime) -> bool:
+        """Move a job left publishing since before `stale_before` back to pending."""
+        updated = (
+            self.model.query.filter(
+                self.model.dataset_id == dataset_id,
+                self.model.status == PublicationJob.PUBLISHING,
+                self.model.updated_at < stale_before,
+            )
+            .update({"status": PublicationJob.PENDING}, synchronize_session=False)
+        )
+        self.session.commit()
+        return updated == 1
@@ -25,6 +25,7 @@ from flask_wtf.csrf import generate_csrf
 
 from app.modules.dataset import dataset_bp
 from app.modules.dataset.forms import DataSetForm
+from app.modules.dataset.models import PublicationJob
 from app.modules.dataset.services import (
     AuthorService,
     DataSetService,
@@ -32,11 +33,22 @@ from app.modules.dataset.services import (
     DSDownloadRecordService,
     DSMetaDataService,
     DSViewRecordService,
-    calculate_checksum_and_size,
 )
+from app.modules.dataset.services_archive import ArchiveUploadService, is_archive
+from app.modules.dataset.services_columnar import ColumnarSidecarService
+from app.modules.dataset.services_publication import DataSetPublicationService
+from app.modules.dataset.services_upload import (
+    ChunkedUploadService,
+    UploadFinalizeService,
+    forget_checksums,
+    record_checksums,
+    unique_path,
+    validate_csv_upload,
+)
+from app.modules.dataset.signals import dataset_files_attached
 from app.modules.fakenodo.services import FakenodoService
 from app.modules.dataset.types.tabular import TabularDataset
-from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import HubfileService
 from app import db
 
 logger = logging.getLogger(__name__)
@@ -45,7 +57,10 @@ logger = logging.getLogger(__name__)
 dataset_service = DataSetService()
 author_service = AuthorService()
 dsmetadata_service = DSMetaDataService()
+sidecar_service = ColumnarSidecarService()
+finalize_service = UploadFinalizeService()
 zenodo_service = FakenodoService()  # Using fakenodo instead of real Zenodo
+publication_service = DataSetPublicationService(zenodo_service)
 doi_mapping_service = DOIMappingService()
 ds_view_record_service = DSViewRecordService()
 
@@ -71,90 +86,29 @@ def create_dataset():
             logger.exception(f"Exception while create dataset data in local {exc}")
             return jsonify({"Exception while create dataset data in local: ": str(exc)}), 400
 
-        # send dataset as deposition to Zenodo
-        data = {}
-        # If user chose to save as draft or as anonymous upload, skip contacting Zenodo/fakenodo now.
-        # Anonymous uploads must remain local (unsynchronized) until the user explicitly clicks Sync.
-        if getattr(form, 'upload_type', None) and form.upload_type.data in ('draft', 'anonymous'):
-            data = {}
-            zenodo_response_json = {}
-        else:
-            try:
-                zenodo_response_json = zenodo_service.create_new_deposition(dataset)
-                response_data = json.dumps(zenodo_response_json)
-                data = json.loads(response_data)
-            except Exception as exc:
-                data = {}
-                zenodo_response_json = {}
-                logger.exception(f"Exception while create dataset data in Zenodo {exc}")
-
-        # Some Zenodo/fakenodo endpoints may not return `conceptrecid` but they do return an `id`.
-        # Accept either `conceptrecid` or `id` as indication that the deposition was created.
-        if data.get("conceptrecid") or data.get("id"):
-            deposition_id = data.get("id")
-
-            # update dataset with deposition id in Zenodo
-            dataset_service.update_dsmetadata(dataset.ds_meta_data_id, deposition_id=deposition_id)
-
-            try:
-                # publish deposition
-                zenodo_service.publish_deposition(deposition_id)
-
-                # update DOI
-                deposition_doi = zenodo_service.get_doi(deposition_id)
-                dataset_service.update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=deposition_doi)
-            except Exception as e:
-                msg = f"it has not been possible to publish to Zenodo and update the DOI: {e}"
-                return jsonify({"message": msg}), 200
-
-        # Move files from temp folder to dataset folder and create Hubfile records
+        # Move files from temp folder to dataset storage and create Hubfile records
         temp_folder = current_user.temp_folder()
-        logger.info(f"Temp folder path: {temp_folder}")
-        logger.info(f"Temp folder exists: {os.path.exists(temp_folder)}")
-        if os.path.exists(temp_folder):
-            logger.info(f"Temp folder contents: {os.listdir(temp_folder)}")
-        
-        if os.path.exists(temp_folder) and os.path.isdir(temp_folder):
-            # Create destination folder for this dataset
-            working_dir = os.getenv("WORKING_DIR", "")
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
-            logger.info(f"Destination folder: {dest_folder}")
-            os.makedirs(dest_folder, exist_ok=True)
-            
-            # Process each file in temp folder
-            files_found = os.listdir(temp_folder)
-            logger.info(f"Files in temp folder: {files_found}")
-            for filename in files_found:
-                if filename.lower().endswith('.csv'):
-                    src_path = os.path.join(temp_folder, filename)
-                    dest_path = os.path.join(dest_folder, filename)
-                    logger.info(f"Moving {src_path} to {dest_path}")
-                    
-                    # Move file to destination
-                    shutil.move(src_path, dest_path)
-                    
-                    # Calculate checksum and size
-                    checksum, size = calculate_checksum_and_size(dest_path)
-                    logger.info(f"Created Hubfile: {filename}, size={size}, dataset_id={dataset.id}")
-                    
-                    # Create Hubfile record
-                    hubfile = Hubfile(
-                        name=filename,
-                        checksum=checksum,
-                        size=size,
-                        dataset_id=dataset.id,
-                    )
-                    db.session.add(hubfile)
-            
+        if os.path.isdir(temp_folder):
+            hubfile_ids = finalize_service.finalize(temp_folder, current_user.id, dataset.id)
             db.session.commit()
-            
+
+            # Derived data (padel metrics, player index) is built by background stages listening here
+            if hubfile_ids:
+                dataset_files_attached.send(dataset_service, dataset_id=dataset.id, hubfile_ids=hubfile_ids)
+
             # Delete remaining temp folder
             shutil.rmtree(temp_folder)
         else:
             logger.warning(f"Temp folder does not exist or is not a directory: {temp_folder}")
 
+        # Publish to Zenodo in the background. Drafts and anonymous uploads stay local
+        # (unsynchronized) until the user explicitly clicks Sync.
+        publication_status = "draft"
+        if not (getattr(form, 'upload_type', None) and form.upload_type.data in ('draft', 'anonymous')):
+            publication_status = publication_service.enqueue(dataset).status
+
         msg = "Everything works!"
-        return jsonify({"message": msg}), 200
+        return jsonify({"message": msg, "dataset_id": dataset.id, "publication_status": publication_status}), 200
 
     return render_template("dataset/upload_dataset.html", form=form)
 
@@ -186,7 +140,7 @@ def csv_schema():
 @dataset_bp.route("/dataset/file/upload", methods=["POST"])
 @login_required
 def upload():
-    file = request.files["file"]
+    file = request.files.get("file")
     temp_folder = current_user.temp_folder()
 
     # Only accept CSV files for padel-hub
@@ -197,42 +151,26 @@ def upload():
     if not os.path.exists(temp_folder):
         os.makedirs(temp_folder)
 
-    file_path = os.path.join(temp_folder, file.filename)
+    # Chunked upload (Dropzone chunking): each chunk is validated as it arrives
+    upload_id = request.form.get("dzuuid")
+    if upload_id is not None:
+        service = ChunkedUploadService(temp_folder)
+        offset = request.form.get("dzchunkbyteoffset", type=int)
+        total_size = request.form.get("dztotalfilesize", type=int)
+        if not service.is_valid_id(upload_id) or offset is None or total_size is None:
+            return jsonify({"message": "Invalid chunk parameters"}), 400
+        status, body = service.receive(upload_id, file.filename, offset, total_size, file.stream)
+        return jsonify(body), status
 
-    if os.path.exists(file_path):
-        # Generate unique filename (by recursion)
-        base_name, extension = os.path.splitext(file.filename)
-        i = 1
-        while os.path.exists(os.path.join(temp_folder, f"{base_name} ({i}){extension}")):
-            i += 1
-        new_filename = f"{base_name} ({i}){extension}"
-        file_path = os.path.join(temp_folder, new_filename)
-    else:
-        new_filename = file.filename
+    file_path, new_filename = unique_path(temp_folder, file.filename)
 
     try:
         file.save(file_path)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
-    # After saving, validate CSV syntax and report first syntax error (if any)
-    try:
-        tab = TabularDataset(None)
-        validation = tab.validate_syntax(file_path)
-    except Exception as e:
-        validation = {"valid": False, "message": f"Internal validation error: {e}"}
-
-    if not validation.get("valid"):
-        # Return helpful info to the user: line and message when available
-        resp = {"message": "CSV syntax error", "filename": new_filename}
-        if "line" in validation:
-            resp["line"] = validation["line"]
-        if "message" in validation:
-            resp["error"] = validation["message"]
-        if "encoding" in validation:
-            resp["encoding_attempted"] = validation["encoding"]
-        if "snippet" in validation and validation.get("snippet"):
-            resp["snippet"] = validation.get("snippet")
+    error, encoding = validate_csv_upload(file_path, new_filename)
+    if error:
         # Remove the saved file on validation failure to avoid leaving temp files
         try:
             if os.path.exists(file_path):
@@ -240,43 +178,49 @@ def upload():
         except Exception as e:
             logger.exception(f"Failed to remove temp file after validation failure: {e}")
 
-        return jsonify(resp), 400
-
-    # Validate padel-specific CSV structure
-    try:
-        padel_validation = tab.validate_padel_structure(file_path)
-    except Exception as e:
-        padel_validation = {"valid": False, "errors": [f"Internal validation error: {e}"]}
-
-    if not padel_validation.get("valid"):
-        # Return structure validation errors
-        resp = {
-            "message": "CSV structure error: file does not match required padel match format",
-            "filename": new_filename,
-            "errors": padel_validation.get("errors", []),
-            "required_columns": padel_validation.get("required_columns", [])
-        }
-        # Remove the saved file on validation failure
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.exception(f"Failed to remove temp file after structure validation failure: {e}")
+        return jsonify(error), 400
 
-        return jsonify(resp), 400
+    record_checksums(temp_folder, new_filename)
 
     return (
         jsonify(
             {
                 "message": "CSV uploaded and validated successfully",
                 "filename": new_filename,
-                "encoding": validation.get("encoding"),
+                "encoding": encoding,
             }
         ),
         200,
     )
 
 
+@dataset_bp.route("/dataset/file/upload/archive", methods=["POST"])
+@login_required
+def upload_archive():
+    """Upload many CSVs at once in a .zip or .tar.zst archive; returns one report for all members."""
+    file = request.files.get("file")
+    if not file or not is_archive(file.filename):
+        return jsonify({"message": "No valid file. Only .zip and .tar.zst archives are accepted."}), 400
+
+    temp_folder = current_user.temp_folder()
+    if not os.path.exists(temp_folder):
+        os.makedirs(temp_folder)
+
+    status, body = ArchiveUploadService(temp_folder).receive(file.filename, file.stream)
+    return jsonify(body), status
+
+
+@dataset_bp.route("/dataset/file/upload/<upload_id>", methods=["GET"])
+@login_required
+def upload_status(upload_id):
+    """Bytes received for a chunked upload, so an interrupted client can resume from there."""
+    service = ChunkedUploadService(current_user.temp_folder())
+    status = service.status(upload_id) if service.is_valid_id(upload_id) else None
+    if status is None:
+        return jsonify({"message": "Upload not found", "received": 0}), 404
+    return jsonify(status), 200
+
+
 @dataset_bp.route("/dataset/file/delete", methods=["POST"])
 def delete():
     data = request.get_json()
@@ -286,6 +230,7 @@ def delete():
 
     if os.path.exists(filepath):
         os.remove(filepath)
+        forget_checksums(temp_folder, filename)
         return jsonify({"message": "File deleted successfully"})
 
     return jsonify({"error": "Error: File not found"})
@@ -295,8 +240,6 @@ def delete():
 def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
-    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
     # Build a friendly base name using the dataset title
     def slugify(value: str) -> str:
         value = value.strip().lower()
@@ -318,16 +261,9 @@ def download_dataset(dataset_id):
     zip_path = os.path.join(temp_dir, f"{base_name}.zip")
 
     with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(base_name, relative_path),
-                )
+        for hubfile, full_path in HubfileService().get_paths_by_dataset(dataset):
+            if os.path.isfile(full_path):
+                zipf.write(full_path, arcname=os.path.join(base_name, hubfile.name))
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
@@ -380,8 +316,6 @@ def export_dataset(dataset_id: int):
     dataset = dataset_service.get_or_404(dataset_id)
 
     # Base folder where original files are stored
-    # We'll resolve file paths using HubfileService to be robust to WORKING_DIR and avoid 404
-    from app.modules.hubfile.services import HubfileService
 
     # Friendly base name for ZIP and top-level folder
     def slugify(value: str) -> str:
@@ -471,7 +405,7 @@ def export_dataset(dataset_id: int):
         tree.write(xml_bytes, encoding="utf-8", xml_declaration=True)
         return xml_bytes.getvalue()
 
-    def _csv_to_xlsx_bytes(csv_path: str) -> bytes:
+    def _csv_to_xlsx_bytes(csv_path: str, checksum: str = None) -> bytes:
         # Lazy import to avoid hard dependency during app startup
         try:
             from openpyxl import Workbook  # type: ignore
@@ -481,13 +415,20 @@ def export_dataset(dataset_id: int):
 
         import csv as _csv
 
-        enc, _ = _detect_header(csv_path)
         wb = Workbook()
         ws = wb.active
-        with open(csv_path, "r", encoding=enc, newline="") as f:
-            reader = _csv.reader(f)
-            for row in reader:
+        # Prefer the typed sidecar: scores and years land as numbers and dates as real date cells,
+        # and cells that did not convert keep the text the CSV has
+        sidecar = sidecar_service.open(checksum) if checksum else None
+        if sidecar is not None:
+            for row in sidecar_service.iter_rows(sidecar):
                 ws.append(list(row))
+        else:
+            enc, _ = _detect_header(csv_path)
+            with open(csv_path, "r", encoding=enc, newline="") as f:
+                reader = _csv.reader(f)
+                for row in reader:
+                    ws.append(list(row))
         bio = BytesIO()
         wb.save(bio)
         return bio.getvalue()
@@ -528,13 +469,9 @@ def export_dataset(dataset_id: int):
             return f.read().encode("utf-8")
 
     with ZipFile(zip_path, "w") as zipf:
-        # Iterate dataset files via DB and resolve absolute paths via service
-        for hubfile in dataset.files():
-            try:
-                full_path = HubfileService().get_path_by_hubfile(hubfile)
-            except Exception:
-                full_path = None
-            if not full_path or not os.path.isfile(full_path):
+        # Resolve every file path of the dataset at once (no per-file queries)
+        for hubfile, full_path in HubfileService().get_paths_by_dataset(dataset):
+            if not os.path.isfile(full_path):
                 continue
 
             orig_filename = os.path.basename(hubfile.name or os.path.basename(full_path))
@@ -565,7 +502,7 @@ def export_dataset(dataset_id: int):
 
                 # XLSX
                 try:
-                    xlsx_bytes = _csv_to_xlsx_bytes(full_path)
+                    xlsx_bytes = _csv_to_xlsx_bytes(full_path, hubfile.checksum)
                     if xlsx_bytes:
                         zipf.writestr(os.path.join(base_name, "xlsx", f"{file_base}.xlsx"), xlsx_bytes)
                 except Exception as exc:
@@ -656,7 +593,7 @@ def subdomain_index(doi):
     try:
         for file in dataset.files():
             if file.name.lower().endswith(".csv"):
-                csv_path = os.path.join("uploads", f"user_{dataset.user_id}", f"dataset_{dataset.id}", file.name)
+                csv_path = HubfileService().get_path_by_hubfile(file)
                 if os.path.exists(csv_path):
                     tab = TabularDataset(dataset)
                     csv_preview_rows = tab.preview(csv_path, rows=5)
@@ -689,7 +626,7 @@ def get_unsynchronized_dataset(dataset_id):
     try:
         for file in dataset.files():
             if file.name.lower().endswith(".csv"):
-                csv_path = os.path.join("uploads", f"user_{dataset.user_id}", f"dataset_{dataset.id}", file.name)
+                csv_path = HubfileService().get_path_by_hubfile(file)
                 if os.path.exists(csv_path):
                     tab = TabularDataset(dataset)
                     csv_preview_rows = tab.preview(csv_path, rows=5)
@@ -700,6 +637,38 @@ def get_unsynchronized_dataset(dataset_id):
     return render_template("dataset/view_dataset.html", dataset=dataset, csv_preview_rows=csv_preview_rows)
 
 
+@dataset_bp.route("/dataset/<int:dataset_id>/publication", methods=["GET"])
+@login_required
+def publication_status(dataset_id):
+    """Where the dataset's publication job stands (pending, publishing, published or failed)."""
+    dataset = dataset_service.get_or_404(dataset_id)
+    if dataset.user_id != current_user.id:
+        abort(404)
+    return jsonify(publication_service.get_status(dataset))
+
+
+@dataset_bp.route("/dataset/unsynchronized/sync", methods=["POST"])
+@login_required
+def sync_all_unsynchronized_datasets():
+    """Publish all unsynchronized datasets of the user. Anonymous ones are left to the per-dataset sync."""
+    report = publication_service.sync_all(current_user.id)
+    if not report["connected"]:
+        flash(f"Zenodo/fakenodo API not reachable at {zenodo_service.ZENODO_API_URL}", "danger")
+        return redirect(url_for("dataset.list_dataset"))
+
+    statuses = [job["status"] for job in report["datasets"].values()]
+    published = statuses.count(PublicationJob.PUBLISHED)
+    failed = statuses.count(PublicationJob.FAILED)
+    message = f"{len(statuses)} datasets sent for publication: {published} published, {failed} failed"
+    if len(statuses) > published + failed:
+        message += f", {len(statuses) - published - failed} in progress"
+    anonymous = list(report["skipped"].values()).count("anonymous")
+    if anonymous:
+        message += f". {anonymous} anonymous datasets were skipped, sync them one by one to reveal their authors"
+    flash(message + ".", "danger" if failed else "success" if published == len(statuses) else "info")
+    return redirect(url_for("dataset.list_dataset"))
+
+
 @dataset_bp.route("/dataset/unsynchronized/<int:dataset_id>/sync", methods=["POST"])
 @login_required
 def sync_unsynchronized_dataset(dataset_id):
@@ -711,20 +680,6 @@ def sync_unsynchronized_dataset(dataset_id):
     if not dataset:
         abort(404)
 
-    # Check connection to Zenodo (or fakenodo) first
-    try:
-        ok = zenodo_service.test_connection()
-    except Exception:
-        ok = False
-
-    if not ok:
-        logger.error(
-            "Zenodo/fakenodo API not reachable at %s",
-            getattr(zenodo_service, 'ZENODO_API_URL', 'unknown'),
-        )
-        flash(f"Zenodo/fakenodo API not reachable at {zenodo_service.ZENODO_API_URL}", "danger")
-        return redirect(url_for("dataset.list_dataset"))
-
     # If dataset was marked anonymous previously, make it non-anonymous now (user chose to publish)
     if getattr(dataset.ds_meta_data, "anonymous", False):
         # Persist the change in the DB
@@ -741,32 +696,13 @@ def sync_unsynchronized_dataset(dataset_id):
             except Exception:
                 pass
 
-    # Create deposition
-    try:
-        zenodo_response_json = zenodo_service.create_new_deposition(dataset)
-        data = zenodo_response_json
-    except Exception as exc:
-        logger.exception(f"Exception while creating deposition in Zenodo: {exc}")
-        flash(f"Failed to create deposition. Error details: {str(exc)}", "danger")
-        return redirect(url_for("dataset.list_dataset"))
-
-    # Accept deposition creation when either `conceptrecid` or `id` is present.
-    if data.get("conceptrecid") or data.get("id"):
-        deposition_id = data.get("id")
-        dataset_service.update_dsmetadata(dataset.ds_meta_data_id, deposition_id=deposition_id)
-        try:
-            zenodo_service.publish_deposition(deposition_id)
-            deposition_doi = zenodo_service.get_doi(deposition_id)
-            # Persist DOI in DB so dataset appears as synchronized
-            dataset_service.update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=deposition_doi)
-            logger.info("Dataset %s published with DOI %s", dataset.id, deposition_doi)
-            flash(f"Dataset published successfully. DOI: {deposition_doi}", "success")
-        except Exception as exc:
-            logger.exception(f"Exception while publishing: {exc}")
-            flash(f"Failed to publish: {str(exc)}", "danger")
-            return redirect(url_for("dataset.list_dataset"))
-
-    # If we didn't receive a conceptrecid or id, log the response for debugging.
-    logger.debug("Zenodo response during sync: %s", data)
+    # Zenodo is contacted by the background publication job, not by this request
+    job = publication_service.enqueue(dataset)
+    if job.status == PublicationJob.PUBLISHED:
+        flash(f"Dataset published successfully. DOI: {dataset.ds_meta_data.dataset_doi}", "success")
+    elif job.status == PublicationJob.FAILED:
+        flash(f"Failed to publish: {job.last_error}", "danger")
+    else:
+        flash("Publication started. The DOI will appear once Zenodo confirms it.", "info")
 
     return redirect(url_for("dataset.list_dataset"))
@@ -1,13 +1,17 @@
 import os
-import shutil
 from datetime import datetime, timezone, timedelta
 
 from dotenv import load_dotenv
 
 from app.modules.auth.models import User
 from app.modules.dataset.models import Author, DataSet, DSMetaData, DSMetrics, TournamentType
+from app.modules.dataset.services import DSCounterService
+from app.modules.dataset.services_columnar import ColumnarSidecarService
+from app.modules.dataset.services_padel import PadelMetricsService
 from app.modules.hubfile.models import Hubfile
+from core.managers.storage_manager import get_storage
 from core.seeders.BaseSeeder import BaseSeeder
+from core.storage import storage_key
 
 
 class DataSetSeeder(BaseSeeder):
@@ -66,26 +70,30 @@ class DataSetSeeder(BaseSeeder):
         ]
         seeded_datasets = self.seed(datasets)
 
-        # Create files and copy them to dataset folders
+        # Create files and copy them into storage
         load_dotenv()
         working_dir = os.getenv("WORKING_DIR", "")
         # point to padel_csv_examples folder we provide for padel-hub
         src_folder = os.path.join(working_dir, "app", "modules", "dataset", "padel_csv_examples")
+        storage = get_storage()
         for i in range(12):
             file_name = f"file{i+1}.csv"
             dataset = seeded_datasets[i // 3]
-            user_id = dataset.user_id
 
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{user_id}", f"dataset_{dataset.id}")
-            os.makedirs(dest_folder, exist_ok=True)
-            shutil.copy(os.path.join(src_folder, file_name), dest_folder)
-
-            file_path = os.path.join(dest_folder, file_name)
+            key = storage_key(dataset.user_id, dataset.id, file_name)
+            stored = storage.save(key, os.path.join(src_folder, file_name), move=False)
+            ColumnarSidecarService().build(stored.checksum, storage.get_local_path(key))
 
             hubfile = Hubfile(
                 name=file_name,
-                checksum=f"checksum{i+1}",
-                size=os.path.getsize(file_path),
+                checksum=stored.checksum,
+                size=stored.size,
                 dataset_id=dataset.id,
             )
             self.seed([hubfile])
+
+        for dataset in seeded_datasets:
+            PadelMetricsService.create_or_update_metrics(dataset)
+
+        # Seeded datasets already carry DOIs, so bring the materialized counters in line
+        DSCounterService().rebuild_from_records()
@@ -3,20 +3,32 @@ import logging
 import os
 import shutil
 import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from flask import request
 
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DataSet, DSMetaData, DSViewRecord
+from app.modules.dataset.models import (
+    ActivityMetric,
+    CounterName,
+    DataSet,
+    DSActivityRollup,
+    DSCounter,
+    DSMetaData,
+    DSViewRecord,
+)
 from app.modules.dataset.repositories import (
     AuthorRepository,
     DataSetRepository,
     DOIMappingRepository,
+    DSActivityRollupRepository,
+    DSCounterRepository,
     DSDownloadRecordRepository,
     DSMetaDataRepository,
     DSViewRecordRepository,
 )
+from app.modules.dataset.signals import dataset_published
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
@@ -74,21 +86,26 @@ class DataSetService(BaseService):
         return self.dsviewrecord_repostory.total_dataset_views()
 
     def create_from_form(self, form, current_user) -> DataSet:
+        logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
+        return self.create_with_metadata(current_user, form.get_dsmetadata(), form.get_authors())
+
+    def create_with_metadata(self, current_user, dsmetadata: dict, authors: list, commit: bool = True) -> DataSet:
+        """Create a dataset with its metadata; the owner is added as first author."""
         main_author = {
             "name": f"{current_user.profile.surname}, {current_user.profile.name}",
             "affiliation": current_user.profile.affiliation,
             "orcid": current_user.profile.orcid,
         }
         try:
-            logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
-            dsmetadata = self.dsmetadata_repository.create(**form.get_dsmetadata())
-            for author_data in [main_author] + form.get_authors():
+            dsmetadata = self.dsmetadata_repository.create(commit=False, **dsmetadata)
+            for author_data in [main_author] + authors:
                 author = self.author_repository.create(commit=False, ds_meta_data_id=dsmetadata.id, **author_data)
                 dsmetadata.authors.append(author)
 
             dataset = self.create(commit=False, user_id=current_user.id, ds_meta_data_id=dsmetadata.id)
 
-            self.repository.session.commit()
+            if commit:
+                self.repository.session.commit()
         except Exception as exc:
             logger.info(f"Exception creating dataset from form...: {exc}")
             self.repository.session.rollback()
@@ -96,13 +113,124 @@ class DataSetService(BaseService):
         return dataset
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
+        newly_synchronized = False
+        if kwargs.get("dataset_doi"):
+            dsmetadata = self.dsmetadata_repository.get_by_id(id)
+            newly_synchronized = dsmetadata is not None and not dsmetadata.dataset_doi
+
+        updated = self.dsmetadata_repository.update(id, **kwargs)
+
+        if updated and newly_synchronized and updated.data_set:
+            dataset_published.send(self, dataset_id=updated.data_set.id)
+        return updated
 
     def get_uvlhub_doi(self, dataset: DataSet) -> str:
         domain = os.getenv("DOMAIN", "localhost")
         return f"http://{domain}/doi/{dataset.ds_meta_data.dataset_doi}"
 
 
+class DSCounterService(BaseService):
+    def __init__(self):
+        super().__init__(DSCounterRepository())
+
+    def get_global_counters(self) -> dict:
+        """Return every hub-wide counter (missing ones as 0) with a single query."""
+        values = self.repository.get_values(DSCounter.GLOBAL_SCOPE)
+        names = [
+            CounterName.DATASET_VIEWS,
+            CounterName.DATASET_DOWNLOADS,
+            CounterName.HUBFILE_VIEWS,
+            CounterName.HUBFILE_DOWNLOADS,
+            CounterName.SYNCHRONIZED_DATASETS,
+        ]
+        return {name: values.get(name, 0) for name in names}
+
+    def get_dataset_counters(self, dataset_id: int) -> dict:
+        values = self.repository.get_values(dataset_id)
+        return {
+            CounterName.DATASET_VIEWS: values.get(CounterName.DATASET_VIEWS, 0),
+            CounterName.DATASET_DOWNLOADS: values.get(CounterName.DATASET_DOWNLOADS, 0),
+        }
+
+    def rebuild_from_records(self):
+        """Recompute every counter from the view/download record tables.
+
+        Used after seeding, bulk imports or bulk deletes that bypass the ORM flush listeners.
+        """
+        dsdownloadrecord_repository = DSDownloadRecordRepository()
+        dsviewrecord_repository = DSViewRecordRepository()
+
+        for name, per_dataset in (
+            (CounterName.DATASET_DOWNLOADS, dsdownloadrecord_repository.count_by_dataset()),
+            (CounterName.DATASET_VIEWS, dsviewrecord_repository.count_by_dataset()),
+        ):
+            rows = [(dataset_id, count) for dataset_id, count in per_dataset if dataset_id]
+            total = sum(count for _, count in per_dataset)
+            self.repository.replace_all(name, [(DSCounter.GLOBAL_SCOPE, total)] + rows)
+
+        self.repository.replace_all(
+            CounterName.HUBFILE_VIEWS, [(DSCounter.GLOBAL_SCOPE, HubfileViewRecordRepository().count_all())]
+        )
+        self.repository.replace_all(
+            CounterName.HUBFILE_DOWNLOADS, [(DSCounter.GLOBAL_SCOPE, HubfileDownloadRecordRepository().count_all())]
+        )
+        self.repository.replace_all(
+            CounterName.SYNCHRONIZED_DATASETS,
+            [(DSCounter.GLOBAL_SCOPE, DataSetRepository().count_synchronized_datasets())],
+        )
+        self.repository.session.commit()
+
+
+class DSActivityRollupService(BaseService):
+    METRICS = [
+        ActivityMetric.UPLOADS,
+        ActivityMetric.SYNCHRONIZATIONS,
+        ActivityMetric.VIEWS_RECEIVED,
+        ActivityMetric.DOWNLOADS_RECEIVED,
+        ActivityMetric.DOWNLOADS_MADE,
+    ]
+
+    def __init__(self):
+        super().__init__(DSActivityRollupRepository())
+
+    def get_user_dashboard(self, user_id: int, days: int = 30, now: Optional[datetime] = None) -> dict:
+        """All-time totals, last-24h totals and a daily series for the last `days` days.
+
+        Everything comes from a single query over the pre-aggregated buckets.
+        """
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        hourly_since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+
+        totals = {metric: 0 for metric in self.METRICS}
+        last_24h = {metric: 0 for metric in self.METRICS}
+        daily = {metric: {} for metric in self.METRICS}
+
+        for metric, granularity, bucket_start, value in self.repository.get_user_activity(user_id, hourly_since):
+            if metric not in totals:
+                continue
+            value = int(value or 0)
+            if granularity == DSActivityRollup.DAY:
+                totals[metric] += value
+                daily[metric][bucket_start.date()] = value
+            else:
+                last_24h[metric] += value
+
+        days_range = [now.date() - timedelta(days=offset) for offset in reversed(range(days))]
+        return {
+            "totals": totals,
+            "last_24h": last_24h,
+            "labels": [day.isoformat() for day in days_range],
+            "series": {metric: [daily[metric].get(day, 0) for day in days_range] for metric in self.METRICS},
+        }
+
+    def get_dataset_series(self, dataset_id: int, granularity: str = DSActivityRollup.HOUR, since=None) -> dict:
+        since = since or datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+        series = {}
+        for metric, bucket_start, value in self.repository.get_dataset_activity(dataset_id, granularity, since):
+            series.setdefault(metric, {})[bucket_start.isoformat()] = int(value or 0)
+        return series
+
+
 class AuthorService(BaseService):
     def __init__(self):
         super().__init__(AuthorRepository())
@@ -0,0 +1,238 @@
+"""
+Dataset creation through the REST API, for scripts and ingestion pipelines.
+
+One request carries the metadata, the authors and the CSV files. Files are validated with the
+same checks as the upload form, all before anything is written to the database, so a request
+either creates a complete dataset or nothing. Requests sent with an ``Idempotency-Key`` header
+are recorded with their response: a retry with the same key and body gets the original response
+back instead of creating a second dataset.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.modules.dataset.models import TournamentType
+from app.modules.dataset.repositories import DatasetIdempotencyKeyRepository
+from app.modules.dataset.services import DataSetService
+from app.modules.dataset.services_archive import VALIDATION_WORKERS
+from app.modules.dataset.services_publication import DataSetPublicationService
+from app.modules.dataset.services_upload import (
+    PARTIAL_FOLDER,
+    UploadFinalizeService,
+    record_checksums,
+    validate_csv_upload,
+)
+from app.modules.dataset.signals import dataset_files_attached
+from app.modules.hubfile.repositories import HubfileRepository
+from core.storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TYPES = ("draft", "anonymous", "public")
+MAX_FILES = 500
+MAX_FILENAME_LENGTH = 120
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Keys are remembered this long; a retry after that creates a new dataset
+IDEMPOTENCY_KEY_MAX_AGE = timedelta(hours=24)
+
+
+class ApiRequestError(Exception):
+    def __init__(self, status_code: int, body: Dict[str, Any]):
+        super().__init__(body.get("message"))
+        self.status_code = status_code
+        self.body = body
+
+
+def parse_metadata(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+    """Turn the request's metadata into (dsmetadata fields, authors, upload type)."""
+    errors = {}
+    for field in ("title", "description", "tournament_type", "publication_doi", "tags"):
+        if not isinstance(data.get(field) or "", str):
+            errors[field] = ["This field must be a string."]
+    if errors:
+        raise ApiRequestError(400, {"message": "Metadata validation failed", "errors": errors})
+
+    title = (data.get("title") or "").strip()
+    description = (data.get("description") or "").strip()
+    if not title:
+        errors["title"] = ["This field is required."]
+    elif len(title) > 120:
+        errors["title"] = ["Title must be at most 120 characters."]
+    if not description:
+        errors["description"] = ["This field is required."]
+
+    tournament_type = (data.get("tournament_type") or "none").strip().lower()
+    tournament_names = {t.value: t.name for t in TournamentType}
+    if tournament_type not in tournament_names:
+        errors["tournament_type"] = [f"Use one of {sorted(tournament_names)}."]
+
+    upload_type = data.get("upload_type") or "draft"
+    if upload_type not in UPLOAD_TYPES:
+        errors["upload_type"] = [f"Use one of {list(UPLOAD_TYPES)}."]
+
+    authors = []
+    raw_authors = data.get("authors") or []
+    if not isinstance(raw_authors, list):
+        errors["authors"] = ["Authors must be a list."]
+        raw_authors = []
+    for author in raw_authors:
+        if not isinstance(author, dict) or not isinstance(author.get("name"), str) or not author["name"].strip():
+            errors["authors"] = ["Every author needs a name."]
+            break
+        authors.append(
+            {"name": author["name"].strip(), "affiliation": author.get("affiliation"), "orcid": author.get("orcid")}
+        )
+
+    if errors:
+        raise ApiRequestError(400, {"message": "Metadata validation failed", "errors": errors})
+
+    dsmetadata = {
+        "title": title,
+        "description": description,
+        "tournament_type": tournament_names.get(tournament_type, "NONE"),
+        "publication_doi": data.get("publication_doi") or "",
+        "tags": data.get("tags") or "",
+        "anonymous": upload_type == "anonymous",
+    }
+    return dsmetadata, authors, upload_type
+
+
+class ApiDatasetService:
+    def __init__(self):
+        self.dataset_service = DataSetService()
+        self.finalize_service = UploadFinalizeService()
+        self.hubfile_repository = HubfileRepository()
+        self.idempotency_repository = DatasetIdempotencyKeyRepository()
+        self.publication_service = DataSetPublicationService()
+
+    def create(
+        self, user, metadata: Dict[str, Any], files: List[Tuple[str, Any]], idempotency_key: Optional[str] = None
+    ):
+        """Create a dataset for ``user``. ``files`` are (filename, bytes or file-like) pairs.
+
+        Returns (HTTP status, response body, replayed).
+        """
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+            return 400, {"message": f"Idempotency-Key must have 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters"}, False
+
+        staging = os.path.join(user.temp_folder(), PARTIAL_FOLDER, f"api-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        claim = None
+        try:
+            names = self._stage(files, staging)
+            request_hash = self._request_hash(metadata, staging, names)
+
+            if idempotency_key is not None:
+                claim, replay = self._claim(user.id, idempotency_key, request_hash)
+                if replay is not None:
+                    return replay[0], replay[1], True
+
+            try:
+                status, body = self._create(user, metadata, staging, names)
+            except ApiRequestError as e:
+                status, body = e.status_code, e.body
+
+            if claim is not None:
+                self.idempotency_repository.complete(claim, status, body, dataset_id=body.get("dataset_id"))
+            return status, body, False
+        except ApiRequestError as e:
+            return e.status_code, e.body, False
+        except Exception:
+            if claim is not None:
+                self.idempotency_repository.release(claim)
+            raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _stage(files: List[Tuple[str, Any]], staging: str) -> List[str]:
+        if not files:
+            raise ApiRequestError(400, {"message": "At least one CSV file is required"})
+        if len(files) > MAX_FILES:
+            raise ApiRequestError(400, {"message": f"At most {MAX_FILES} files can be sent in one request"})
+        names = []
+        for filename, content in files:
+            if not isinstance(filename, str):
+                raise ApiRequestError(400, {"message": "Every file needs a name", "filename": filename})
+            if not isinstance(content, (bytes, str)) and not hasattr(content, "read"):
+                raise ApiRequestError(
+                    400, {"message": f"The content of {filename!r} must be a string", "filename": filename}
+                )
+            name = os.path.basename(filename)
+            if not name.lower().endswith(".csv") or len(name) > MAX_FILENAME_LENGTH or name.startswith("."):
+                raise ApiRequestError(400, {"message": f"Invalid file name: {filename!r}", "filename": filename})
+            if name in names:
+                raise ApiRequestError(400, {"message": f"Duplicate file name: {name}", "filename": name})
+            with open(os.path.join(staging, name), "wb") as f:
+                if isinstance(content, (bytes, str)):
+                    f.write(content.encode("utf-8") if isinstance(content, str) else content)
+                else:
+                    shutil.copyfileobj(content, f)
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _request_hash(metadata: Dict[str, Any], staging: str, names: List[str]) -> str:
+        digest = hashlib.sha256(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+        for name in sorted(names):
+            md5, sha256, size = hash_file(os.path.join(staging, name))
+            # Recorded so the finalize step does not hash the files again
+            record_checksums(staging, name, (md5, sha256, size))
+            digest.update(f"\0{name}\0{sha256}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _claim(self, user_id: int, key: str, request_hash: str):
+        """Reserve ``key`` for this request. Returns (claim, None) or (None, (status, body)) to replay."""
+        self.idempotency_repository.purge_expired(IDEMPOTENCY_KEY_MAX_AGE)
+        claim = self.idempotency_repository.claim(user_id, key, request_hash)
+        if claim is not None:
+            return claim, None
+
+        existing = self.idempotency_repository.get(user_id, key)
+        if existing is None:
+            # Expired and purged between our two queries; the client can simply retry
+            raise ApiRequestError(409, {"message": "Idempotency-Key is being reused, retry the request"})
+        if existing.request_hash != request_hash:
+            raise ApiRequestError(
+                422, {"message": "Idempotency-Key was already used for a different request"}
+            )
+        if existing.status_code is None:
+            raise ApiRequestError(409, {"message": "A request with this Idempotency-Key is still being processed"})
+        return None, (existing.status_code, json.loads(existing.response))
+
+    def _create(self, user, metadata: Dict[str, Any], staging: str, names: List[str]):
+        dsmetadata, authors, upload_type = parse_metadata(metadata)
+
+        with ThreadPoolExecutor(max_workers=min(VALIDATION_WORKERS, len(names))) as executor:
+            results = list(executor.map(lambda n: validate_csv_upload(os.path.join(staging, n), n), names))
+        rejected = [error for error, _ in results if error]
+        if rejected:
+            raise ApiRequestError(400, {"message": "Some files are not valid padel CSVs", "files": rejected})
+
+        dataset = self.dataset_service.create_with_metadata(user, dsmetadata, authors, commit=False)
+        hubfile_ids = self.finalize_service.finalize(staging, user.id, dataset.id)
+        self.dataset_service.repository.session.commit()
+        dataset_files_attached.send(self.dataset_service, dataset_id=dataset.id, hubfile_ids=hubfile_ids)
+
+        body = {
+            "message": "Dataset created",
+            "dataset_id": dataset.id,
+            "status": "draft",
+            "doi": None,
+            "files": [
+                {"id": hubfile.id, "name": hubfile.name, "size": hubfile.size, "checksum": hubfile.checksum}
+                for hubfile in self.hubfile_repository.get_by_dataset_id(dataset.id)
+            ],
+        }
+        if upload_type == "public":
+            # Published by a background job; the client can follow /dataset/<id>/publication
+            self.publication_service.enqueue(dataset)
+            body["status"] = dataset.get_publication_status()
+            body["doi"] = dataset.ds_meta_data.dataset_doi
+        return 201, body
@@ -0,0 +1,227 @@
+"""
+Bulk upload of many CSVs in one archive (``.zip`` or ``.tar.zst``).
+
+Members are extracted one at a time from the request stream into a staging folder beside the
+user's temp folder. Each extracted CSV is handed to a worker pool for validation right away, so
+validation of earlier members overlaps extraction of later ones (decompression and file writes
+release the GIL). Validations hold the GIL, so they do not run in parallel with each other.
+Valid files then land in the temp folder exactly as if they had been uploaded one by one, and
+the caller gets one report with the outcome of every member; a member that cannot be read is
+rejected on its own.
+"""
+import logging
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.modules.dataset.services_upload import (
+    PARTIAL_FOLDER,
+    record_checksums,
+    unique_path,
+    validate_csv_upload,
+)
+from core.storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Optional dependency: zstandard (only needed for .tar.zst archives)
+try:  # pragma: no cover - optional in minimal envs
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover
+    zstandard = None
+
+# Raised while reading a corrupt member: it is rejected, the rest of the archive is still read
+MEMBER_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zlib.error, tarfile.TarError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar.zst", ".tzst")
+VALIDATION_WORKERS = 4
+MAX_MEMBERS = 1000
+# Same per-file limit as the single-file upload form
+MAX_MEMBER_SIZE = 10 * 1024 * 1024
+# Uncompressed bytes accepted from one archive, whatever its compressed size
+MAX_TOTAL_SIZE = 1024 * 1024 * 1024
+COPY_BUFFER = 64 * 1024
+# Report entry for the members of a .tar.zst that follow a corrupt one and cannot be reached
+REST_OF_ARCHIVE = "(rest of the archive)"
+
+
+class ArchiveError(Exception):
+    """The archive itself cannot be used (wrong format, corrupt, too large)."""
+
+
+def is_archive(filename: str) -> bool:
+    return bool(filename) and filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+class ArchiveUploadService:
+    def __init__(self, temp_folder: str, workers: int = VALIDATION_WORKERS):
+        self.temp_folder = temp_folder
+        self.workers = workers
+
+    def receive(self, filename: str, stream) -> Tuple[int, Dict[str, Any]]:
+        """Extract and validate every CSV in the archive. Returns (HTTP status, report)."""
+        staging = os.path.join(self.temp_folder, PARTIAL_FOLDER, f"archive-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            files = self._process(filename, stream, staging)
+        except ArchiveError as e:
+            return 400, {"message": str(e), "filename": filename}
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        accepted = sum(1 for f in files if f["status"] == "accepted")
+        rejected = sum(1 for f in files if f["status"] == "rejected")
+        if not accepted and not rejected:
+            return 400, {"message": "The archive contains no CSV files", "filename": filename, "files": files}
+        return 200, {
+            "message": f"{accepted} of {accepted + rejected} CSV files uploaded and validated successfully",
+            "filename": filename,
+            "accepted": accepted,
+            "rejected": rejected,
+            "files": files,
+        }
+
+    def _process(self, filename: str, stream, staging: str) -> List[Dict[str, Any]]:
+        report: List[Any] = []
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for index, (name, member_stream) in enumerate(self._members(filename, stream, staging)):
+                member_name = os.path.basename(name)
+                if name == REST_OF_ARCHIVE:
+                    report.append({"filename": name, "status": "rejected", "message": member_stream.reason})
+                    continue
+                if not member_name.lower().endswith(".csv") or member_name.startswith("."):
+                    report.append({"filename": name, "status": "skipped", "message": "Not a CSV file"})
+                    continue
+                staged = os.path.join(staging, f"{index}.csv")
+                written, error = self._extract(member_stream, staged)
+                total += written
+                if total > MAX_TOTAL_SIZE:
+                    raise ArchiveError("The archive is too large once uncompressed")
+                if error:
+                    report.append({"filename": name, "status": "rejected", "message": error})
+                    continue
+                report.append((name, member_name, staged, executor.submit(self._validate, staged, member_name)))
+
+            # Move valid files in archive order so " (n)" suffixes are deterministic
+            files = []
+            for entry in report:
+                if isinstance(entry, dict):
+                    files.append(entry)
+                    continue
+                name, member_name, staged, future = entry
+                error, encoding, hashes = future.result()
+                if error:
+                    files.append(dict(error, filename=name, status="rejected"))
+                    continue
+                file_path, new_filename = unique_path(self.temp_folder, member_name)
+                os.replace(staged, file_path)
+                record_checksums(self.temp_folder, new_filename, hashes)
+                files.append({"filename": name, "status": "accepted", "stored_as": new_filename, "encoding": encoding})
+        return files
+
+    @staticmethod
+    def _validate(path: str, member_name: str):
+        error, encoding = validate_csv_upload(path, member_name)
+        if error:
+            return error, None, None
+        return None, encoding, hash_file(path)
+
+    def _members(self, filename: str, stream, staging: str) -> Iterator[Tuple[str, Any]]:
+        lower = filename.lower()
+        if lower.endswith(".zip"):
+            yield from self._zip_members(stream, staging)
+        elif lower.endswith((".tar.zst", ".tzst")):
+            yield from self._tar_zst_members(stream)
+        else:
+            raise ArchiveError("Unsupported archive type. Use .zip or .tar.zst")
+
+    def _zip_members(self, stream, staging: str) -> Iterator[Tuple[str, Any]]:
+        if not (hasattr(stream, "seekable") and stream.seekable()):
+            # The ZIP directory is at the end of the file, so it needs random access
+            spooled = os.path.join(staging, "archive.zip")
+            with open(spooled, "wb") as f:
+                shutil.copyfileobj(stream, f, COPY_BUFFER)
+            stream = spooled
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Invalid ZIP archive: {e}")
+        with archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+            if len(infos) > MAX_MEMBERS:
+                raise ArchiveError(f"The archive has more than {MAX_MEMBERS} files")
+            if sum(info.file_size for info in infos) > MAX_TOTAL_SIZE:
+                raise ArchiveError("The archive is too large once uncompressed")
+            for info in infos:
+                try:
+                    member = archive.open(info)
+                except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                    # Encrypted member or unsupported compression: rejected on its own
+                    yield info.filename, _BrokenMember(str(e))
+                    continue
+                with member:
+                    yield info.filename, member
+
+    @staticmethod
+    def _tar_zst_members(stream) -> Iterator[Tuple[str, Any]]:
+        if zstandard is None:
+            raise ArchiveError(".tar.zst archives require the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(stream)
+        count = 0
+        total = 0
+        try:
+            # "r|" reads the tar sequentially, so nothing is decompressed twice or kept in memory
+            with tarfile.open(fileobj=reader, mode="r|") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    count += 1
+                    total += info.size
+                    if count > MAX_MEMBERS:
+                        raise ArchiveError(f"The archive has more than {MAX_MEMBERS} files")
+                    if total > MAX_TOTAL_SIZE:
+                        raise ArchiveError("The archive is too large once uncompressed")
+                    yield info.name, archive.extractfile(info)
+        except (tarfile.TarError, zstandard.ZstdError, EOFError) as e:
+            if not count:
+                raise ArchiveError(f"Invalid .tar.zst archive: {e}")
+            # The stream is sequential: nothing after the corrupt part can be reached
+            yield REST_OF_ARCHIVE, _BrokenMember(f"The archive is corrupt after this point: {e}")
+
+    @staticmethod
+    def _extract(member_stream, path: str) -> Tuple[int, Optional[str]]:
+        """Copy one member to ``path``. Returns (bytes written, error message) instead of raising."""
+        if isinstance(member_stream, _BrokenMember):
+            return 0, f"Could not read the file from the archive: {member_stream.reason}"
+        written = 0
+        error = None
+        try:
+            with open(path, "wb") as f:
+                while True:
+                    buffer = member_stream.read(COPY_BUFFER)
+                    if not buffer:
+                        break
+                    written += len(buffer)
+                    # Declared sizes can lie; count what is actually decompressed
+                    if written > MAX_MEMBER_SIZE:
+                        error = "File is larger than the 10 MB limit"
+                        break
+                    f.write(buffer)
+        except MEMBER_ERRORS as e:
+            error = f"Could not read the file from the archive: {e}"
+        if error and os.path.exists(path):
+            os.remove(path)
+        return written, error
+
+
+class _BrokenMember:
+    def __init__(self, reason: str):
+        self.reason = reason
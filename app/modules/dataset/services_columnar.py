@@ -0,0 +1,218 @@
+"""
+Typed columnar sidecars for uploaded padel CSV files.
+
+Each accepted CSV is converted once into an Arrow IPC file (uncompressed, so it can be
+memory-mapped and read zero-copy) with scores and years as integers, tournament dates as
+``date32`` and repeated labels dictionary-encoded. Sidecars live in storage under
+``sidecars/v<version>/<checksum>.arrow``: files with identical content share one sidecar.
+A typed column with cells that did not convert keeps their original text in a ``<name>__raw``
+column, so a reader of the sidecar (the XLSX export) never loses what the CSV said.
+
+The sidecar serves the readers that want typed columns: the metrics engine and the XLSX export.
+Validation runs before a file is accepted, so before it has a sidecar, and preview, view and the
+text exports show the file as written, so they keep reading the CSV itself.
+
+pyarrow is optional. Without it no sidecar is built and readers fall back to the CSV.
+"""
+import codecs
+import csv
+import logging
+import os
+import tempfile
+from typing import List, Optional
+
+from core.managers.storage_manager import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Optional dependency: pyarrow (columnar sidecars). Readers fall back to the CSV without it.
+try:  # pragma: no cover - optional in minimal envs
+    import pyarrow as pa  # type: ignore
+    import pyarrow.compute as pc  # type: ignore
+    import pyarrow.csv as pa_csv  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
+
+
+SIDECAR_VERSION = 2
+
+INTEGER_COLUMNS = {
+    "anio_torneo": "int16",
+    "set1_pareja1": "int8",
+    "set1_pareja2": "int8",
+    "set2_pareja1": "int8",
+    "set2_pareja2": "int8",
+    "set3_pareja1": "int8",
+    "set3_pareja2": "int8",
+}
+DATE_COLUMNS = ["fecha_inicio_torneo", "fecha_final_torneo"]
+# The only date format of padel CSVs; the metrics engine parses dates from the CSV the same way
+DATE_FORMAT = "%d.%m.%Y"
+RAW_SUFFIX = "__raw"
+DICTIONARY_COLUMNS = ["nombre_torneo", "pista_principal", "categoria", "fase", "ronda"]
+ENCODINGS = ["utf-8", "utf-8-sig", "utf-16", "latin-1", "cp1252"]
+# Bytes decoded to guess the encoding of a file
+ENCODING_SAMPLE_BYTES = 64 * 1024
+BATCH_ROWS = 64 * 1024
+
+
+def candidate_encodings(csv_path: str, sample_bytes: int = ENCODING_SAMPLE_BYTES) -> List[str]:
+    """Encodings that decode the first ``sample_bytes`` of the file, likeliest first."""
+    with open(csv_path, "rb") as f:
+        sample = f.read(sample_bytes)
+        whole_file = not f.read(1)
+    candidates = []
+    for enc in ENCODINGS:
+        # Nearly any even-length sample decodes as UTF-16, so only a BOM makes it a candidate
+        if enc == "utf-16" and not sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            continue
+        try:
+            # A sample cut inside a multi-byte character only fails when it is the whole file
+            codecs.getincrementaldecoder(enc)().decode(sample, final=whole_file)
+            candidates.append(enc)
+        except UnicodeError:
+            continue
+    return candidates
+
+
+class ColumnarSidecarService:
+    """Builds and opens the Arrow sidecar of a CSV file."""
+
+    @staticmethod
+    def is_available() -> bool:
+        return pa is not None
+
+    @staticmethod
+    def sidecar_key(checksum: str) -> str:
+        return f"sidecars/v{SIDECAR_VERSION}/{checksum}.arrow"
+
+    def build(self, checksum: str, csv_path: str) -> Optional[str]:
+        """Convert ``csv_path`` into its sidecar unless one already exists. Returns the storage key."""
+        if pa is None:
+            return None
+
+        storage = get_storage()
+        key = self.sidecar_key(checksum)
+        if storage.exists(key):
+            return key
+
+        try:
+            table = self.read_csv(csv_path)
+            fd, tmp_path = tempfile.mkstemp(suffix=".arrow")
+            os.close(fd)
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table, max_chunksize=BATCH_ROWS)
+            storage.save(key, tmp_path, move=True)
+            return key
+        except Exception as exc:
+            logger.warning(f"Could not build columnar sidecar for {csv_path}: {exc}")
+            return None
+
+    def read_csv(self, csv_path: str):
+        """Parse a CSV into a typed Arrow table."""
+        table = None
+        for encoding in candidate_encodings(csv_path):
+            try:
+                table = self._read_text(csv_path, encoding)
+                break
+            except (UnicodeError, pa.ArrowInvalid) as e:
+                # The sample decoded but a later part of the file does not: try the next candidate
+                if not isinstance(e, UnicodeError) and "invalid UTF8" not in str(e):
+                    raise
+        if table is None:
+            raise ValueError(f"Could not decode CSV file: {csv_path}")
+
+        names, columns, raw = [], [], []
+        for name, column in zip(table.column_names, table.columns):
+            typed = column
+            if name in INTEGER_COLUMNS:
+                typed = self._parse_integers(column, INTEGER_COLUMNS[name])
+            elif name in DATE_COLUMNS:
+                typed = self._parse_dates(column)
+            elif name in DICTIONARY_COLUMNS:
+                typed = pc.dictionary_encode(column)
+            names.append(name)
+            columns.append(typed)
+            if (name in INTEGER_COLUMNS or name in DATE_COLUMNS) and self._lost_cells(column, typed):
+                raw.append((name + RAW_SUFFIX, column))
+
+        names += [name for name, _ in raw]
+        columns += [column for _, column in raw]
+        metadata = {b"padelhub.sidecar": str(SIDECAR_VERSION).encode()}
+        return pa.Table.from_arrays(columns, names=names).replace_schema_metadata(metadata)
+
+    @staticmethod
+    def _read_text(csv_path: str, encoding: str):
+        with open(csv_path, "r", encoding=encoding, newline="") as f:
+            header = next(csv.reader(f), [])
+        # Everything is read as text first so a malformed cell becomes null instead of failing the file
+        return pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(encoding=encoding, block_size=16 * 1024 * 1024),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header}, strings_can_be_null=False
+            ),
+        )
+
+    def get_path(self, checksum: str) -> Optional[str]:
+        """Local path of the sidecar, or None if the file has none."""
+        if pa is None:
+            return None
+        storage = get_storage()
+        key = self.sidecar_key(checksum)
+        if not storage.exists(key):
+            return None
+        return storage.get_local_path(key)
+
+    def open(self, checksum: str):
+        """Memory-mapped Arrow IPC reader over the sidecar (batches are read zero-copy), or None."""
+        path = self.get_path(checksum)
+        if path is None:
+            return None
+        return pa.ipc.open_file(pa.memory_map(path, "r"))
+
+    def read_table(self, checksum: str):
+        reader = self.open(checksum)
+        return reader.read_all() if reader is not None else None
+
+    @staticmethod
+    def iter_rows(reader):
+        """Header, then the rows of a sidecar: typed values, and the original text of cells that did not convert."""
+        schema_names = reader.schema.names
+        names = [name for name in schema_names if not name.endswith(RAW_SUFFIX)]
+        yield names
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            columns = []
+            for name in names:
+                values = batch.column(name).to_pylist()
+                if name + RAW_SUFFIX in schema_names:
+                    raw = batch.column(name + RAW_SUFFIX).to_pylist()
+                    values = [
+                        raw_value if value is None and raw_value.strip() else value
+                        for value, raw_value in zip(values, raw)
+                    ]
+                columns.append(values)
+            yield from zip(*columns)
+
+    @staticmethod
+    def _lost_cells(text, typed) -> bool:
+        """Whether a non-empty cell of ``text`` became null in ``typed``."""
+        lost = pc.and_(pc.is_null(typed), pc.not_equal(pc.utf8_trim_whitespace(text), ""))
+        return bool(pc.any(lost).as_py())
+
+    @staticmethod
+    def _parse_integers(column, type_name: str):
+        trimmed = pc.utf8_trim_whitespace(column)
+        digits = pc.if_else(pc.match_substring_regex(trimmed, r"^-?\d+$"), trimmed, None)
+        try:
+            return pc.cast(digits, type_name)
+        except pa.ArrowInvalid:
+            # Out-of-range values for the compact type: keep them rather than dropping the sidecar
+            return pc.cast(digits, "int64")
+
+    @staticmethod
+    def _parse_dates(column):
+        parsed = pc.strptime(pc.utf8_trim_whitespace(column), format=DATE_FORMAT, unit="s", error_is_null=True)
+        return pc.cast(parsed, pa.date32())
@@ -1,155 +1,450 @@
 """
 Service for calculating and managing padel-specific dataset metrics.
+
+Metrics are computed column-wise over Arrow record batches: from the file's typed sidecar
+when it has one, otherwise by streaming the CSV in blocks. Without pyarrow a streaming
+row-by-row reader produces the same result.
+
+Each CSV of a dataset gets its own mergeable summary (``PadelFileMetrics``: counts, date
+bounds and a HyperLogLog sketch of the players) and the dataset totals are merged from those,
+so the pipeline stage that runs after files are attached only reads the new files. Catalog
+totals merge the dataset summaries the same way.
 """
 import csv
 import json
 import logging
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime
 from typing import Optional, Dict, Any, List
 
-from app.modules.dataset.models import PadelDatasetMetrics, DataSet
+from app.modules.dataset.models import PadelCatalogAggregate, PadelDatasetMetrics, PadelFileMetrics, DataSet
+from app.modules.dataset.repositories import PadelCatalogAggregateRepository
+from app.modules.dataset.services_columnar import DATE_FORMAT, ColumnarSidecarService, candidate_encodings
+from app.modules.dataset.signals import dataset_files_attached, dataset_published
+from app.modules.dataset.sketches import HyperLogLog
 from app import db
+from core.managers.task_manager import submit_task
 
 logger = logging.getLogger(__name__)
 
+# Optional dependency: pyarrow (vectorized engine). The row-by-row reader is used without it.
+try:  # pragma: no cover - optional in minimal envs
+    import pyarrow as pa  # type: ignore
+    import pyarrow.compute as pc  # type: ignore
+    import pyarrow.csv as pa_csv  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
+
+PLAYER_FIELDS = ["pareja1_jugador1", "pareja1_jugador2", "pareja2_jugador1", "pareja2_jugador2"]
+SET3_FIELDS = ["set3_pareja1", "set3_pareja2"]
+METRIC_COLUMNS = ["nombre_torneo", "categoria", "fecha_inicio_torneo"] + PLAYER_FIELDS + SET3_FIELDS
+CSV_BLOCK_SIZE = 8 * 1024 * 1024
+# Bytes read to guess a file's encoding before the single pass over it
+ENCODING_SAMPLE_BYTES = 4 * 1024 * 1024
+# Breakdowns kept per file/dataset (matches per value), keyed by the catalog dimension name
+BREAKDOWNS = {"year": "matches_by_year", "tournament": "matches_by_tournament", "category": "matches_by_category"}
+
+
+class PadelMetricsAccumulator:
+    """Running padel statistics, fed one Arrow batch (or one CSV row) at a time.
+
+    Players go straight into a HyperLogLog sketch batch by batch, so memory does not grow with
+    the number of distinct players in a file.
+    """
+
+    def __init__(self):
+        self.total_matches = 0
+        self.total_sets = 0
+        self.has_set3 = False
+        self.tournaments = set()
+        self.players = HyperLogLog()
+        self.categories = set()
+        self.date_min: Optional[date] = None
+        self.date_max: Optional[date] = None
+        self.matches_by_year = Counter()
+        self.matches_by_tournament = Counter()
+        self.matches_by_category = Counter()
+
+    def add_batch(self, batch):
+        rows = batch.num_rows
+        if rows == 0:
+            return
+        names = set(batch.schema.names)
+        self.total_matches += rows
+
+        if "nombre_torneo" in names:
+            counts = _value_counts(batch.column("nombre_torneo"))
+            self.tournaments.update(counts)
+            self.matches_by_tournament.update(counts)
+        if "categoria" in names:
+            counts = _value_counts(batch.column("categoria"))
+            self.categories.update(counts)
+            self.matches_by_category.update(counts)
+        for field in PLAYER_FIELDS:
+            if field in names:
+                self.players.update(_distinct(batch.column(field)))
+
+        if "fecha_inicio_torneo" in names:
+            column = batch.column("fecha_inicio_torneo")
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                column = pc.strptime(pc.utf8_trim_whitespace(column), format=DATE_FORMAT, unit="s", error_is_null=True)
+            bounds = pc.min_max(column)
+            self._add_date(bounds["min"].as_py())
+            self._add_date(bounds["max"].as_py())
+            self.matches_by_year.update(
+                {str(year): count for year, count in _value_counts(pc.year(column)).items() if year is not None}
+            )
+
+        with_set3 = None
+        for field in SET3_FIELDS:
+            if field in names:
+                present = _present(batch.column(field))
+                with_set3 = present if with_set3 is None else pc.or_(with_set3, present)
+        set3_matches = (pc.sum(with_set3).as_py() or 0) if with_set3 is not None else 0
+        self.has_set3 = self.has_set3 or set3_matches > 0
+        self.total_sets += 2 * rows + set3_matches
+
+    def add_row(self, row: Dict[str, str]):
+        self.total_matches += 1
+        if row.get("nombre_torneo"):
+            self.tournaments.add(row["nombre_torneo"])
+            self.matches_by_tournament[row["nombre_torneo"]] += 1
+        for field in PLAYER_FIELDS:
+            if row.get(field):
+                self.players.add(row[field])
+        if row.get("categoria"):
+            self.categories.add(row["categoria"])
+            self.matches_by_category[row["categoria"]] += 1
+        if row.get("fecha_inicio_torneo"):
+            try:
+                started = datetime.strptime(row["fecha_inicio_torneo"].strip(), DATE_FORMAT)
+            except ValueError:
+                started = None
+            if started is not None:
+                self._add_date(started)
+                self.matches_by_year[str(started.year)] += 1
+        if row.get("set3_pareja1") or row.get("set3_pareja2"):
+            self.has_set3 = True
+            self.total_sets += 3
+        else:
+            self.total_sets += 2
+
+    def merge(self, other: "PadelMetricsAccumulator"):
+        """Add the statistics of ``other`` (another file) to these."""
+        self.total_matches += other.total_matches
+        self.total_sets += other.total_sets
+        self.has_set3 = self.has_set3 or other.has_set3
+        self.tournaments |= other.tournaments
+        self.players.merge(other.players)
+        self.categories |= other.categories
+        self._add_date(other.date_min)
+        self._add_date(other.date_max)
+        self.matches_by_year.update(other.matches_by_year)
+        self.matches_by_tournament.update(other.matches_by_tournament)
+        self.matches_by_category.update(other.matches_by_category)
+
+    def _add_date(self, value):
+        if value is None:
+            return
+        if isinstance(value, datetime):
+            value = value.date()
+        if self.date_min is None or value < self.date_min:
+            self.date_min = value
+        if self.date_max is None or value > self.date_max:
+            self.date_max = value
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "total_matches": self.total_matches,
+            "tournaments": self.tournaments,
+            "players": self.players,
+            "categories": self.categories,
+            "date_min": self.date_min,
+            "date_max": self.date_max,
+            "has_set3": self.has_set3,
+            "total_sets": self.total_sets,
+            "matches_by_year": self.matches_by_year,
+            "matches_by_tournament": self.matches_by_tournament,
+            "matches_by_category": self.matches_by_category,
+        }
+
+
+def _distinct(column) -> List[str]:
+    """Distinct non-empty values of a (possibly dictionary-encoded) string column."""
+    if pa.types.is_dictionary(column.type):
+        column = pc.cast(column, column.type.value_type)
+    return [value for value in pc.unique(column).to_pylist() if value]
+
+
+def _value_counts(column) -> Dict[Any, int]:
+    """Rows per distinct non-empty value of a column."""
+    if pa.types.is_dictionary(column.type):
+        column = pc.cast(column, column.type.value_type)
+    return {
+        item["values"]: item["counts"]
+        for item in pc.value_counts(column).to_pylist()
+        if item["values"] is not None and item["values"] != ""
+    }
+
+
+def _present(column):
+    """Cells that hold a value: non-empty text, or non-null numbers in a sidecar."""
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return pc.fill_null(pc.not_equal(column, ""), False)
+    return pc.is_valid(column)
+
 
 class PadelMetricsService:
     """Service for calculating statistics from padel match CSV files."""
 
     @staticmethod
-    def calculate_metrics_from_csv(csv_path: str) -> Dict[str, Any]:
+    def calculate_metrics_from_csv(csv_path: str, checksum: Optional[str] = None) -> Dict[str, Any]:
         """
         Analyze a padel CSV file and extract statistics.
-        
+
         Args:
             csv_path: Path to the CSV file
-            
+            checksum: Hubfile checksum; when given, the file's columnar sidecar is used if it exists
+
         Returns:
             Dictionary with calculated metrics
         """
-        metrics = {
-            "total_matches": 0,
-            "tournaments": set(),
-            "players": set(),
-            "categories": set(),
-            "dates": [],
-            "has_set3": False,
-            "total_sets": 0
-        }
+        accumulator = PadelMetricsAccumulator()
+        PadelMetricsService.accumulate(accumulator, csv_path, checksum)
+        return accumulator.result()
 
-        try:
-            # Try different encodings
-            encodings = ["utf-8", "utf-8-sig", "utf-16", "latin-1", "cp1252"]
-            file_content = None
-            
-            for enc in encodings:
-                try:
-                    with open(csv_path, "r", encoding=enc, newline="") as f:
-                        file_content = f.read()
-                    break
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            
-            if not file_content:
-                logger.warning(f"Could not decode CSV file: {csv_path}")
-                return metrics
+    @staticmethod
+    def accumulate(accumulator: PadelMetricsAccumulator, csv_path: str, checksum: Optional[str] = None):
+        """Feed one file into ``accumulator`` (several files can share one accumulator).
 
-            # Parse CSV
-            from io import StringIO
-            reader = csv.DictReader(StringIO(file_content))
-            
-            for row in reader:
-                metrics["total_matches"] += 1
-                
-                # Collect tournament names
-                if row.get("nombre_torneo"):
-                    metrics["tournaments"].add(row["nombre_torneo"])
-                
-                # Collect player names
-                for player_field in [
-                    "pareja1_jugador1", "pareja1_jugador2",
-                    "pareja2_jugador1", "pareja2_jugador2"
-                ]:
-                    if row.get(player_field):
-                        metrics["players"].add(row[player_field])
-                
-                # Collect categories
-                if row.get("categoria"):
-                    metrics["categories"].add(row["categoria"])
-                
-                # Parse dates
-                if row.get("fecha_inicio_torneo"):
-                    try:
-                        date_str = row["fecha_inicio_torneo"]
-                        # Parse DD.MM.YYYY format
-                        date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-                        metrics["dates"].append(date_obj)
-                    except ValueError:
-                        pass
-                
-                # Check for third set
-                if row.get("set3_pareja1") or row.get("set3_pareja2"):
-                    metrics["has_set3"] = True
-                    metrics["total_sets"] += 3
-                else:
-                    metrics["total_sets"] += 2
+        The file is read into its own accumulator and merged at the end, so an attempt that fails
+        halfway (e.g. the guessed encoding breaks deep into the file) is retried without counting
+        any row twice.
+        """
+        if pa is not None:
+            try:
+                accumulator.merge(PadelMetricsService._read_batches(csv_path, checksum))
+                return
+            except Exception as e:
+                logger.warning(f"Columnar metrics failed for {csv_path}, reading rows instead: {e}")
 
+        try:
+            accumulator.merge(PadelMetricsService._read_rows(csv_path))
         except Exception as e:
             logger.exception(f"Error calculating metrics from CSV: {e}")
 
-        return metrics
+    @staticmethod
+    def _read_batches(csv_path: str, checksum: Optional[str] = None) -> PadelMetricsAccumulator:
+        sidecar = ColumnarSidecarService().open(checksum) if checksum else None
+        if sidecar is not None:
+            accumulator = PadelMetricsAccumulator()
+            columns = [name for name in METRIC_COLUMNS if name in sidecar.schema.names]
+            for i in range(sidecar.num_record_batches):
+                accumulator.add_batch(sidecar.get_batch(i).select(columns))
+            return accumulator
+
+        # One pass over the file with the likeliest encoding; another only if it turns out wrong
+        for encoding in PadelMetricsService._candidate_encodings(csv_path):
+            accumulator = PadelMetricsAccumulator()
+            try:
+                for batch in PadelMetricsService._iter_csv_batches(csv_path, encoding):
+                    accumulator.add_batch(batch)
+                return accumulator
+            except (UnicodeError, pa.ArrowInvalid) as e:
+                if not isinstance(e, UnicodeError) and "invalid UTF8" not in str(e):
+                    raise
+        raise ValueError(f"Could not decode CSV file: {csv_path}")
+
+    @staticmethod
+    def _iter_csv_batches(csv_path: str, encoding: str):
+        with open(csv_path, "r", encoding=encoding, newline="") as f:
+            header = next(csv.reader(f), [])
+        columns = [name for name in METRIC_COLUMNS if name in header]
+        reader = pa_csv.open_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(encoding=encoding, block_size=CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={name: pa.string() for name in columns},
+                strings_can_be_null=False,
+            ),
+        )
+        for batch in reader:
+            yield batch
+
+    @staticmethod
+    def _read_rows(csv_path: str) -> PadelMetricsAccumulator:
+        for encoding in PadelMetricsService._candidate_encodings(csv_path):
+            accumulator = PadelMetricsAccumulator()
+            try:
+                with open(csv_path, "r", encoding=encoding, newline="") as f:
+                    for row in csv.DictReader(f):
+                        accumulator.add_row(row)
+                return accumulator
+            except UnicodeError:
+                continue
+        raise ValueError(f"Could not decode CSV file: {csv_path}")
+
+    @staticmethod
+    def _candidate_encodings(csv_path: str) -> List[str]:
+        """Encodings that decode the first ``ENCODING_SAMPLE_BYTES`` of the file, likeliest first."""
+        return candidate_encodings(csv_path, ENCODING_SAMPLE_BYTES)
+
+    @staticmethod
+    def _detect_encoding(csv_path: str) -> Optional[str]:
+        candidates = PadelMetricsService._candidate_encodings(csv_path)
+        return candidates[0] if candidates else None
 
     @staticmethod
-    def create_or_update_metrics(dataset: DataSet, csv_path: str) -> Optional[PadelDatasetMetrics]:
+    def create_or_update_metrics(
+        dataset: DataSet, hubfile_ids: Optional[List[int]] = None
+    ) -> Optional[PadelDatasetMetrics]:
         """
-        Calculate and save padel metrics for a dataset.
-        
+        Bring a dataset's padel metrics up to date across all of its CSV files.
+
+        Only files without a per-file summary, whose content changed since it was computed, or
+        listed in ``hubfile_ids`` are read. The dataset totals are then merged from the summaries,
+        so attaching one file to a large dataset reads just that file.
+
+        Refreshes of one dataset run one at a time, across workers and processes: the dataset row
+        is locked first (``SELECT ... FOR UPDATE``) until the refresh commits, and the summaries
+        are read with locking reads, so a second refresh sees what the first one stored.
+
         Args:
             dataset: The DataSet object
-            csv_path: Path to the CSV file
-            
+            hubfile_ids: Files to recompute even if their summary looks current
+
         Returns:
             PadelDatasetMetrics object or None if error
         """
+        from app.modules.hubfile.services import HubfileService
+
         try:
-            metrics = PadelMetricsService.calculate_metrics_from_csv(csv_path)
-            
-            # Get or create metrics record
-            padel_metrics = PadelDatasetMetrics.query.filter_by(dataset_id=dataset.id).first()
+            PadelMetricsService._lock_dataset(dataset.id)
+            forced = set(hubfile_ids or [])
+            summaries = {
+                row.hubfile_id: row
+                for row in PadelFileMetrics.query.filter_by(dataset_id=dataset.id).with_for_update()
+            }
+            current = set()
+
+            for hubfile, path in HubfileService().get_paths_by_dataset(dataset):
+                if not hubfile.name.lower().endswith(".csv"):
+                    continue
+                current.add(hubfile.id)
+                summary = summaries.get(hubfile.id)
+                if (
+                    summary is not None
+                    and summary.checksum == hubfile.checksum
+                    and summary.players_sketch is not None
+                    and summary.breakdown is not None
+                    and hubfile.id not in forced
+                ):
+                    continue
+                summaries[hubfile.id] = PadelMetricsService._summarize_file(hubfile, path, summary)
+
+            # Summaries of files that are no longer part of the dataset
+            for hubfile_id in set(summaries) - current:
+                db.session.delete(summaries.pop(hubfile_id))
+
+            padel_metrics = PadelDatasetMetrics.query.filter_by(dataset_id=dataset.id).with_for_update().first()
             if not padel_metrics:
+                if not summaries:
+                    # Nothing attached yet (e.g. published before its files were moved in)
+                    db.session.commit()
+                    return None
                 padel_metrics = PadelDatasetMetrics(dataset_id=dataset.id)
-            
-            # Update fields
-            padel_metrics.total_matches = metrics["total_matches"]
-            padel_metrics.total_tournaments = len(metrics["tournaments"])
-            padel_metrics.unique_players = len(metrics["players"])
-            
-            # Date range
-            if metrics["dates"]:
-                padel_metrics.date_range_start = min(metrics["dates"]).date()
-                padel_metrics.date_range_end = max(metrics["dates"]).date()
-            
-            # Categories as JSON
-            padel_metrics.categories = json.dumps(list(metrics["categories"]))
-            
-            # Tournament names as JSON
-            padel_metrics.tournament_names = json.dumps(list(metrics["tournaments"]))
-            
-            # Set 3 stats
-            padel_metrics.has_set3_matches = metrics["has_set3"]
-            if metrics["total_matches"] > 0:
-                padel_metrics.avg_sets_per_match = metrics["total_sets"] / metrics["total_matches"]
-            
+            previous = PadelCatalogService.contribution(padel_metrics)
+            PadelMetricsService._merge_summaries(padel_metrics, summaries.values())
+            padel_metrics.in_catalog = PadelCatalogService.is_public(dataset)
+
             db.session.add(padel_metrics)
+            PadelCatalogService.apply_change(previous, PadelCatalogService.contribution(padel_metrics))
             db.session.commit()
-            
+
             return padel_metrics
-            
+
         except Exception as e:
             logger.exception(f"Error creating/updating padel metrics: {e}")
             db.session.rollback()
             return None
 
+    @staticmethod
+    def _lock_dataset(dataset_id: int):
+        """Hold the dataset's row lock until the current transaction ends (a no-op on SQLite)."""
+        db.session.query(DataSet.id).filter(DataSet.id == dataset_id).with_for_update().scalar()
+
+    @staticmethod
+    def refresh_dataset_metrics(dataset_id: int, hubfile_ids: Optional[List[int]] = None):
+        """Background pipeline stage: recompute the metrics of a dataset by id."""
+        dataset = DataSet.query.get(dataset_id)
+        if dataset is None:
+            return None
+        return PadelMetricsService.create_or_update_metrics(dataset, hubfile_ids)
+
+    @staticmethod
+    def schedule_refresh(dataset_id: int, hubfile_ids: Optional[List[int]] = None):
+        """Queue ``refresh_dataset_metrics`` on the task runner so the request does not wait for it."""
+        return submit_task(PadelMetricsService.refresh_dataset_metrics, dataset_id, hubfile_ids)
+
+    @staticmethod
+    def _summarize_file(hubfile, path: str, summary: Optional[PadelFileMetrics] = None) -> PadelFileMetrics:
+        metrics = PadelMetricsService.calculate_metrics_from_csv(path, hubfile.checksum)
+
+        if summary is None:
+            summary = PadelFileMetrics(hubfile_id=hubfile.id, dataset_id=hubfile.dataset_id)
+        summary.checksum = hubfile.checksum
+        summary.total_matches = metrics["total_matches"]
+        summary.total_sets = metrics["total_sets"]
+        summary.has_set3_matches = metrics["has_set3"]
+        summary.date_range_start = metrics["date_min"]
+        summary.date_range_end = metrics["date_max"]
+        summary.tournament_names = json.dumps(sorted(metrics["tournaments"]))
+        summary.categories = json.dumps(sorted(metrics["categories"]))
+        summary.players_sketch = metrics["players"].to_bytes()
+        summary.breakdown = json.dumps({dimension: dict(metrics[field]) for dimension, field in BREAKDOWNS.items()})
+        summary.computed_at = datetime.utcnow()
+        db.session.add(summary)
+        return summary
+
+    @staticmethod
+    def _merge_summaries(padel_metrics: PadelDatasetMetrics, summaries):
+        total_matches = 0
+        total_sets = 0
+        has_set3 = False
+        tournaments, categories = set(), set()
+        players = HyperLogLog()
+        starts, ends = [], []
+        breakdown = {dimension: Counter() for dimension in BREAKDOWNS}
+
+        for summary in summaries:
+            total_matches += summary.total_matches or 0
+            total_sets += summary.total_sets or 0
+            has_set3 = has_set3 or bool(summary.has_set3_matches)
+            tournaments.update(json.loads(summary.tournament_names or "[]"))
+            categories.update(json.loads(summary.categories or "[]"))
+            if summary.players_sketch:
+                players.merge(HyperLogLog.from_bytes(summary.players_sketch))
+            for dimension, counts in json.loads(summary.breakdown or "{}").items():
+                breakdown[dimension].update(counts)
+            if summary.date_range_start:
+                starts.append(summary.date_range_start)
+            if summary.date_range_end:
+                ends.append(summary.date_range_end)
+
+        padel_metrics.total_matches = total_matches
+        padel_metrics.total_tournaments = len(tournaments)
+        padel_metrics.unique_players = players.count()
+        padel_metrics.players_sketch = players.to_bytes()
+        padel_metrics.total_sets = total_sets
+        padel_metrics.breakdown = json.dumps({dimension: dict(counts) for dimension, counts in breakdown.items()})
+        padel_metrics.date_range_start = min(starts) if starts else None
+        padel_metrics.date_range_end = max(ends) if ends else None
+        padel_metrics.categories = json.dumps(sorted(categories))
+        padel_metrics.tournament_names = json.dumps(sorted(tournaments))
+        padel_metrics.has_set3_matches = has_set3
+        padel_metrics.avg_sets_per_match = total_sets / total_matches if total_matches else None
+
     @staticmethod
     def get_metrics(dataset_id: int) -> Optional[PadelDatasetMetrics]:
         """
@@ -167,3 +462,153 @@ class PadelMetricsService:
     def get_all_metrics() -> List[PadelDatasetMetrics]:
         """Get all padel dataset metrics."""
         return PadelDatasetMetrics.query.all()
+
+    @staticmethod
+    def merge_metrics(metrics_rows: List[PadelDatasetMetrics]) -> Dict[str, Any]:
+        """
+        Combine the stored summaries of several datasets in O(datasets), without reading any CSV.
+
+        Unique players is a HyperLogLog estimate (about 1.6% standard error).
+        """
+        total_matches = 0
+        total_sets = 0
+        players = HyperLogLog()
+        starts, ends = [], []
+        for row in metrics_rows:
+            total_matches += row.total_matches or 0
+            total_sets += row.total_sets or 0
+            if row.players_sketch:
+                players.merge(HyperLogLog.from_bytes(row.players_sketch))
+            if row.date_range_start:
+                starts.append(row.date_range_start)
+            if row.date_range_end:
+                ends.append(row.date_range_end)
+
+        return {
+            "datasets": len(metrics_rows),
+            "total_matches": total_matches,
+            "total_sets": total_sets,
+            "unique_players": players.count(),
+            "date_min": min(starts) if starts else None,
+            "date_max": max(ends) if ends else None,
+        }
+
+
+class PadelCatalogService:
+    """Hub-wide padel analytics served from ``PadelCatalogAggregate``.
+
+    Only published datasets (with a DOI) are counted. Every time a dataset's metrics are
+    recomputed, the difference between its old and new contribution is added to the aggregate
+    rows in the same transaction, so reading the analytics never touches the per-dataset metrics
+    or any CSV. The players estimate keeps the merged sketch of all datasets, into which a grown
+    dataset sketch is merged; only a dataset that lost players makes it merge every dataset again.
+    """
+
+    def __init__(self):
+        self.repository = PadelCatalogAggregateRepository()
+
+    @staticmethod
+    def is_public(dataset: DataSet) -> bool:
+        return bool(dataset.ds_meta_data and dataset.ds_meta_data.dataset_doi)
+
+    @staticmethod
+    def contribution(padel_metrics: PadelDatasetMetrics) -> Dict[str, Any]:
+        """What one dataset adds to the catalog; empty for a draft, a dataset not counted yet or without matches."""
+        if not padel_metrics.in_catalog or padel_metrics.breakdown is None or not padel_metrics.total_matches:
+            return {}
+        return {
+            "matches": padel_metrics.total_matches or 0,
+            "sets": padel_metrics.total_sets or 0,
+            "breakdown": json.loads(padel_metrics.breakdown),
+            "players_sketch": padel_metrics.players_sketch,
+        }
+
+    @staticmethod
+    def apply_change(previous: Dict[str, Any], current: Dict[str, Any]):
+        deltas = {}
+        for key in ("matches", "sets"):
+            deltas[(PadelCatalogAggregate.TOTAL, key)] = (
+                current.get(key, 0) - previous.get(key, 0),
+                bool(current) - bool(previous),
+            )
+        for dimension in PadelCatalogAggregate.DIMENSIONS:
+            before = previous.get("breakdown", {}).get(dimension, {})
+            after = current.get("breakdown", {}).get(dimension, {})
+            for key in set(before) | set(after):
+                deltas[(dimension, key)] = (after.get(key, 0) - before.get(key, 0), (key in after) - (key in before))
+
+        # The players estimate is set below; the delta only keeps its dataset count
+        deltas[(PadelCatalogAggregate.TOTAL, "players")] = (0, bool(current) - bool(previous))
+
+        repository = PadelCatalogAggregateRepository()
+        repository.apply_deltas(deltas)
+        if previous or current:
+            PadelCatalogService._update_players(
+                repository, previous.get("players_sketch"), current.get("players_sketch")
+            )
+
+    @staticmethod
+    def _update_players(
+        repository: PadelCatalogAggregateRepository, previous: Optional[bytes], current: Optional[bytes]
+    ):
+        # Locked, so two refreshes cannot each merge into the same old sketch
+        row = repository.get_total_for_update("players")
+        catalog = HyperLogLog.from_bytes(row.sketch) if row is not None and row.sketch else None
+        before, after = HyperLogLog.from_bytes(previous), HyperLogLog.from_bytes(current)
+        if catalog is not None and after.includes(before):
+            catalog.merge(after)
+        else:
+            # Sketches cannot be subtracted: a dataset that lost players means merging them all again
+            db.session.flush()
+            sketches = db.session.query(PadelDatasetMetrics.players_sketch).filter(
+                PadelDatasetMetrics.in_catalog.is_(True),
+                PadelDatasetMetrics.breakdown.isnot(None),
+                PadelDatasetMetrics.total_matches > 0,
+            )
+            catalog = HyperLogLog.merge_all(sketch for (sketch,) in sketches)
+        repository.set_total("players", catalog.count(), catalog.to_bytes())
+
+    def rebuild(self):
+        """Recompute the aggregate from the stored dataset metrics (after a migration or data repair)."""
+        self.repository.clear()
+        rows = PadelDatasetMetrics.query.filter(PadelDatasetMetrics.breakdown.isnot(None)).all()
+        for padel_metrics in rows:
+            padel_metrics.in_catalog = self.is_public(padel_metrics.dataset)
+        db.session.flush()
+        for padel_metrics in rows:
+            self.apply_change({}, self.contribution(padel_metrics))
+        db.session.commit()
+
+    def get_analytics(self, dimension: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+        totals = self.repository.get_totals()
+        matches = totals.get("matches")
+        players = totals.get("players")
+        analytics = {
+            "totals": {
+                "datasets": matches.datasets if matches else 0,
+                "matches": matches.value if matches else 0,
+                "sets": totals["sets"].value if "sets" in totals else 0,
+                "unique_players": players.value if players else 0,
+            }
+        }
+        dimensions = [dimension] if dimension else PadelCatalogAggregate.DIMENSIONS
+        for name in dimensions:
+            # Years read best in order; the other breakdowns are rankings
+            rows = self.repository.get_dimension(name, limit=None if name == "year" else limit,
+                                                 order_by_key=name == "year")
+            analytics[name] = [{"key": row.key, "matches": row.value, "datasets": row.datasets} for row in rows]
+        return analytics
+
+
+@dataset_published.connect
+def refresh_metrics_on_publish(sender, dataset_id=None, **kwargs):
+    """Catch up on files attached while the dataset was a draft (a no-op when metrics are current)."""
+    if dataset_id:
+        PadelMetricsService.schedule_refresh(dataset_id)
+
+
+@dataset_files_attached.connect
+def refresh_metrics_on_attach(sender, dataset_id=None, hubfile_ids=None, **kwargs):
+    """Only the new files are read, then merged with the stored summaries of the others."""
+    if dataset_id:
+        PadelMetricsService.schedule_refresh(dataset_id, hubfile_ids)
@@ -0,0 +1,269 @@
+"""
+Publication of a local dataset to Zenodo (fakenodo in this deployment).
+
+Requests never talk to Zenodo themselves: they record a ``PublicationJob`` and hand it to the
+task runner. The job moves the dataset through pending, publishing and published. A failed
+attempt goes back to pending and is retried after an exponentially growing delay, until
+``MAX_ATTEMPTS`` is reached and the job is marked failed. Jobs are rows in the database, so a job
+whose process stopped (a retry timer lost with a restart, a worker that died while publishing) is
+resumed by ``resume``. A serving app runs it when it starts and every ``PUBLICATION_SWEEP_SECONDS``
+from one process (see ``start_publication_sweeper``); ``scripts/resume_publication_jobs.py`` runs it
+by hand.
+An attempt first asks Zenodo for the state of the deposition, so a deposition published by an
+attempt that died before storing the DOI is not published again.
+"""
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+
+from app.modules.dataset.models import DataSet, PublicationJob
+from app.modules.dataset.repositories import PublicationJobRepository
+from app.modules.dataset.services import DataSetService
+from app.modules.fakenodo.services import FakenodoService
+from core.managers.task_manager import EXTENSION_KEY, submit_task, submit_task_later
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# A job left "publishing" for this long belongs to a worker that died
+STALE_AFTER = timedelta(minutes=15)
+# Datasets published at the same time by a bulk sync that waits for the result
+SYNC_WORKERS = 4
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: base * 2^(attempts - 1), capped, with jitter."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    # Spread retries of jobs that failed together (e.g. during an outage)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def resume_publication_jobs(zenodo_service=None) -> int:
+    """Task run by the sweeper: restart every publication job whose process stopped."""
+    resumed = DataSetPublicationService(zenodo_service).resume()
+    if resumed:
+        logger.info(f"Resumed {resumed} publication jobs")
+    return resumed
+
+
+def start_publication_sweeper(app, runner=None, zenodo_service=None):
+    """Resume publication jobs now and every ``PUBLICATION_SWEEP_SECONDS`` on the task runner.
+
+    Any number of processes can call this: the ``PUBLICATION_SWEEP_LOCK`` file makes sure only
+    one of them sweeps at a time. Disabled when the interval is 0 (tests).
+    """
+    interval = app.config.get("PUBLICATION_SWEEP_SECONDS", 0)
+    runner = runner or app.extensions.get(EXTENSION_KEY)
+    if interval <= 0 or runner is None:
+        return None
+    return runner.schedule_every(
+        interval, resume_publication_jobs, zenodo_service, lock_path=app.config.get("PUBLICATION_SWEEP_LOCK")
+    )
+
+
+def init_publication_sweeper(app):
+    """Start the sweeper with the first request the process serves, so CLI commands and scripts
+    that only import the app (``flask db upgrade``, seeders) never sweep."""
+    if app.config.get("PUBLICATION_SWEEP_SECONDS", 0) <= 0:
+        return
+    started = []
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_publication_sweeper_once():
+        if started:
+            return
+        with lock:
+            if not started:
+                started.append(start_publication_sweeper(app))
+
+
+class DataSetPublicationService:
+    def __init__(self, zenodo_service=None):
+        self.zenodo_service = zenodo_service or FakenodoService()
+        self.dataset_service = DataSetService()
+        self.job_repository = PublicationJobRepository()
+
+    def enqueue(self, dataset: DataSet) -> PublicationJob:
+        """Record a publication job for the dataset and start it in the background."""
+        job = self.job_repository.reset(dataset.id)
+        submit_task(self.run, dataset.id)
+        return job
+
+    def sync_all(
+        self,
+        user_id: Optional[int] = None,
+        include_anonymous: bool = False,
+        wait: bool = False,
+        workers: int = SYNC_WORKERS,
+    ) -> dict:
+        """Publish every unsynchronized dataset of ``user_id``, or of every user when it is None.
+
+        Zenodo is checked once for the whole batch. Datasets with a job already running are left
+        alone, and anonymous ones are skipped unless ``include_anonymous`` (publishing them reveals
+        their authors). Each dataset then goes through the same job as a single sync: with ``wait``
+        the jobs run on ``workers`` threads of this call, otherwise on the task runner.
+
+        Returns a report with ``connected``, the ``datasets`` queued and their job status, and the
+        ``skipped`` ones with the reason.
+        """
+        if user_id is None:
+            datasets = self.dataset_service.repository.get_all_unsynchronized()
+        else:
+            datasets = self.dataset_service.get_unsynchronized(user_id)
+        report = {"connected": True, "datasets": {}, "skipped": {}}
+
+        queued = []
+        for dataset in datasets:
+            status = dataset.get_publication_status()
+            if status in (PublicationJob.PENDING, PublicationJob.PUBLISHING):
+                report["skipped"][dataset.id] = "already being published"
+            elif dataset.ds_meta_data.anonymous and not include_anonymous:
+                report["skipped"][dataset.id] = "anonymous"
+            else:
+                queued.append(dataset)
+        if not queued:
+            return report
+
+        try:
+            report["connected"] = bool(self.zenodo_service.test_connection())
+        except Exception as exc:
+            logger.warning(f"Zenodo connection check failed: {exc}")
+            report["connected"] = False
+        if not report["connected"]:
+            return report
+
+        for dataset in queued:
+            if dataset.ds_meta_data.anonymous:
+                self.dataset_service.update_dsmetadata(dataset.ds_meta_data_id, anonymous=False)
+            self.job_repository.reset(dataset.id)
+        dataset_ids = [dataset.id for dataset in queued]
+
+        if wait:
+            app = current_app._get_current_object()
+
+            def run_in_app(dataset_id):
+                with app.app_context():
+                    return self.run(dataset_id)
+
+            with ThreadPoolExecutor(max_workers=min(workers, len(dataset_ids))) as executor:
+                list(executor.map(run_in_app, dataset_ids))
+            self.job_repository.session.expire_all()
+        else:
+            for dataset_id in dataset_ids:
+                submit_task(self.run, dataset_id)
+
+        for dataset_id in dataset_ids:
+            job = self.job_repository.get_by_dataset(dataset_id)
+            report["datasets"][dataset_id] = job.to_dict() if job else {"status": PublicationJob.PENDING}
+        return report
+
+    def run(self, dataset_id: int) -> Optional[str]:
+        """One publication attempt. Returns the DOI when the dataset got published."""
+        if not self.job_repository.claim(dataset_id):
+            # Already published, failed, or taken by another worker
+            return None
+        job = self.job_repository.get_by_dataset(dataset_id)
+        dataset = self.dataset_service.get_by_id(dataset_id)
+        if dataset is None:
+            return None
+
+        job.attempts += 1
+        self.job_repository.session.commit()
+        try:
+            doi = self.publish(dataset)
+            if not doi:
+                raise RuntimeError("Zenodo did not create a deposition")
+        except Exception as exc:
+            self.job_repository.session.rollback()
+            job = self.job_repository.get_by_dataset(dataset_id)
+            job.last_error = str(exc)[:2000]
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = PublicationJob.FAILED
+                job.next_attempt_at = None
+                self.job_repository.session.commit()
+                logger.error(f"Publication of dataset {dataset_id} failed after {job.attempts} attempts: {exc}")
+                return None
+            delay = retry_delay(job.attempts)
+            job.status = PublicationJob.PENDING
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            self.job_repository.session.commit()
+            logger.warning(
+                f"Publication of dataset {dataset_id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {exc}"
+            )
+            submit_task_later(delay, self.run, dataset_id)
+            return None
+
+        job.status = PublicationJob.PUBLISHED
+        job.last_error = None
+        job.next_attempt_at = None
+        self.job_repository.session.commit()
+        return doi
+
+    def publish(self, dataset: DataSet) -> Optional[str]:
+        """Create the deposition (unless an earlier attempt did), upload the files, publish it and
+        store the DOI. A deposition an earlier attempt already submitted only has its DOI stored.
+
+        Returns the DOI, or None when the API did not create a deposition. Errors from the API
+        are raised to the caller.
+        """
+        deposition_id = dataset.ds_meta_data.deposition_id
+        if deposition_id:
+            deposition = self.zenodo_service.get_deposition(deposition_id)
+            if self._is_submitted(deposition):
+                # Publishing again would create a new version of the record
+                logger.info(f"Deposition {deposition_id} was already published, storing its DOI")
+                deposition_doi = deposition.get("doi") or self.zenodo_service.get_doi(deposition_id)
+                self.dataset_service.update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=deposition_doi)
+                return deposition_doi
+        else:
+            data = self.zenodo_service.create_new_deposition(dataset)
+            # Some Zenodo/fakenodo endpoints do not return `conceptrecid` but they do return an `id`
+            if not (data.get("conceptrecid") or data.get("id")):
+                logger.debug("Zenodo response without deposition id: %s", data)
+                return None
+            deposition_id = data.get("id")
+            self.dataset_service.update_dsmetadata(dataset.ds_meta_data_id, deposition_id=deposition_id)
+
+        # Files uploaded by an earlier attempt are skipped
+        report = self.zenodo_service.upload_files(dataset, deposition_id)
+        if report["failed"]:
+            raise RuntimeError(f"Could not upload {sorted(report['failed'])} to deposition {deposition_id}")
+        logger.info(
+            f"Deposition {deposition_id}: {len(report['uploaded'])} files uploaded, "
+            f"{len(report['skipped'])} already there"
+        )
+        self.zenodo_service.publish_deposition(deposition_id)
+        deposition_doi = self.zenodo_service.get_doi(deposition_id)
+        self.dataset_service.update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=deposition_doi)
+        return deposition_doi
+
+    @staticmethod
+    def _is_submitted(deposition: dict) -> bool:
+        # Zenodo reports "submitted" and the state "done"; fakenodo reports "published"
+        return bool(deposition.get("submitted") or deposition.get("state") == "done" or deposition.get("published"))
+
+    def resume(self) -> int:
+        """Restart jobs that are due but have no timer (process restarted) or whose worker died."""
+        now = datetime.utcnow()
+        dataset_ids = self.job_repository.due(now, now - STALE_AFTER)
+        for dataset_id in dataset_ids:
+            # A job claimed again since `due` looked at it is left to its worker; `run` then finds
+            # nothing to claim
+            self.job_repository.requeue(dataset_id, now - STALE_AFTER)
+            submit_task(self.run, dataset_id)
+        return len(dataset_ids)
+
+    def get_status(self, dataset: DataSet) -> dict:
+        job = self.job_repository.get_by_dataset(dataset.id)
+        status = dict(job.to_dict()) if job else {"status": "draft", "attempts": 0}
+        status["status"] = dataset.get_publication_status()
+        status["dataset_doi"] = dataset.ds_meta_data.dataset_doi
+        return status
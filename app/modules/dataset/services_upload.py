@@ -0,0 +1,333 @@
+"""
+Chunked, resumable CSV uploads with validation while the file arrives.
+
+The client sends the file as a sequence of chunks (Dropzone's chunking protocol: an upload id,
+the byte offset of the chunk and the total size). Chunks are appended to a partial file in the
+user's temp folder and validated right away by ``StreamingPadelValidator``, so a bad header or
+row stops the upload after the chunk that contains it. The upload state lives in a JSON file
+beside the partial file, so any worker can take the next chunk, and a client that lost its
+connection can ask for the received offset and continue from there. Requests for the same
+upload hold a file lock, so a retried chunk never races the original.
+
+Every accepted file is hashed once, right after validation while it is still in the page cache.
+``UploadFinalizeService`` reuses those hashes when the dataset is created, renames the files into
+storage and inserts all their Hubfile rows at once.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.modules.dataset.services_columnar import ColumnarSidecarService
+from app.modules.dataset.types.tabular import StreamingPadelValidator, TabularDataset
+from app.modules.hubfile.repositories import HubfileRepository
+from core.managers.storage_manager import get_storage
+from core.managers.task_manager import submit_task
+from core.storage import hash_file, storage_key
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ID_PATTERN = re.compile(r"^[A-Za-z0-9-]{8,64}$")
+PARTIAL_FOLDER = ".partial"
+CHECKSUMS_FOLDER = ".checksums"
+# Files without a recorded checksum are hashed on this many threads at finalize time
+HASH_WORKERS = 8
+COPY_BUFFER = 64 * 1024
+# Partial uploads untouched for this long are abandoned and removed
+STALE_AFTER_SECONDS = 24 * 3600
+
+
+def unique_path(folder: str, filename: str) -> Tuple[str, str]:
+    """Path for ``filename`` in ``folder``, adding " (n)" before the extension if it is taken."""
+    if not os.path.exists(os.path.join(folder, filename)):
+        return os.path.join(folder, filename), filename
+    base_name, extension = os.path.splitext(filename)
+    i = 1
+    while os.path.exists(os.path.join(folder, f"{base_name} ({i}){extension}")):
+        i += 1
+    new_filename = f"{base_name} ({i}){extension}"
+    return os.path.join(folder, new_filename), new_filename
+
+
+def validate_csv_upload(file_path: str, filename: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Syntax and padel structure checks for a whole uploaded CSV.
+
+    Returns ``(error, encoding)``: ``error`` is the upload endpoint's 400 response body, or None
+    when the file is valid.
+    """
+    try:
+        tab = TabularDataset(None)
+        validation = tab.validate_syntax(file_path)
+    except Exception as e:
+        validation = {"valid": False, "message": f"Internal validation error: {e}"}
+
+    if not validation.get("valid"):
+        # Return helpful info to the user: line and message when available
+        resp = {"message": "CSV syntax error", "filename": filename}
+        if "line" in validation:
+            resp["line"] = validation["line"]
+        if "message" in validation:
+            resp["error"] = validation["message"]
+        if "encoding" in validation:
+            resp["encoding_attempted"] = validation["encoding"]
+        if "snippet" in validation and validation.get("snippet"):
+            resp["snippet"] = validation.get("snippet")
+        return resp, None
+
+    try:
+        padel_validation = tab.validate_padel_structure(file_path)
+    except Exception as e:
+        padel_validation = {"valid": False, "errors": [f"Internal validation error: {e}"]}
+
+    if not padel_validation.get("valid"):
+        return {
+            "message": "CSV structure error: file does not match required padel match format",
+            "filename": filename,
+            "errors": padel_validation.get("errors", []),
+            "required_columns": padel_validation.get("required_columns", []),
+        }, None
+
+    return None, validation.get("encoding")
+
+
+def _checksum_path(temp_folder: str, filename: str) -> str:
+    return os.path.join(temp_folder, CHECKSUMS_FOLDER, f"{filename}.json")
+
+
+def record_checksums(temp_folder: str, filename: str, hashes: Optional[Tuple[str, str, int]] = None):
+    """Hash an accepted upload (unless ``hashes`` is given) and remember it for ``UploadFinalizeService``."""
+    file_path = os.path.join(temp_folder, filename)
+    md5, sha256, size = hashes or hash_file(file_path)
+    record_path = _checksum_path(temp_folder, filename)
+    os.makedirs(os.path.dirname(record_path), exist_ok=True)
+    with open(record_path, "w", encoding="utf-8") as f:
+        json.dump({"md5": md5, "sha256": sha256, "size": size, "mtime_ns": os.stat(file_path).st_mtime_ns}, f)
+
+
+def forget_checksums(temp_folder: str, filename: str):
+    record_path = _checksum_path(temp_folder, filename)
+    if os.path.exists(record_path):
+        os.remove(record_path)
+
+
+def recorded_checksums(temp_folder: str, filename: str) -> Optional[Tuple[str, str, int]]:
+    """The ``hash_file`` result recorded at upload time, if the file has not changed since."""
+    try:
+        with open(_checksum_path(temp_folder, filename), "r", encoding="utf-8") as f:
+            record = json.load(f)
+        stat = os.stat(os.path.join(temp_folder, filename))
+    except (OSError, ValueError):
+        return None
+    if record.get("size") != stat.st_size or record.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return record["md5"], record["sha256"], record["size"]
+
+
+class ChunkedUploadService:
+    def __init__(self, temp_folder: str):
+        self.temp_folder = temp_folder
+        self.partial_folder = os.path.join(temp_folder, PARTIAL_FOLDER)
+
+    @staticmethod
+    def is_valid_id(upload_id: Optional[str]) -> bool:
+        return bool(upload_id and UPLOAD_ID_PATTERN.match(upload_id))
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.partial_folder, f"{upload_id}.part"),
+            os.path.join(self.partial_folder, f"{upload_id}.json"),
+        )
+
+    def _lock_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_folder, f"{upload_id}.lock")
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        """Hold the upload's lock across workers until the block ends.
+
+        The lock is a file of its own because the state file is replaced on every save. A lock
+        file removed while we waited is stale, so we lock the new one instead.
+        """
+        os.makedirs(self.partial_folder, exist_ok=True)
+        lock_path = self._lock_path(upload_id)
+        while True:
+            with open(lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    same_file = os.path.samestat(os.fstat(lock.fileno()), os.stat(lock_path))
+                except FileNotFoundError:
+                    same_file = False
+                if same_file:
+                    yield
+                    return
+
+    def _load(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        _, state_path = self._paths(upload_id)
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, upload_id: str, state: Dict[str, Any]):
+        _, state_path = self._paths(upload_id)
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def status(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        state = self._load(upload_id)
+        if state is None:
+            return None
+        return {
+            "upload_id": upload_id,
+            "filename": state["filename"],
+            "received": state["received"],
+            "total_size": state["total_size"],
+            "rejected": state.get("rejected"),
+        }
+
+    def receive(self, upload_id: str, filename: str, offset: int, total_size: int, stream) -> Tuple[int, Dict]:
+        """Append one chunk. Returns (HTTP status, response body)."""
+        with self._locked(upload_id):
+            return self._receive(upload_id, filename, offset, total_size, stream)
+
+    def _receive(self, upload_id: str, filename: str, offset: int, total_size: int, stream) -> Tuple[int, Dict]:
+        part_path, _ = self._paths(upload_id)
+        state = self._load(upload_id)
+
+        if state is None:
+            if offset != 0:
+                return 409, {"message": "Unknown upload, start again from offset 0", "received": 0}
+            self.collect_stale()
+            state = {"filename": filename, "total_size": total_size, "received": 0, "validator": None}
+            open(part_path, "wb").close()
+
+        if state.get("rejected"):
+            # Retries of a rejected upload get the same answer without reprocessing anything
+            return 400, state["rejected"]
+        if offset < state["received"]:
+            # A chunk that was stored but whose response was lost: acknowledge it again
+            return 200, {"received": state["received"]}
+        if offset > state["received"]:
+            return 409, {"message": "Chunk out of order, resume from 'received'", "received": state["received"]}
+
+        remaining = state["total_size"] - state["received"]
+        written = 0
+        with open(part_path, "r+b") as f:
+            # Bytes past the recorded offset are from a chunk whose state was never saved
+            f.seek(state["received"])
+            f.truncate()
+            while True:
+                buffer = stream.read(COPY_BUFFER)
+                if not buffer:
+                    break
+                written += len(buffer)
+                if written > remaining:
+                    return self._reject(upload_id, state, {"message": "Upload is larger than announced"})
+                f.write(buffer)
+        state["received"] += written
+        final = state["received"] >= state["total_size"]
+
+        validator = StreamingPadelValidator(state["validator"])
+        try:
+            error = validator.feed(part_path, final=final)
+        except Exception as e:
+            logger.exception(f"Streaming validation failed for upload {upload_id}: {e}")
+            error = {"message": "CSV syntax error", "error": f"Internal validation error: {e}"}
+        if error:
+            return self._reject(upload_id, state, error)
+        state["validator"] = validator.state
+
+        if not final:
+            self._save(upload_id, state)
+            return 200, {"received": state["received"]}
+
+        file_path, new_filename = unique_path(self.temp_folder, state["filename"])
+        os.replace(part_path, file_path)
+        self.discard(upload_id)
+        record_checksums(self.temp_folder, new_filename)
+        return 200, {
+            "message": "CSV uploaded and validated successfully",
+            "filename": new_filename,
+            "encoding": validator.state["encoding"],
+        }
+
+    def _reject(self, upload_id: str, state: Dict[str, Any], error: Dict[str, Any]) -> Tuple[int, Dict]:
+        part_path, _ = self._paths(upload_id)
+        error = dict(error, filename=state["filename"])
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        state["rejected"] = error
+        self._save(upload_id, state)
+        return 400, error
+
+    def discard(self, upload_id: str):
+        for path in (*self._paths(upload_id), self._lock_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def collect_stale(self, max_age: int = STALE_AFTER_SECONDS):
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.partial_folder):
+            path = os.path.join(self.partial_folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+class UploadFinalizeService:
+    """Moves a user's validated uploads into a new dataset."""
+
+    def __init__(self):
+        self.hubfile_repository = HubfileRepository()
+        self.sidecar_service = ColumnarSidecarService()
+
+    def finalize(self, temp_folder: str, user_id: int, dataset_id: int) -> List[int]:
+        """Store every CSV in ``temp_folder`` under the dataset and create their Hubfiles.
+
+        Returns the new Hubfile ids; the caller commits.
+        """
+        filenames = sorted(
+            name for name in os.listdir(temp_folder)
+            if name.lower().endswith(".csv") and os.path.isfile(os.path.join(temp_folder, name))
+        )
+        logger.info(f"Finalizing {len(filenames)} uploaded files from {temp_folder}")
+        if not filenames:
+            return []
+
+        hashes = {name: recorded_checksums(temp_folder, name) for name in filenames}
+        missing = [name for name, value in hashes.items() if value is None]
+        if missing:
+            # hashlib releases the GIL on large buffers, so threads hash files in parallel
+            with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(missing))) as executor:
+                paths = [os.path.join(temp_folder, name) for name in missing]
+                hashes.update(zip(missing, executor.map(hash_file, paths)))
+
+        storage = get_storage()
+        rows = []
+        for name in filenames:
+            key = storage_key(user_id, dataset_id, name)
+            stored = storage.save(key, os.path.join(temp_folder, name), hashes=hashes[name])
+            rows.append({"name": name, "checksum": stored.checksum, "size": stored.size, "key": key})
+
+        hubfile_ids = self.hubfile_repository.create_many(
+            dataset_id, [{"name": r["name"], "checksum": r["checksum"], "size": r["size"]} for r in rows]
+        )
+
+        # Typed columnar copies for analytics/export readers (skipped without pyarrow)
+        submit_task(self.build_sidecars, [(r["checksum"], r["key"]) for r in rows])
+        return hubfile_ids
+
+    def build_sidecars(self, files: List[Tuple[str, str]]):
+        storage = get_storage()
+        for checksum, key in files:
+            self.sidecar_service.build(checksum, storage.get_local_path(key))
@@ -0,0 +1,15 @@
+"""Dataset lifecycle signals.
+
+Other modules subscribe to these to keep derived data (caches, aggregates) in sync
+without the dataset module having to know about them.
+"""
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent once when a dataset gets its DOI. Receivers get `dataset_id` as keyword argument.
+dataset_published = _signals.signal("dataset-published")
+
+# Sent after new files of a dataset are committed. Receivers get `dataset_id` and `hubfile_ids`.
+dataset_files_attached = _signals.signal("dataset-files-attached")
@@ -0,0 +1,84 @@
+"""
+Mergeable cardinality sketches for padel statistics.
+
+A ``HyperLogLog`` estimates how many distinct values were added using a fixed number of
+small registers, whatever the cardinality. Two sketches merge by taking the register-wise
+maximum, so per-file sketches combine into dataset and catalog counts without re-reading
+any CSV and without keeping the values themselves.
+"""
+import hashlib
+import math
+import zlib
+from typing import Iterable, Optional
+
+DEFAULT_PRECISION = 12  # 4096 registers, ~1.6% standard error
+
+
+class HyperLogLog:
+    """HyperLogLog counter with 64-bit hashes and linear counting for small cardinalities."""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is not None and len(registers) != self.size:
+            raise ValueError("register count does not match precision")
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+
+    def add(self, value: str):
+        digest = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = digest >> (64 - self.precision)
+        remaining = digest & ((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1-bit in the remaining (64 - p) bits
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            if value:
+                self.add(value)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def includes(self, other: "HyperLogLog") -> bool:
+        """Whether merging ``other`` into this sketch would change nothing."""
+        return other.precision == self.precision and all(map(int.__ge__, self.registers, other.registers))
+
+    def __eq__(self, other):
+        if not isinstance(other, HyperLogLog):
+            return NotImplemented
+        return self.precision == other.precision and self.registers == other.registers
+
+    def count(self) -> int:
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(self.size, 0.7213 / (1 + 1.079 / self.size))
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        # Mostly-empty registers (small files) compress to a few bytes
+        return zlib.compress(bytes([self.precision]) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "HyperLogLog":
+        if not data:
+            return cls()
+        raw = zlib.decompress(data)
+        return cls(precision=raw[0], registers=raw[1:])
+
+    @classmethod
+    def merge_all(cls, sketches: Iterable[Optional[bytes]]) -> "HyperLogLog":
+        merged = cls()
+        for data in sketches:
+            if data:
+                merged.merge(cls.from_bytes(data))
+        return merged
@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import (
+    ActivityMetric,
+    DataSet,
+    DSActivityRollup,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+    TournamentType,
+)
+from app.modules.dataset.services import DataSetService, DSActivityRollupService
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """Creates an owner and a visitor; the owner has two datasets, one already published."""
+    with test_client.application.app_context():
+        owner = User(email="rollup_owner@example.com", password="test1234")
+        visitor = User(email="rollup_visitor@example.com", password="test1234")
+        db.session.add_all([owner, visitor])
+        db.session.commit()
+
+        for title, doi in (("Rollup 1", "10.1234/rollup.1"), ("Rollup 2", None)):
+            metadata = DSMetaData(title=title, description=title, tournament_type=TournamentType.OPEN, dataset_doi=doi)
+            db.session.add(metadata)
+            db.session.commit()
+            db.session.add(DataSet(user_id=owner.id, ds_meta_data_id=metadata.id))
+            db.session.commit()
+
+    yield test_client
+
+
+def _users():
+    return (
+        User.query.filter_by(email="rollup_owner@example.com").first(),
+        User.query.filter_by(email="rollup_visitor@example.com").first(),
+    )
+
+
+def _datasets():
+    return DataSet.query.join(DSMetaData).filter(DSMetaData.title.like("Rollup%")).order_by(DataSet.id).all()
+
+
+def test_rollups_track_uploads_and_publications(test_client):
+    owner, _ = _users()
+    ds1, ds2 = _datasets()
+
+    totals = DSActivityRollupService().get_user_dashboard(owner.id)["totals"]
+    assert totals[ActivityMetric.UPLOADS] == 2
+    assert totals[ActivityMetric.SYNCHRONIZATIONS] == 1
+
+    DataSetService().update_dsmetadata(ds2.ds_meta_data_id, dataset_doi="10.1234/rollup.2")
+
+    totals = DSActivityRollupService().get_user_dashboard(owner.id)["totals"]
+    assert totals[ActivityMetric.SYNCHRONIZATIONS] == 2
+
+
+def test_rollups_track_views_and_downloads_in_buckets(test_client):
+    owner, visitor = _users()
+    ds1, ds2 = _datasets()
+    now = datetime.now(timezone.utc)
+    three_days_ago = now - timedelta(days=3)
+
+    db.session.add_all([
+        DSViewRecord(user_id=visitor.id, dataset_id=ds1.id, view_date=now, view_cookie="v1"),
+        DSViewRecord(user_id=visitor.id, dataset_id=ds2.id, view_date=now, view_cookie="v2"),
+        DSViewRecord(user_id=None, dataset_id=ds1.id, view_date=three_days_ago, view_cookie="v3"),
+        DSDownloadRecord(user_id=visitor.id, dataset_id=ds1.id, download_date=now, download_cookie="d1"),
+    ])
+    db.session.commit()
+
+    owner_view = DSActivityRollupService().get_user_dashboard(owner.id)
+    assert owner_view["totals"][ActivityMetric.VIEWS_RECEIVED] == 3
+    assert owner_view["totals"][ActivityMetric.DOWNLOADS_RECEIVED] == 1
+    assert owner_view["last_24h"][ActivityMetric.VIEWS_RECEIVED] == 2
+    assert owner_view["series"][ActivityMetric.VIEWS_RECEIVED][-1] == 2
+    assert owner_view["series"][ActivityMetric.VIEWS_RECEIVED][-4] == 1
+    assert len(owner_view["labels"]) == 30
+
+    visitor_view = DSActivityRollupService().get_user_dashboard(visitor.id)
+    assert visitor_view["totals"][ActivityMetric.DOWNLOADS_MADE] == 1
+    assert visitor_view["totals"][ActivityMetric.VIEWS_RECEIVED] == 0
+
+    # Same-bucket events share one row per granularity
+    assert DSActivityRollup.query.filter_by(
+        metric=ActivityMetric.VIEWS_RECEIVED, dataset_id=ds1.id, granularity=DSActivityRollup.HOUR
+    ).count() == 2
@@ -0,0 +1,132 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from app.modules.auth.models import User
+from app.modules.auth.services import AuthenticationService
+from app.modules.dataset.tests.test_upload_endpoint import _padel_rows, login_client
+
+
+def _temp_folder():
+    user = User.query.filter_by(email='test@example.com').first()
+    return AuthenticationService().temp_folder_by_user(user)
+
+
+def _cleanup(report):
+    temp_folder = _temp_folder()
+    for entry in report['files']:
+        if entry.get('stored_as'):
+            os.remove(os.path.join(temp_folder, entry['stored_as']))
+
+
+def test_zip_upload_reports_every_member(test_client):
+    login_client(test_client)
+    header, rows = _padel_rows(20)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('season/archive_round1.csv', header + rows)
+        archive.writestr('season/archive_round2.csv', header + rows)
+        archive.writestr('season/archive_bad.csv', b'name,score\nJuan,3\n')
+        archive.writestr('season/README.txt', b'notes')
+        archive.writestr('__MACOSX/season/._archive_round1.csv', b'\x00')
+    buffer.seek(0)
+
+    resp = test_client.post(
+        '/dataset/file/upload/archive',
+        data={'file': (buffer, 'season.zip')},
+        content_type='multipart/form-data',
+    )
+    assert resp.status_code == 200
+    report = resp.get_json()
+    assert (report['accepted'], report['rejected']) == (2, 1)
+    statuses = {entry['filename']: entry['status'] for entry in report['files']}
+    assert statuses == {
+        'season/archive_round1.csv': 'accepted',
+        'season/archive_round2.csv': 'accepted',
+        'season/archive_bad.csv': 'rejected',
+        'season/README.txt': 'skipped',
+        '__MACOSX/season/._archive_round1.csv': 'skipped',
+    }
+    bad = next(entry for entry in report['files'] if entry['status'] == 'rejected')
+    assert bad['message'].startswith('CSV structure error')
+
+    temp_folder = _temp_folder()
+    with open(os.path.join(temp_folder, 'archive_round1.csv'), 'rb') as fh:
+        assert fh.read() == header + rows
+    assert not os.path.exists(os.path.join(temp_folder, 'archive_bad.csv'))
+    # Accepted members are hashed during validation, so finalize does not read them again
+    assert os.path.exists(os.path.join(temp_folder, '.checksums', 'archive_round2.csv.json'))
+    _cleanup(report)
+
+
+def test_archive_upload_rejects_unusable_archives(test_client):
+    login_client(test_client)
+
+    resp = test_client.post(
+        '/dataset/file/upload/archive',
+        data={'file': (io.BytesIO(b'not a zip'), 'broken.zip')},
+        content_type='multipart/form-data',
+    )
+    assert resp.status_code == 400
+    assert resp.get_json()['message'].startswith('Invalid ZIP archive')
+
+    resp = test_client.post(
+        '/dataset/file/upload/archive',
+        data={'file': (io.BytesIO(b'a,b\n'), 'plain.csv')},
+        content_type='multipart/form-data',
+    )
+    assert resp.status_code == 400
+
+
+def test_corrupt_zip_member_is_rejected_on_its_own(test_client):
+    login_client(test_client)
+    header, rows = _padel_rows(20)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('corrupt_member.csv', header + rows)
+        archive.writestr('intact_member.csv', header + rows)
+        info = archive.getinfo('corrupt_member.csv')
+    # 0xff starts a deflate block of the reserved type, so decompression fails with zlib.error
+    data = bytearray(buffer.getvalue())
+    data_offset = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    data[data_offset:data_offset + 8] = b'\xff' * 8
+
+    resp = test_client.post(
+        '/dataset/file/upload/archive',
+        data={'file': (io.BytesIO(bytes(data)), 'corrupt.zip')},
+        content_type='multipart/form-data',
+    )
+    assert resp.status_code == 200
+    report = resp.get_json()
+    statuses = {entry['filename']: entry['status'] for entry in report['files']}
+    assert statuses == {'corrupt_member.csv': 'rejected', 'intact_member.csv': 'accepted'}
+    assert report['files'][0]['message'].startswith('Could not read the file from the archive')
+    _cleanup(report)
+
+
+def test_tar_zst_upload_is_extracted_as_a_stream(test_client):
+    zstandard = pytest.importorskip('zstandard')
+    login_client(test_client)
+    header, rows = _padel_rows(5)
+
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode='w') as archive:
+        for name in ('zst_a.csv', 'nested/zst_a.csv'):
+            info = tarfile.TarInfo(name)
+            info.size = len(header + rows)
+            archive.addfile(info, io.BytesIO(header + rows))
+    compressed = zstandard.ZstdCompressor().compress(tar_buffer.getvalue())
+
+    resp = test_client.post(
+        '/dataset/file/upload/archive',
+        data={'file': (io.BytesIO(compressed), 'season.tar.zst')},
+        content_type='multipart/form-data',
+    )
+    assert resp.status_code == 200
+    report = resp.get_json()
+    # Same basename twice: the second gets a " (1)" suffix like a repeated single upload
+    assert [entry['stored_as'] for entry in report['files']] == ['zst_a.csv', 'zst_a (1).csv']
+    _cleanup(report)
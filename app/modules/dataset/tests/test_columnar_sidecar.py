@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+
+from app.modules.dataset.services_columnar import ColumnarSidecarService
+from core.storage import LocalStorage
+
+pa = pytest.importorskip("pyarrow")
+
+CSV = (
+    "nombre_torneo,anio_torneo,fecha_inicio_torneo,categoria,pareja1_jugador1,set1_pareja1,set3_pareja1\n"
+    "Open Sevilla,2024,02.09.2024,Masculino,Ana,6,\n"
+    "Open Sevilla,2024,not a date,Masculino,Luis,x,7\n"
+    "Open Sevilla,2024,2024-09-03,Masculino,Eva,,6\n"
+)
+
+
+def test_sidecar_types_scores_dates_and_labels(test_client, tmp_path, monkeypatch):
+    monkeypatch.setitem(test_client.application.extensions, "storage", LocalStorage(str(tmp_path / "uploads")))
+    csv_path = tmp_path / "matches.csv"
+    csv_path.write_text(CSV, encoding="utf-8")
+    service = ColumnarSidecarService()
+
+    with test_client.application.app_context():
+        assert service.get_path("abc123") is None
+        assert service.build("abc123", str(csv_path)) == "sidecars/v2/abc123.arrow"
+
+        reader = service.open("abc123")
+        table = reader.read_all()
+        rows = list(service.iter_rows(reader))
+
+    assert table.schema.field("anio_torneo").type == pa.int16()
+    assert table.schema.field("set1_pareja1").type == pa.int8()
+    assert table.schema.field("fecha_inicio_torneo").type == pa.date32()
+    assert pa.types.is_dictionary(table.schema.field("categoria").type)
+    # Only dd.mm.yyyy is a date, as for the metrics read from the CSV
+    assert table.column("fecha_inicio_torneo").to_pylist() == [datetime.date(2024, 9, 2), None, None]
+    assert table.column("set1_pareja1").to_pylist() == [6, None, None]
+    assert table.column("set3_pareja1").to_pylist() == [None, 7, 6]
+    assert table.column("pareja1_jugador1").to_pylist() == ["Ana", "Luis", "Eva"]
+    # Cells that did not convert keep their text; columns that converted fully get no copy
+    assert "set1_pareja1__raw" in table.column_names and "set3_pareja1__raw" not in table.column_names
+
+    # What the XLSX export writes: the CSV's header, typed cells, and the text of malformed ones
+    assert rows[0] == CSV.splitlines()[0].split(",")
+    assert rows[1][2:] == (datetime.date(2024, 9, 2), "Masculino", "Ana", 6, None)
+    assert rows[2][2:] == ("not a date", "Masculino", "Luis", "x", 7)
+    assert rows[3][2] == "2024-09-03"
+
+
+def test_sidecar_of_utf8_file_with_a_character_across_the_encoding_sample(test_client, tmp_path, monkeypatch):
+    from app.modules.dataset.services_columnar import ENCODING_SAMPLE_BYTES, candidate_encodings
+
+    monkeypatch.setitem(test_client.application.extensions, "storage", LocalStorage(str(tmp_path / "uploads")))
+    header = b"nombre_torneo,pareja1_jugador1\n"
+    filler = b"Open Sevilla,Ana\n" * ((ENCODING_SAMPLE_BYTES - len(header)) // 17 - 2)
+    # "í" takes two bytes in UTF-8: put the first one on the last byte of the sample
+    padding = b"x" * (ENCODING_SAMPLE_BYTES - len(header) - len(filler) - len(b"Open Sevilla,Mart") - 1)
+    content = header + filler + b"Open Sevilla,Mart" + padding + "ín\n".encode("utf-8")
+    assert content[ENCODING_SAMPLE_BYTES - 1:ENCODING_SAMPLE_BYTES + 1] == "í".encode("utf-8")
+    csv_path = tmp_path / "straddle.csv"
+    csv_path.write_bytes(content)
+
+    assert candidate_encodings(str(csv_path))[0] == "utf-8"
+    assert "utf-16" not in candidate_encodings(str(csv_path))
+    with test_client.application.app_context():
+        service = ColumnarSidecarService()
+        assert service.build("straddle", str(csv_path)) == "sidecars/v2/straddle.arrow"
+        names = service.read_table("straddle").column("pareja1_jugador1").to_pylist()
+    assert names[-1] == "Mart" + "x" * len(padding) + "ín"
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import CounterName, DataSet, DSCounter, DSMetaData, DSViewRecord, TournamentType
+from app.modules.dataset.repositories import DSDownloadRecordRepository, DSViewRecordRepository
+from app.modules.dataset.services import DataSetService, DSCounterService
+from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.repositories import HubfileDownloadRecordRepository, HubfileViewRecordRepository
+from app.modules.public.routes import HUB_STATS_FRAGMENT
+from core.managers.cache_manager import invalidate_fragments
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """Creates one user with two datasets (one synchronized) for counter testing."""
+    with test_client.application.app_context():
+        user = User(email="counter_user@example.com", password="test1234")
+        db.session.add(user)
+        db.session.commit()
+
+        for title, doi in (("Counted 1", "10.1234/counted.1"), ("Counted 2", None)):
+            metadata = DSMetaData(
+                title=title, description=title, tournament_type=TournamentType.OPEN, dataset_doi=doi, tags="test"
+            )
+            db.session.add(metadata)
+            db.session.commit()
+            db.session.add(DataSet(user_id=user.id, ds_meta_data_id=metadata.id))
+        db.session.commit()
+
+    yield test_client
+
+
+def _datasets():
+    return DataSet.query.join(DSMetaData).filter(DSMetaData.title.like("Counted%")).order_by(DataSet.id).all()
+
+
+def test_record_creation_increments_global_and_dataset_counters(test_client):
+    ds1, ds2 = _datasets()
+    before = DSCounterService().get_global_counters()
+
+    for cookie in ("c1", "c2"):
+        DSDownloadRecordRepository().create(
+            dataset_id=ds1.id, download_date=datetime.now(timezone.utc), download_cookie=cookie
+        )
+    DSViewRecordRepository().create(dataset_id=ds2.id, view_date=datetime.now(timezone.utc), view_cookie="v1")
+
+    after = DSCounterService().get_global_counters()
+    assert after[CounterName.DATASET_DOWNLOADS] == before[CounterName.DATASET_DOWNLOADS] + 2
+    assert after[CounterName.DATASET_VIEWS] == before[CounterName.DATASET_VIEWS] + 1
+    assert DSCounterService().get_dataset_counters(ds1.id)[CounterName.DATASET_DOWNLOADS] == 2
+    assert DSCounterService().get_dataset_counters(ds2.id)[CounterName.DATASET_VIEWS] == 1
+    assert DataSetService().total_dataset_downloads() == after[CounterName.DATASET_DOWNLOADS]
+
+
+def test_synchronizing_a_dataset_increments_synchronized_counter(test_client):
+    _, ds2 = _datasets()
+    before = DSCounterService().get_global_counters()[CounterName.SYNCHRONIZED_DATASETS]
+
+    DataSetService().update_dsmetadata(ds2.ds_meta_data_id, dataset_doi="10.1234/counted.2")
+    # Setting the DOI again must not count the dataset twice
+    DataSetService().update_dsmetadata(ds2.ds_meta_data_id, dataset_doi="10.1234/counted.2")
+
+    assert DSCounterService().get_global_counters()[CounterName.SYNCHRONIZED_DATASETS] == before + 1
+
+
+def test_rebuild_from_records_is_exact_after_deletes(test_client):
+    ds1, _ = _datasets()
+    DSViewRecord.query.filter_by(dataset_id=ds1.id).delete()
+    db.session.add(DSViewRecord(dataset_id=ds1.id, view_date=datetime.now(timezone.utc), view_cookie="raw"))
+    db.session.commit()
+
+    DSCounterService().rebuild_from_records()
+
+    counters = DSCounterService().get_global_counters()
+    assert counters[CounterName.DATASET_VIEWS] == DSViewRecord.query.count()
+    assert counters[CounterName.SYNCHRONIZED_DATASETS] == DataSetService().count_synchronized_datasets()
+    assert DSCounter.query.filter_by(name=CounterName.DATASET_VIEWS, scope_id=ds1.id).first().value == 1
+
+
+def test_deletes_bring_counters_back_down(test_client):
+    user = User.query.filter_by(email="counter_user@example.com").first()
+    metadata = DSMetaData(
+        title="Deleted", description="Deleted", tournament_type=TournamentType.OPEN, dataset_doi="10.1234/gone"
+    )
+    db.session.add(metadata)
+    db.session.commit()
+    dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.commit()
+    hubfile = Hubfile(name="gone.csv", checksum="0", size=1, dataset_id=dataset.id)
+    db.session.add(hubfile)
+    db.session.commit()
+    DSCounterService().rebuild_from_records()
+    before = DSCounterService().get_global_counters()
+
+    now = datetime.now(timezone.utc)
+    view = DSViewRecordRepository().create(dataset_id=dataset.id, view_date=now, view_cookie="d1")
+    DSViewRecordRepository().create(dataset_id=dataset.id, view_date=now, view_cookie="d2")
+    DSDownloadRecordRepository().create(dataset_id=dataset.id, download_date=now, download_cookie="d3")
+    HubfileViewRecordRepository().create(file_id=hubfile.id, view_date=now, view_cookie="f1")
+    HubfileDownloadRecordRepository().create(file_id=hubfile.id, download_date=now, download_cookie="f2")
+    assert DSCounterService().get_global_counters()[CounterName.DATASET_VIEWS] == before[CounterName.DATASET_VIEWS] + 2
+
+    db.session.delete(view)
+    db.session.commit()
+    assert DSCounterService().get_dataset_counters(dataset.id)[CounterName.DATASET_VIEWS] == 1
+
+    db.session.delete(hubfile)
+    db.session.commit()
+    dataset.delete()
+
+    after = DSCounterService().get_global_counters()
+    assert after == dict(before, **{CounterName.SYNCHRONIZED_DATASETS: before[CounterName.SYNCHRONIZED_DATASETS] - 1})
+    assert DSCounter.query.filter_by(scope_id=dataset.id).count() == 0
+    DSCounterService().rebuild_from_records()
+    assert DSCounterService().get_global_counters() == after
+
+
+def test_index_shows_counters(test_client):
+    service = DSCounterService()
+    service.repository.replace_all(CounterName.SYNCHRONIZED_DATASETS, [(DSCounter.GLOBAL_SCOPE, 4711)])
+    service.repository.replace_all(CounterName.DATASET_VIEWS, [(DSCounter.GLOBAL_SCOPE, 5813)])
+    service.repository.replace_all(CounterName.DATASET_DOWNLOADS, [(DSCounter.GLOBAL_SCOPE, 6917)])
+    db.session.commit()
+    invalidate_fragments(HUB_STATS_FRAGMENT)
+
+    response = test_client.get("/")
+
+    assert response.status_code == 200
+    counters = service.get_global_counters()
+    page = response.data.decode("utf-8")
+    assert f"{counters[CounterName.SYNCHRONIZED_DATASETS]} datasets" in page
+    assert f"{counters[CounterName.DATASET_VIEWS]} datasets viewed" in page
+    assert f"{counters[CounterName.DATASET_DOWNLOADS]} datasets downloaded" in page
+    service.rebuild_from_records()
+    invalidate_fragments(HUB_STATS_FRAGMENT)
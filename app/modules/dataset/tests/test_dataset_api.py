@@ -0,0 +1,137 @@
+import base64
+import io
+import json
+import os
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.conftest import login, logout
+from app.modules.dataset.tests.test_upload_endpoint import _padel_rows
+from app.modules.hubfile.models import Hubfile
+from app.modules.profile.models import UserProfile
+
+
+@pytest.fixture(scope="module")
+def api_token(test_client):
+    user = User(email="api_user@example.com", password="test1234")
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(UserProfile(user_id=user.id, name="Api", surname="User"))
+    db.session.commit()
+
+    login(test_client, "api_user@example.com", "test1234")
+    resp = test_client.post("/api-tokens", json={"name": "nightly ingest"})
+    logout(test_client)
+    assert resp.status_code == 201
+    return resp.get_json()["token"]
+
+
+def _payload(title="Season 2024", **extra):
+    header, rows = _padel_rows(3)
+    payload = {
+        "title": title,
+        "description": "Nightly import",
+        "tournament_type": "open",
+        "authors": [{"name": "Doe, Jane", "affiliation": "Club"}],
+        "files": [{"name": "round1.csv", "content": (header + rows).decode("utf-8")}],
+    }
+    payload.update(extra)
+    return payload
+
+
+def test_dataset_creation_requires_a_valid_token(test_client, api_token):
+    resp = test_client.post("/api/v1/datasets/", json=_payload())
+    assert resp.status_code == 401
+    resp = test_client.post("/api/v1/datasets/", json=_payload(), headers={"Authorization": "Bearer ph_wrong"})
+    assert resp.status_code == 401
+
+
+def test_create_dataset_with_files_in_one_call(test_client, api_token):
+    headers = {"Authorization": f"Bearer {api_token}"}
+    resp = test_client.post("/api/v1/datasets/", json=_payload(), headers=headers)
+    assert resp.status_code == 201, resp.get_json()
+    body = resp.get_json()
+    assert body["status"] == "draft"
+    assert [f["name"] for f in body["files"]] == ["round1.csv"]
+
+    hubfile = Hubfile.query.filter_by(dataset_id=body["dataset_id"]).one()
+    assert os.path.exists(hubfile.get_path())
+    authors = [a.name for a in hubfile.get_dataset().ds_meta_data.authors]
+    assert authors == ["User, Api", "Doe, Jane"]
+
+
+def test_multipart_request_and_publication(test_client, api_token):
+    header, rows = _padel_rows(2)
+    metadata = {"title": "Multipart", "description": "d", "upload_type": "public"}
+    resp = test_client.post(
+        "/api/v1/datasets/",
+        data={
+            "metadata": json.dumps(metadata),
+            "files": [(io.BytesIO(header + rows), "a.csv"), (io.BytesIO(header + rows), "b.csv")],
+        },
+        content_type="multipart/form-data",
+        headers={"Authorization": f"Bearer {api_token}"},
+    )
+    assert resp.status_code == 201, resp.get_json()
+    body = resp.get_json()
+    assert body["status"] == "published"
+    assert body["doi"]
+    assert sorted(f["name"] for f in body["files"]) == ["a.csv", "b.csv"]
+
+
+def test_invalid_file_creates_nothing(test_client, api_token):
+    before = Hubfile.query.count()
+    payload = _payload(files=[{"name": "bad.csv", "content": "name,score\nJuan,3\n"}])
+    resp = test_client.post("/api/v1/datasets/", json=payload, headers={"Authorization": f"Bearer {api_token}"})
+    assert resp.status_code == 400
+    assert resp.get_json()["files"][0]["filename"] == "bad.csv"
+    assert Hubfile.query.count() == before
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"files": [{"name": 7, "content": "a,b\n"}]},
+        {"files": [{"name": "round1.csv", "content": ["a,b"]}]},
+        {"title": 2024},
+        {"authors": [{"name": ["Doe", "Jane"]}]},
+    ],
+)
+def test_wrongly_typed_fields_are_rejected(test_client, api_token, extra):
+    before = Hubfile.query.count()
+    headers = {"Authorization": f"Bearer {api_token}"}
+    resp = test_client.post("/api/v1/datasets/", json=_payload(**extra), headers=headers)
+    assert resp.status_code == 400, resp.get_json()
+    assert Hubfile.query.count() == before
+
+
+def test_idempotency_key_replays_the_first_response(test_client, api_token):
+    key = base64.urlsafe_b64encode(os.urandom(12)).decode()
+    headers = {"Authorization": f"Bearer {api_token}", "Idempotency-Key": key}
+
+    first = test_client.post("/api/v1/datasets/", json=_payload(title="Retried"), headers=headers)
+    second = test_client.post("/api/v1/datasets/", json=_payload(title="Retried"), headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    assert second.get_json()["dataset_id"] == first.get_json()["dataset_id"]
+    assert Hubfile.query.filter_by(dataset_id=first.get_json()["dataset_id"]).count() == 1
+
+    # Same key, different request
+    third = test_client.post("/api/v1/datasets/", json=_payload(title="Something else"), headers=headers)
+    assert third.status_code == 422
+
+
+def test_revoked_token_is_refused(test_client, api_token):
+    login(test_client, "api_user@example.com", "test1234")
+    created = test_client.post("/api-tokens", json={"name": "temporary"}).get_json()
+    tokens = test_client.get("/api-tokens").get_json()["tokens"]
+    assert "token" not in tokens[0]
+    assert test_client.delete(f"/api-tokens/{created['id']}").status_code == 200
+    logout(test_client)
+
+    resp = test_client.post(
+        "/api/v1/datasets/", json=_payload(), headers={"Authorization": f"Bearer {created['token']}"}
+    )
+    assert resp.status_code == 401
@@ -0,0 +1,204 @@
+import csv
+import datetime
+import glob
+import os
+
+import pytest
+
+from app.modules.dataset.services import DataSetService
+from app.modules.dataset.services_columnar import ColumnarSidecarService
+from app.modules.dataset.services_padel import PadelMetricsAccumulator, PadelMetricsService
+from core.storage import LocalStorage
+
+pytest.importorskip("pyarrow")
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "padel_csv_examples", "*.csv")))
+
+
+def _rowwise(path):
+    accumulator = PadelMetricsAccumulator()
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            accumulator.add_row(row)
+    return accumulator.result()
+
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_columnar_metrics_match_row_by_row_reference(path):
+    assert PadelMetricsService.calculate_metrics_from_csv(path) == _rowwise(path)
+
+
+def test_metrics_from_sidecar_match_csv(test_client, tmp_path, monkeypatch):
+    monkeypatch.setitem(test_client.application.extensions, "storage", LocalStorage(str(tmp_path)))
+    path = EXAMPLES[2]
+    with test_client.application.app_context():
+        ColumnarSidecarService().build("example", path)
+        from_sidecar = PadelMetricsService.calculate_metrics_from_csv(path, checksum="example")
+
+    assert from_sidecar == _rowwise(path)
+
+
+def test_metrics_tolerate_missing_columns_and_bad_dates(tmp_path):
+    path = tmp_path / "partial.csv"
+    path.write_text(
+        "nombre_torneo,fecha_inicio_torneo,set3_pareja1\nA,01.02.2024,6\nB,bad,\nA,15.03.2023,\n", encoding="utf-8"
+    )
+
+    metrics = PadelMetricsService.calculate_metrics_from_csv(str(path))
+
+    assert metrics["total_matches"] == 3
+    assert metrics["tournaments"] == {"A", "B"}
+    assert metrics["players"].count() == 0
+    assert (metrics["date_min"], metrics["date_max"]) == (datetime.date(2023, 3, 15), datetime.date(2024, 2, 1))
+    assert metrics["has_set3"] is True and metrics["total_sets"] == 7
+
+
+def test_metrics_retry_when_the_encoding_guess_fails_past_the_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.modules.dataset.services_padel.ENCODING_SAMPLE_BYTES", 64)
+    path = tmp_path / "latin1.csv"
+    rows = "".join(f"Open {i},01.02.2024\n" for i in range(20)) + "Open Málaga,01.02.2024\n"
+    path.write_bytes(("nombre_torneo,fecha_inicio_torneo\n" + rows).encode("latin-1"))
+
+    # The sample is plain ASCII, so UTF-8 is tried first and breaks on the last row
+    assert PadelMetricsService._detect_encoding(str(path)) == "utf-8"
+    accumulator = PadelMetricsAccumulator()
+    PadelMetricsService.accumulate(accumulator, str(path))
+
+    assert accumulator.total_matches == 21
+    assert "Open Málaga" in accumulator.tournaments
+
+
+def _create_dataset():
+    from app import db
+    from app.modules.auth.models import User
+    from app.modules.dataset.models import DataSet, DSMetaData, TournamentType
+
+    user = User.query.filter_by(email="metrics_user@example.com").first()
+    if user is None:
+        user = User(email="metrics_user@example.com", password="test1234")
+        db.session.add(user)
+        db.session.commit()
+    metadata = DSMetaData(title="Metrics", description="Metrics", tournament_type=TournamentType.OPEN)
+    db.session.add(metadata)
+    db.session.commit()
+    dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.commit()
+    return dataset
+
+
+def _attach(storage, dataset, path):
+    from app import db
+    from app.modules.hubfile.models import Hubfile
+    from core.storage import storage_key
+
+    name = os.path.basename(path)
+    stored = storage.save(storage_key(dataset.user_id, dataset.id, name), path, move=False)
+    hubfile = Hubfile(name=name, checksum=stored.checksum, size=stored.size, dataset_id=dataset.id)
+    db.session.add(hubfile)
+    db.session.commit()
+    return hubfile.id
+
+
+def test_dataset_metrics_merge_files_and_update_incrementally(test_client, tmp_path, monkeypatch):
+    from app.modules.dataset.models import PadelFileMetrics
+
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setitem(test_client.application.extensions, "storage", storage)
+
+    with test_client.application.app_context():
+        dataset = _create_dataset()
+        dataset_id = dataset.id
+
+        def attach(path):
+            return _attach(storage, dataset, path)
+
+        first_ids = [attach(EXAMPLES[0]), attach(EXAMPLES[1])]
+        PadelMetricsService.schedule_refresh(dataset_id, first_ids).result()
+
+        read = []
+        original = PadelMetricsService.calculate_metrics_from_csv
+        monkeypatch.setattr(
+            PadelMetricsService, "calculate_metrics_from_csv",
+            staticmethod(lambda path, checksum=None: read.append(path) or original(path, checksum)),
+        )
+        new_id = attach(EXAMPLES[2])
+        PadelMetricsService.schedule_refresh(dataset_id, [new_id]).result()
+        # The stage ran with its own session; read what it stored
+        metrics = PadelMetricsService.get_metrics(dataset_id)
+
+        # Only the new file was read; the other two came from their stored summaries
+        assert len(read) == 1 and read[0].endswith(os.path.basename(EXAMPLES[2]))
+        assert PadelFileMetrics.query.filter_by(dataset_id=dataset_id).count() == 3
+
+        accumulator = PadelMetricsAccumulator()
+        for path in EXAMPLES[:3]:
+            PadelMetricsService.accumulate(accumulator, path)
+        expected = accumulator.result()
+        assert metrics.total_matches == expected["total_matches"]
+        # Per-file sketches merge into the sketch of all the files read together
+        assert metrics.unique_players == expected["players"].count()
+        assert metrics.total_tournaments == len(expected["tournaments"])
+        assert (metrics.date_range_start, metrics.date_range_end) == (expected["date_min"], expected["date_max"])
+        assert metrics.avg_sets_per_match == pytest.approx(expected["total_sets"] / expected["total_matches"])
+
+        catalog = PadelMetricsService.merge_metrics([metrics])
+        assert catalog["total_matches"] == expected["total_matches"]
+        assert catalog["unique_players"] == metrics.unique_players
+
+
+def test_catalog_analytics_follow_dataset_metrics(test_client, tmp_path, monkeypatch):
+    from app import db
+    from app.modules.dataset.models import PadelDatasetMetrics
+    from app.modules.dataset.sketches import HyperLogLog
+    from app.modules.hubfile.models import Hubfile
+
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setitem(test_client.application.extensions, "storage", storage)
+    expected = PadelMetricsService.calculate_metrics_from_csv(EXAMPLES[3])
+    tournament, matches = expected["matches_by_tournament"].most_common(1)[0]
+
+    def merged_players():
+        # What the incrementally kept players estimate must equal: a merge of every published dataset
+        with test_client.application.app_context():
+            rows = PadelDatasetMetrics.query.filter(PadelDatasetMetrics.in_catalog.is_(True))
+            return HyperLogLog.merge_all(row.players_sketch for row in rows if row.total_matches).count()
+
+    def analytics():
+        response = test_client.get("/api/v1/padel/analytics?limit=100")
+        assert response.status_code == 200
+        data = response.get_json()
+        by_tournament = {row["key"]: row for row in data["tournament"]}
+        return data["totals"], by_tournament.get(tournament, {"matches": 0, "datasets": 0})
+
+    before_totals, before_tournament = analytics()
+    with test_client.application.app_context():
+        dataset = _create_dataset()
+        file_id = _attach(storage, dataset, EXAMPLES[3])
+        PadelMetricsService.schedule_refresh(dataset.id).result()
+
+    # A draft is not part of the public catalog
+    assert analytics() == (before_totals, before_tournament)
+
+    with test_client.application.app_context():
+        # Getting a DOI publishes the dataset, which refreshes its metrics
+        DataSetService().update_dsmetadata(dataset.ds_meta_data_id, dataset_doi=f"10.1234/catalog.{dataset.id}")
+
+    totals, row = analytics()
+    assert totals["matches"] - before_totals["matches"] == expected["total_matches"]
+    assert totals["datasets"] - before_totals["datasets"] == 1
+    assert totals["unique_players"] == merged_players()
+    assert row["matches"] - before_tournament["matches"] == matches
+    assert row["datasets"] - before_tournament["datasets"] == 1
+
+    # Removing the file takes its share back out of the aggregate
+    with test_client.application.app_context():
+        db.session.delete(db.session.get(Hubfile, file_id))
+        db.session.commit()
+        PadelMetricsService.schedule_refresh(dataset.id).result()
+
+    totals, row = analytics()
+    assert (totals["matches"], totals["datasets"]) == (before_totals["matches"], before_totals["datasets"])
+    assert row["matches"] == before_tournament["matches"]
+    assert totals["unique_players"] == merged_players()
+    assert test_client.get("/api/v1/padel/analytics/unknown").status_code == 400
@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationJob, TournamentType
+from app.modules.dataset.services_publication import (
+    MAX_ATTEMPTS,
+    DataSetPublicationService,
+    retry_delay,
+    start_publication_sweeper,
+)
+from core.managers.task_manager import TaskRunner
+from rosemary.commands.dataset_sync import dataset_sync
+
+
+class FlakyZenodo:
+    """Fails the first ``failures`` publish calls, like an upstream having a bad minute."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.depositions = 0
+        self.publish_calls = 0
+        self.connection_checks = 0
+        self.published = set()
+
+    def test_connection(self):
+        self.connection_checks += 1
+        return True
+
+    def create_new_deposition(self, dataset):
+        self.depositions += 1
+        return {"id": 900 + dataset.id, "conceptrecid": 900 + dataset.id}
+
+    def upload_files(self, dataset, deposition_id):
+        return {"uploaded": [f.name for f in dataset.files()], "skipped": [], "failed": {}}
+
+    def publish_deposition(self, deposition_id):
+        self.publish_calls += 1
+        if self.publish_calls <= self.failures:
+            raise ConnectionError("503 Service Unavailable")
+        self.published.add(deposition_id)
+        return {}
+
+    def get_deposition(self, deposition_id):
+        return {"id": deposition_id, "submitted": deposition_id in self.published}
+
+    def get_doi(self, deposition_id):
+        return f"10.5072/test.{deposition_id}"
+
+
+class DoiLostZenodo(FlakyZenodo):
+    """Publishes, then fails once when asked for the DOI (the attempt dies before storing it)."""
+
+    def __init__(self):
+        super().__init__(failures=0)
+        self.doi_failures = 1
+
+    def get_doi(self, deposition_id):
+        if self.doi_failures:
+            self.doi_failures -= 1
+            raise ConnectionError("Connection reset")
+        return super().get_doi(deposition_id)
+
+
+def _dataset(email="test@example.com", anonymous=False):
+    user = User.query.filter_by(email=email).first()
+    metadata = DSMetaData(
+        title="Publish me", description="d", tournament_type=TournamentType.OPEN, anonymous=anonymous
+    )
+    db.session.add(metadata)
+    db.session.commit()
+    dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.commit()
+    return dataset
+
+
+def test_failed_attempts_are_retried_until_published(test_client):
+    zenodo = FlakyZenodo(failures=2)
+    dataset = _dataset()
+
+    DataSetPublicationService(zenodo).enqueue(dataset)
+
+    job = PublicationJob.query.filter_by(dataset_id=dataset.id).one()
+    assert (job.status, job.attempts, job.last_error) == (PublicationJob.PUBLISHED, 3, None)
+    # The deposition created by the first attempt is reused by the retries
+    assert zenodo.depositions == 1
+    assert DSMetaData.query.get(dataset.ds_meta_data_id).dataset_doi == f"10.5072/test.{900 + dataset.id}"
+    assert DataSet.query.get(dataset.id).get_publication_status() == "published"
+
+
+def test_a_published_deposition_is_not_published_again(test_client):
+    zenodo = DoiLostZenodo()
+    dataset = _dataset()
+
+    DataSetPublicationService(zenodo).enqueue(dataset)
+
+    job = PublicationJob.query.filter_by(dataset_id=dataset.id).one()
+    assert (job.status, job.attempts) == (PublicationJob.PUBLISHED, 2)
+    assert zenodo.publish_calls == 1
+    assert DSMetaData.query.get(dataset.ds_meta_data_id).dataset_doi == f"10.5072/test.{900 + dataset.id}"
+
+
+def test_job_fails_after_the_last_attempt(test_client):
+    dataset = _dataset()
+
+    DataSetPublicationService(FlakyZenodo(failures=100)).enqueue(dataset)
+
+    job = PublicationJob.query.filter_by(dataset_id=dataset.id).one()
+    assert (job.status, job.attempts) == (PublicationJob.FAILED, MAX_ATTEMPTS)
+    assert "503" in job.last_error
+    assert DSMetaData.query.get(dataset.ds_meta_data_id).dataset_doi is None
+
+    # Publishing again starts a fresh job
+    DataSetPublicationService(FlakyZenodo(failures=0)).enqueue(dataset)
+    assert PublicationJob.query.filter_by(dataset_id=dataset.id).one().status == PublicationJob.PUBLISHED
+
+
+def test_resume_picks_up_jobs_of_a_dead_worker(test_client):
+    dataset = _dataset()
+    stuck = PublicationJob(
+        dataset_id=dataset.id,
+        status=PublicationJob.PUBLISHING,
+        attempts=1,
+        updated_at=datetime.utcnow() - timedelta(hours=1),
+    )
+    db.session.add(stuck)
+    db.session.commit()
+
+    assert DataSetPublicationService(FlakyZenodo(failures=0)).resume() == 1
+    assert PublicationJob.query.filter_by(dataset_id=dataset.id).one().status == PublicationJob.PUBLISHED
+
+
+def test_a_restarted_app_sweeps_the_jobs_the_old_process_left(test_client, tmp_path, monkeypatch):
+    app = test_client.application
+    monkeypatch.setitem(app.config, "PUBLICATION_SWEEP_SECONDS", 3600)
+    monkeypatch.setitem(app.config, "PUBLICATION_SWEEP_LOCK", str(tmp_path / "sweeper.lock"))
+    lost_timer, dead_worker, live_worker = _dataset(), _dataset(), _dataset()
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    db.session.add_all(
+        [
+            # The old process failed an attempt and scheduled a retry, then stopped before it fired
+            PublicationJob(
+                dataset_id=lost_timer.id, status=PublicationJob.PENDING, attempts=1, next_attempt_at=long_ago
+            ),
+            PublicationJob(
+                dataset_id=dead_worker.id, status=PublicationJob.PUBLISHING, attempts=1, updated_at=long_ago
+            ),
+            # Claimed a moment ago by a worker of another process that is still running
+            PublicationJob(dataset_id=live_worker.id, status=PublicationJob.PUBLISHING, attempts=1),
+        ]
+    )
+    db.session.commit()
+
+    # The new process sweeps as soon as it starts, a second one finds the lock taken
+    restarted, other = TaskRunner(app, max_workers=1), TaskRunner(app, max_workers=1)
+    swept_by_other = []
+    try:
+        start_publication_sweeper(app, restarted, FlakyZenodo(failures=0))
+        other.schedule_every(3600, swept_by_other.append, 1, lock_path=app.config["PUBLICATION_SWEEP_LOCK"])
+    finally:
+        restarted.shutdown(wait=True)
+        other.shutdown(wait=True)
+
+    db.session.expire_all()
+    statuses = {job.dataset_id: job.status for job in PublicationJob.query.all()}
+    assert statuses[lost_timer.id] == statuses[dead_worker.id] == PublicationJob.PUBLISHED
+    assert statuses[live_worker.id] == PublicationJob.PUBLISHING
+    assert swept_by_other == []
+
+
+def test_retry_delay_grows_exponentially_and_is_capped():
+    assert 15 <= retry_delay(1) <= 30
+    assert 60 <= retry_delay(3) <= 120
+    assert retry_delay(30) <= 3600
+
+
+def test_publication_status_route(test_client):
+    test_client.post("/login", data={"email": "test@example.com", "password": "test1234"})
+    dataset = _dataset()
+
+    resp = test_client.get(f"/dataset/{dataset.id}/publication")
+    assert resp.status_code == 200
+    assert resp.get_json()["status"] == "draft"
+
+    DataSetPublicationService(FlakyZenodo(failures=0)).enqueue(dataset)
+    body = test_client.get(f"/dataset/{dataset.id}/publication").get_json()
+    assert (body["status"], body["attempts"]) == ("published", 1)
+    test_client.get("/logout")
+
+
+def _sync_user(email):
+    if User.query.filter_by(email=email).first() is None:
+        db.session.add(User(email=email, password="test1234"))
+        db.session.commit()
+
+
+def test_sync_all_checks_the_connection_once(test_client):
+    _sync_user("bulk@example.com")
+    datasets = [_dataset("bulk@example.com") for _ in range(3)]
+    anonymous = _dataset("bulk@example.com", anonymous=True)
+    zenodo = FlakyZenodo(failures=0)
+
+    report = DataSetPublicationService(zenodo).sync_all(User.query.filter_by(email="bulk@example.com").one().id)
+
+    assert zenodo.connection_checks == 1
+    assert sorted(report["datasets"]) == sorted(d.id for d in datasets)
+    assert {job["status"] for job in report["datasets"].values()} == {PublicationJob.PUBLISHED}
+    assert report["skipped"] == {anonymous.id: "anonymous"}
+    assert DataSet.query.get(anonymous.id).get_publication_status() == "draft"
+
+
+def test_sync_all_route(test_client):
+    dataset = _dataset()
+    test_client.post("/login", data={"email": "test@example.com", "password": "test1234"})
+    resp = test_client.post("/dataset/unsynchronized/sync")
+    test_client.get("/logout")
+
+    assert resp.status_code == 302
+    assert DataSet.query.get(dataset.id).get_publication_status() == "published"
+
+
+def test_sync_cli_waits_for_the_jobs(test_client):
+    _sync_user("cli@example.com")
+    datasets = [_dataset("cli@example.com") for _ in range(3)]
+
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(dataset_sync, ["--user", "cli@example.com", "--workers", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert "3 synced: 3 published, 0 failed, 0 pending; 0 skipped." in result.output
+    db.session.expire_all()
+    assert all(DataSet.query.get(d.id).get_publication_status() == "published" for d in datasets)
@@ -0,0 +1,40 @@
+import pytest
+
+from app.modules.dataset.sketches import HyperLogLog
+
+
+@pytest.mark.parametrize("cardinality", [0, 10, 1000, 50000])
+def test_hyperloglog_estimate_is_close(cardinality):
+    sketch = HyperLogLog().update(f"player-{i}" for i in range(cardinality))
+
+    assert sketch.count() == pytest.approx(cardinality, rel=0.05, abs=1)
+
+
+def test_duplicates_do_not_change_the_estimate():
+    sketch = HyperLogLog().update(["Ana", "Bea", "Ana", "Bea", "Ana"])
+
+    assert sketch.count() == 2
+
+
+def test_merge_counts_the_union_and_survives_serialization():
+    first = HyperLogLog().update(f"player-{i}" for i in range(0, 3000))
+    second = HyperLogLog().update(f"player-{i}" for i in range(2000, 5000))
+    union = HyperLogLog().update(f"player-{i}" for i in range(0, 5000))
+
+    merged = HyperLogLog.merge_all([first.to_bytes(), None, second.to_bytes()])
+
+    assert merged.registers == union.registers
+    assert HyperLogLog.from_bytes(merged.to_bytes()).count() == union.count()
+
+
+def test_includes_tells_whether_a_merge_changes_anything():
+    small = HyperLogLog().update(["Ana", "Bea"])
+    large = HyperLogLog().update(["Ana", "Bea", "Carla"])
+
+    assert large.includes(small) and large.includes(HyperLogLog())
+    assert not small.includes(large)
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
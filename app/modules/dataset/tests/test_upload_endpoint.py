@@ -1,8 +1,11 @@
 import io
+import json
 import os
+import uuid
 import pytest
 from app.modules.auth.models import User
 from app.modules.auth.services import AuthenticationService
+from app.modules.dataset.services_upload import ChunkedUploadService
 
 
 def login_client(test_client):
@@ -166,3 +169,207 @@ def test_upload_endpoint_encoding_variants(test_client, player_names, encoding,
     saved_path = os.path.join(temp_folder, filename)
     if os.path.exists(saved_path):
         os.remove(saved_path)
+
+
+def _send_chunks(test_client, upload_id, filename, payload, chunk_size, indexes=None):
+    """Post `payload` as Dropzone-style chunks; returns the responses."""
+    responses = []
+    offsets = list(range(0, max(len(payload), 1), chunk_size))
+    for index in indexes if indexes is not None else range(len(offsets)):
+        offset = offsets[index]
+        data = {
+            'file': (io.BytesIO(payload[offset:offset + chunk_size]), filename),
+            'dzuuid': upload_id,
+            'dzchunkindex': str(index),
+            'dztotalchunkcount': str(len(offsets)),
+            'dzchunkbyteoffset': str(offset),
+            'dztotalfilesize': str(len(payload)),
+        }
+        responses.append(test_client.post('/dataset/file/upload', data=data, content_type='multipart/form-data'))
+    return responses
+
+
+def _padel_rows(count, category='Masculino'):
+    header = _create_padel_csv_with_encoding(['A', 'B', 'C', 'D'], 'utf-8').split(b'\n')[0] + b'\n'
+    row = (
+        f'"Open ""Quoted""\nTournament",2024,01.05.2024,05.05.2024,Stadium,{category},Final,Cuadro,'
+        'Ana,Bea,Carla,Dana,6,4,7,5,,,Ana_Bea,Carla_Dana,6-4 / 7-5\n'
+    ).encode('utf-8')
+    return header, row * count
+
+
+def test_chunked_upload_validates_and_assembles_the_file(test_client):
+    login_client(test_client)
+    header, rows = _padel_rows(200)
+    payload = header + rows
+
+    # Small chunks so records (with quoted newlines) straddle chunk boundaries
+    responses = _send_chunks(test_client, str(uuid.uuid4()), 'chunked.csv', payload, 997)
+    assert all(r.status_code == 200 for r in responses)
+    assert responses[-1].get_json()['filename'] == 'chunked.csv'
+
+    user = User.query.filter_by(email='test@example.com').first()
+    temp_folder = AuthenticationService().temp_folder_by_user(user)
+    with open(os.path.join(temp_folder, 'chunked.csv'), 'rb') as fh:
+        assert fh.read() == payload
+    assert not os.listdir(os.path.join(temp_folder, '.partial'))
+    os.remove(os.path.join(temp_folder, 'chunked.csv'))
+
+
+def test_chunked_upload_rejects_at_the_first_bad_chunk(test_client):
+    login_client(test_client)
+    header, good = _padel_rows(50)
+    _, bad = _padel_rows(1, category='Senior')
+    payload = header + good + bad + good * 20
+    chunk_size = 1024
+    bad_chunk = (len(header + good) + len(bad)) // chunk_size
+    upload_id = str(uuid.uuid4())
+
+    responses = _send_chunks(test_client, upload_id, 'bad_rows.csv', payload, chunk_size,
+                             indexes=range(bad_chunk + 1))
+    assert [r.status_code for r in responses[:-1]] == [200] * bad_chunk
+    rejected = responses[-1]
+    assert rejected.status_code == 400
+    assert any("'categoria' must be one of" in error for error in rejected.get_json()['errors'])
+
+    # Retries and later chunks get the same answer; nothing is kept on disk
+    retry = _send_chunks(test_client, upload_id, 'bad_rows.csv', payload, chunk_size,
+                         indexes=[bad_chunk + 1])[0]
+    assert retry.status_code == 400
+    user = User.query.filter_by(email='test@example.com').first()
+    temp_folder = AuthenticationService().temp_folder_by_user(user)
+    assert not os.path.exists(os.path.join(temp_folder, '.partial', f'{upload_id}.part'))
+
+    bad_header = b'name,score\n' + b'x,1\n' * 2000
+    header_id = str(uuid.uuid4())
+    first = _send_chunks(test_client, header_id, 'bad_header.csv', bad_header, 1024, indexes=[0])[0]
+    assert first.status_code == 400
+    assert 'Missing required columns' in first.get_json()['errors'][0]
+
+    # Cleanup the rejection markers (normally removed once stale)
+    service = ChunkedUploadService(temp_folder)
+    service.discard(upload_id)
+    service.discard(header_id)
+
+
+def test_chunked_upload_resumes_after_a_lost_chunk(test_client):
+    login_client(test_client)
+    header, rows = _padel_rows(40)
+    payload = header + rows
+    upload_id = str(uuid.uuid4())
+
+    _send_chunks(test_client, upload_id, 'resumed.csv', payload, 1000, indexes=[0, 1])
+    # Chunk 3 before chunk 2 was stored: the server reports where to continue
+    out_of_order = _send_chunks(test_client, upload_id, 'resumed.csv', payload, 1000, indexes=[3])[0]
+    assert out_of_order.status_code == 409
+    assert out_of_order.get_json()['received'] == 2000
+
+    status = test_client.get(f'/dataset/file/upload/{upload_id}').get_json()
+    assert (status['received'], status['total_size']) == (2000, len(payload))
+
+    # A resent chunk that was already stored is acknowledged without being appended twice
+    assert _send_chunks(test_client, upload_id, 'resumed.csv', payload, 1000, indexes=[1])[0].status_code == 200
+    total = (len(payload) + 999) // 1000
+    responses = _send_chunks(test_client, upload_id, 'resumed.csv', payload, 1000, indexes=range(2, total))
+    assert responses[-1].status_code == 200
+
+    user = User.query.filter_by(email='test@example.com').first()
+    temp_folder = AuthenticationService().temp_folder_by_user(user)
+    saved = os.path.join(temp_folder, responses[-1].get_json()['filename'])
+    with open(saved, 'rb') as fh:
+        assert fh.read() == payload
+    os.remove(saved)
+    assert test_client.get(f'/dataset/file/upload/{upload_id}').status_code == 404
+
+
+def test_chunked_upload_overwrites_a_chunk_stored_without_its_state(test_client):
+    login_client(test_client)
+    header, rows = _padel_rows(40)
+    payload = header + rows
+    upload_id = str(uuid.uuid4())
+    user = User.query.filter_by(email='test@example.com').first()
+    temp_folder = AuthenticationService().temp_folder_by_user(user)
+
+    _send_chunks(test_client, upload_id, 'lost_state.csv', payload, 1000, indexes=[0, 1])
+    # A worker wrote chunk 2 (and crashed halfway through the next) but never saved the state
+    with open(os.path.join(temp_folder, '.partial', f'{upload_id}.part'), 'ab') as fh:
+        fh.write(payload[2000:3500])
+
+    total = (len(payload) + 999) // 1000
+    responses = _send_chunks(test_client, upload_id, 'lost_state.csv', payload, 1000, indexes=range(2, total))
+    assert all(r.status_code == 200 for r in responses)
+
+    saved = os.path.join(temp_folder, responses[-1].get_json()['filename'])
+    with open(saved, 'rb') as fh:
+        assert fh.read() == payload
+    os.remove(saved)
+    assert not os.listdir(os.path.join(temp_folder, '.partial'))
+
+
+def test_streaming_validator_falls_back_to_latin1(tmp_path):
+    from app.modules.dataset.types.tabular import StreamingPadelValidator
+
+    header, rows = _padel_rows(30)
+    latin1_row = _create_padel_csv_with_encoding(['José', 'Martín', 'Peña', 'Íñigo'], 'latin-1').split(b'\n')[1]
+    path = tmp_path / 'mixed.csv'
+    path.write_bytes(header + rows)
+
+    validator = StreamingPadelValidator()
+    assert validator.feed(str(path)) is None
+    assert validator.state['encoding'] == 'utf-8'
+
+    with open(path, 'ab') as fh:
+        fh.write(latin1_row + b'\n')
+    state = json.loads(json.dumps(validator.state))  # state survives a round trip between requests
+    validator = StreamingPadelValidator(state)
+    assert validator.feed(str(path), final=True) is None
+    assert validator.state['encoding'] == 'latin-1'
+    assert validator.state['rows'] == 32
+
+
+def test_finalize_reuses_upload_checksums_and_inserts_all_files(test_client, tmp_path, monkeypatch):
+    from app import db
+    from app.modules.dataset.models import DataSet, DSMetaData, TournamentType
+    from app.modules.dataset.services_upload import UploadFinalizeService, record_checksums
+    from app.modules.hubfile.models import Hubfile
+    from core.storage import LocalStorage, hash_file
+
+    storage = LocalStorage(str(tmp_path / 'store'))
+    monkeypatch.setitem(test_client.application.extensions, 'storage', storage)
+    temp_folder = tmp_path / 'temp'
+    temp_folder.mkdir()
+    header, row = _padel_rows(1)
+    for i in range(6):
+        (temp_folder / f'file{i}.csv').write_bytes(header + row * (i + 1))
+    (temp_folder / 'notes.txt').write_text('ignored')
+
+    # Half the files were hashed at upload time; the others must be hashed at finalize
+    hashed = []
+    monkeypatch.setattr('app.modules.dataset.services_upload.hash_file',
+                        lambda path: hashed.append(path) or hash_file(path))
+    for i in range(3):
+        record_checksums(str(temp_folder), f'file{i}.csv')
+    hashed.clear()
+    expected = {f'file{i}.csv': hash_file(str(temp_folder / f'file{i}.csv')) for i in range(6)}
+
+    with test_client.application.app_context():
+        user = User.query.filter_by(email='test@example.com').first()
+        metadata = DSMetaData(title='Finalize', description='Finalize', tournament_type=TournamentType.OPEN)
+        db.session.add(metadata)
+        db.session.commit()
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+        ids = UploadFinalizeService().finalize(str(temp_folder), user.id, dataset.id)
+        db.session.commit()
+
+        hubfiles = Hubfile.query.filter(Hubfile.id.in_(ids)).order_by(Hubfile.id).all()
+        assert [h.name for h in hubfiles] == [f'file{i}.csv' for i in range(6)]
+        for hubfile in hubfiles:
+            md5, _, size = expected[hubfile.name]
+            assert (hubfile.checksum, hubfile.size, hubfile.dataset_id) == (md5, size, dataset.id)
+            assert storage.exists(f'user_{user.id}/dataset_{dataset.id}/{hubfile.name}')
+
+    assert sorted(os.path.basename(p) for p in hashed) == ['file3.csv', 'file4.csv', 'file5.csv']
+    assert sorted(os.listdir(temp_folder)) == ['.checksums', 'notes.txt']
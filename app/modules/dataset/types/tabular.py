@@ -3,8 +3,10 @@
 This contains logic specific to tabular datasets (CSV). It validates file
 extensions and provides a small preview (head rows) to render in templates.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import codecs
 import csv
+import io
 import os
 import re
 
@@ -147,23 +149,8 @@ class TabularDataset(BaseDataset):
         or
             {"valid": False, "errors": [...], "required_columns": [...]}
         """
-        REQUIRED_COLUMNS = [
-            'nombre_torneo', 'anio_torneo', 'fecha_inicio_torneo', 'fecha_final_torneo',
-            'pista_principal', 'categoria', 'fase', 'ronda',
-            'pareja1_jugador1', 'pareja1_jugador2', 'pareja2_jugador1', 'pareja2_jugador2',
-            'set1_pareja1', 'set1_pareja2', 'set2_pareja1', 'set2_pareja2',
-            'set3_pareja1', 'set3_pareja2',
-            'pareja_ganadora', 'pareja_perdedora', 'resultado_string'
-        ]
-
-        VALID_CATEGORIES = [
-            'Masculino', 'Femenino', 'Mixed',
-            'masculino', 'femenino', 'mixed',
-            'Mixto', 'mixto'  # Spanish variant for Mixed
-        ]
-
         if not os.path.exists(file_path):
-            return {"valid": False, "errors": ["File not found"], "required_columns": REQUIRED_COLUMNS}
+            return {"valid": False, "errors": ["File not found"], "required_columns": PADEL_REQUIRED_COLUMNS}
 
         errors = []
 
@@ -188,85 +175,19 @@ class TabularDataset(BaseDataset):
                     return {
                         "valid": False,
                         "errors": ["CSV file has no headers"],
-                        "required_columns": REQUIRED_COLUMNS
+                        "required_columns": PADEL_REQUIRED_COLUMNS
                     }
 
-                # Check for missing required columns
-                missing_columns = [col for col in REQUIRED_COLUMNS if col not in headers]
-                if missing_columns:
-                    errors.append(f"Missing required columns: {', '.join(missing_columns)}")
-
-                # Check for extra columns (warning, not error)
-                extra_columns = [col for col in headers if col not in REQUIRED_COLUMNS]
-                if extra_columns:
-                    errors.append(f"Warning: Extra columns found: {', '.join(extra_columns)}")
+                errors.extend(check_padel_header(headers))
 
                 # Validate data in each row
                 row_number = 1
                 for row in reader:
                     row_number += 1
-
-                    # Validate year is numeric
-                    if 'anio_torneo' in row and row['anio_torneo']:
-                        try:
-                            year = int(row['anio_torneo'])
-                            if year < 1900 or year > 2100:
-                                errors.append(
-                                    f"Row {row_number}: Invalid year '{year}' (must be between 1900-2100)"
-                                )
-                        except ValueError:
-                            errors.append(
-                                f"Row {row_number}: 'anio_torneo' must be numeric, got '{row['anio_torneo']}'"
-                            )
-
-                    # Validate dates format (DD.MM.YYYY)
-                    for date_field in ['fecha_inicio_torneo', 'fecha_final_torneo']:
-                        if date_field in row and row[date_field]:
-                            date_pattern = re.compile(r'^\d{2}\.\d{2}\.\d{4}$')
-                            if not date_pattern.match(row[date_field]):
-                                errors.append(
-                                    f"Row {row_number}: '{date_field}' must be in DD.MM.YYYY format, "
-                                    f"got '{row[date_field]}'"
-                                )
-
-                    # Validate category
-                    if 'categoria' in row and row['categoria']:
-                        if row['categoria'] not in VALID_CATEGORIES:
-                            errors.append(
-                                f"Row {row_number}: 'categoria' must be one of {VALID_CATEGORIES}, "
-                                f"got '{row['categoria']}'"
-                            )
-
-                    # Validate set scores are numeric (when present)
-                    set_fields = [
-                        'set1_pareja1', 'set1_pareja2', 'set2_pareja1', 'set2_pareja2',
-                        'set3_pareja1', 'set3_pareja2'
-                    ]
-                    for set_field in set_fields:
-                        if set_field in row and row[set_field]:
-                            try:
-                                score = int(row[set_field])
-                                if score < 0 or score > 99:
-                                    errors.append(
-                                        f"Row {row_number}: '{set_field}' score out of range, got {score}"
-                                    )
-                            except ValueError:
-                                errors.append(
-                                    f"Row {row_number}: '{set_field}' must be numeric, "
-                                    f"got '{row[set_field]}'"
-                                )
-
-                    # Validate that player names are not empty
-                    player_fields = [
-                        'pareja1_jugador1', 'pareja1_jugador2',
-                        'pareja2_jugador1', 'pareja2_jugador2'
-                    ]
-                    for player_field in player_fields:
-                        if player_field in row and not row[player_field]:
-                            errors.append(f"Row {row_number}: '{player_field}' cannot be empty")
+                    errors.extend(check_padel_row(row, row_number))
 
                     # Only show first 10 errors to avoid overwhelming output
-                    if len(errors) >= 10:
+                    if len(errors) >= MAX_REPORTED_ERRORS:
                         errors.append("... (more errors may exist, showing first 10)")
                         break
 
@@ -274,14 +195,247 @@ class TabularDataset(BaseDataset):
             return {
                 "valid": False,
                 "errors": [f"Error reading CSV: {str(e)}"],
-                "required_columns": REQUIRED_COLUMNS
+                "required_columns": PADEL_REQUIRED_COLUMNS
             }
 
         if errors:
             return {
                 "valid": False,
                 "errors": errors,
-                "required_columns": REQUIRED_COLUMNS
+                "required_columns": PADEL_REQUIRED_COLUMNS
             }
 
         return {"valid": True}
+
+
+PADEL_REQUIRED_COLUMNS = [
+    'nombre_torneo', 'anio_torneo', 'fecha_inicio_torneo', 'fecha_final_torneo',
+    'pista_principal', 'categoria', 'fase', 'ronda',
+    'pareja1_jugador1', 'pareja1_jugador2', 'pareja2_jugador1', 'pareja2_jugador2',
+    'set1_pareja1', 'set1_pareja2', 'set2_pareja1', 'set2_pareja2',
+    'set3_pareja1', 'set3_pareja2',
+    'pareja_ganadora', 'pareja_perdedora', 'resultado_string'
+]
+
+VALID_CATEGORIES = [
+    'Masculino', 'Femenino', 'Mixed',
+    'masculino', 'femenino', 'mixed',
+    'Mixto', 'mixto'  # Spanish variant for Mixed
+]
+
+SET_FIELDS = [
+    'set1_pareja1', 'set1_pareja2', 'set2_pareja1', 'set2_pareja2',
+    'set3_pareja1', 'set3_pareja2'
+]
+
+PLAYER_FIELDS = [
+    'pareja1_jugador1', 'pareja1_jugador2',
+    'pareja2_jugador1', 'pareja2_jugador2'
+]
+
+DATE_PATTERN = re.compile(r'^\d{2}\.\d{2}\.\d{4}$')
+
+MAX_REPORTED_ERRORS = 10
+
+
+def check_padel_header(headers: List[str]) -> List[str]:
+    """Errors for a padel CSV header: missing columns, and extra columns (reported as warnings)."""
+    errors = []
+
+    # Check for missing required columns
+    missing_columns = [col for col in PADEL_REQUIRED_COLUMNS if col not in headers]
+    if missing_columns:
+        errors.append(f"Missing required columns: {', '.join(missing_columns)}")
+
+    # Check for extra columns (warning, not error)
+    extra_columns = [col for col in headers if col not in PADEL_REQUIRED_COLUMNS]
+    if extra_columns:
+        errors.append(f"Warning: Extra columns found: {', '.join(extra_columns)}")
+
+    return errors
+
+
+def check_padel_row(row: Dict[str, str], row_number: int) -> List[str]:
+    """Errors for one data row of a padel CSV (``row_number`` counts the header as row 1)."""
+    errors = []
+
+    # Validate year is numeric
+    if 'anio_torneo' in row and row['anio_torneo']:
+        try:
+            year = int(row['anio_torneo'])
+            if year < 1900 or year > 2100:
+                errors.append(
+                    f"Row {row_number}: Invalid year '{year}' (must be between 1900-2100)"
+                )
+        except ValueError:
+            errors.append(
+                f"Row {row_number}: 'anio_torneo' must be numeric, got '{row['anio_torneo']}'"
+            )
+
+    # Validate dates format (DD.MM.YYYY)
+    for date_field in ['fecha_inicio_torneo', 'fecha_final_torneo']:
+        if date_field in row and row[date_field]:
+            if not DATE_PATTERN.match(row[date_field]):
+                errors.append(
+                    f"Row {row_number}: '{date_field}' must be in DD.MM.YYYY format, "
+                    f"got '{row[date_field]}'"
+                )
+
+    # Validate category
+    if 'categoria' in row and row['categoria']:
+        if row['categoria'] not in VALID_CATEGORIES:
+            errors.append(
+                f"Row {row_number}: 'categoria' must be one of {VALID_CATEGORIES}, "
+                f"got '{row['categoria']}'"
+            )
+
+    # Validate set scores are numeric (when present)
+    for set_field in SET_FIELDS:
+        if set_field in row and row[set_field]:
+            try:
+                score = int(row[set_field])
+                if score < 0 or score > 99:
+                    errors.append(
+                        f"Row {row_number}: '{set_field}' score out of range, got {score}"
+                    )
+            except ValueError:
+                errors.append(
+                    f"Row {row_number}: '{set_field}' must be numeric, "
+                    f"got '{row[set_field]}'"
+                )
+
+    # Validate that player names are not empty
+    for player_field in PLAYER_FIELDS:
+        if player_field in row and not row[player_field]:
+            errors.append(f"Row {row_number}: '{player_field}' cannot be empty")
+
+    return errors
+
+
+class StreamingPadelValidator:
+    """Validates a padel CSV while it is being uploaded, as chunks are appended to a partial file.
+
+    Each call to ``feed`` checks the records completed since the previous call (a record is
+    complete once a newline outside quotes follows it), so a bad header or row is reported
+    after the chunk that contains it instead of after the whole upload. The progress is a
+    plain dict (``state``) that can be stored between requests.
+
+    UTF-16 files cannot be cut at byte newlines and are validated once, on the final chunk.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.state = state or {"validated": 0, "encoding": None, "header": None, "rows": 1, "lines": 0}
+
+    def feed(self, file_path: str, final: bool = False) -> Optional[Dict[str, Any]]:
+        """Validate what was appended to ``file_path``. Returns None, or the rejection as a response dict."""
+        state = self.state
+        with open(file_path, "rb") as f:
+            f.seek(state["validated"])
+            data = f.read()
+
+        if state["encoding"] is None:
+            if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+                state["encoding"] = "utf-16"
+            elif data.startswith(codecs.BOM_UTF8):
+                state["encoding"] = "utf-8-sig"
+            elif data or final:
+                state["encoding"] = "utf-8"
+
+        if state["encoding"] == "utf-16":
+            return self._validate_whole_file(file_path) if final else None
+
+        boundary = len(data) if final else self._last_record_end(data)
+        segment = data[:boundary]
+        try:
+            text = segment.decode(state["encoding"] or "utf-8")
+        except UnicodeDecodeError:
+            if state["encoding"] == "latin-1":
+                raise
+            # Not UTF-8 after all: start over as latin-1, which decodes any byte
+            self.state = {"validated": 0, "encoding": "latin-1", "header": None, "rows": 1, "lines": 0}
+            return self.feed(file_path, final)
+
+        if final and segment.count(b'"') % 2:
+            return self._syntax_error("Unbalanced quotes detected", state["lines"] + 1, text)
+
+        errors = []
+        reader = csv.reader(io.StringIO(text))
+        try:
+            for record in reader:
+                if state["header"] is None:
+                    state["header"] = record
+                    errors.extend(check_padel_header(record))
+                    if any(not error.startswith("Warning") for error in errors):
+                        break
+                    continue
+                if not record:
+                    continue
+                state["rows"] += 1
+                row = dict(zip(state["header"], record))
+                errors.extend(check_padel_row(row, state["rows"]))
+                if len(errors) >= MAX_REPORTED_ERRORS:
+                    errors.append("... (more errors may exist, showing first 10)")
+                    break
+        except csv.Error as e:
+            return self._syntax_error(str(e), state["lines"] + reader.line_num, text)
+
+        if final and not state["header"]:
+            errors.append("CSV file has no headers")
+        if errors:
+            return {
+                "message": "CSV structure error: file does not match required padel match format",
+                "errors": errors,
+                "required_columns": PADEL_REQUIRED_COLUMNS,
+            }
+
+        state["validated"] += boundary
+        state["lines"] += text.count("\n")
+        return None
+
+    @staticmethod
+    def _last_record_end(data: bytes) -> int:
+        """Offset just past the last newline that is outside a quoted field (0 if none)."""
+        end = 0
+        quotes = 0
+        start = 0
+        newline = data.find(b"\n")
+        while newline != -1:
+            quotes += data.count(b'"', start, newline)
+            start = newline
+            if quotes % 2 == 0:
+                end = newline + 1
+            newline = data.find(b"\n", newline + 1)
+        return end
+
+    def _syntax_error(self, message: str, line: int, text: str) -> Dict[str, Any]:
+        first_line = self.state["lines"] + 1
+        lines = text.splitlines()
+        start = max(0, line - first_line - 3)
+        return {
+            "message": "CSV syntax error",
+            "error": message,
+            "line": line,
+            "encoding_attempted": self.state["encoding"],
+            "snippet": "\n".join(lines[start:line - first_line + 3]),
+        }
+
+    def _validate_whole_file(self, file_path: str) -> Optional[Dict[str, Any]]:
+        tab = TabularDataset(None)
+        validation = tab.validate_syntax(file_path)
+        if not validation.get("valid"):
+            return {
+                "message": "CSV syntax error",
+                "error": validation.get("message"),
+                "line": validation.get("line"),
+                "encoding_attempted": validation.get("encoding"),
+                "snippet": validation.get("snippet"),
+            }
+        self.state["encoding"] = validation.get("encoding")
+        structure = tab.validate_padel_structure(file_path)
+        if not structure.get("valid"):
+            return {
+                "message": "CSV structure error: file does not match required padel match format",
+                "errors": structure.get("errors", []),
+                "required_columns": structure.get("required_columns", []),
+            }
+        return None
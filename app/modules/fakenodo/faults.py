@@ -0,0 +1,209 @@
+"""Latency, failures and rate limits injected into fakenodo, to load-test against a slow or flaky Zenodo.
+
+Profiles come from ``FAKENODO_FAULTS``: a JSON object, or the path of a JSON file, mapping an
+endpoint name (the blueprint view, e.g. ``publish_deposition``) to its profile. ``"*"`` applies
+to every endpoint and is overridden key by key by the endpoint's own profile::
+
+    {
+        "*": {"latency": "lognormal:80:0.6", "rate_limit": "100/m"},
+        "upload_file": {"latency": "uniform:200:1500"},
+        "publish_deposition": {"error_rate": 0.1, "error_status": 502}
+    }
+
+- ``latency``: ``"120"`` or ``"fixed:120"``, ``"uniform:min:max"``, ``"normal:mean:sd"``,
+  ``"lognormal:median:sigma"`` or ``"exponential:mean"``; milliseconds.
+- ``error_rate``: share of requests answered with ``error_status`` (503 by default).
+- ``rate_limit``: ``"count/period"`` with period ``s``, ``m``, ``h`` or seconds. Requests over the
+  limit get a 429 with ``Retry-After``. The ``"*"`` limit is one bucket for all endpoints; the
+  buckets are per process, so with several workers the hub sees workers times the limit.
+
+With ``FAKENODO_FAULT_HEADERS`` on, a request can also set ``X-Fakenodo-Latency`` and
+``X-Fakenodo-Error-Rate`` itself (e.g. from a locustfile). It is off by default, since anyone
+reaching the API could then make the server sleep. ``FAKENODO_FAULTS_SEED`` makes runs repeatable.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional
+
+from flask import current_app, has_app_context
+
+EXTENSION_KEY = "fakenodo_faults"
+ANY_ENDPOINT = "*"
+DEFAULT_ERROR_STATUS = 503
+# Upper bound of one injected delay, whatever the distribution draws
+MAX_LATENCY_SECONDS = 60.0
+LATENCY_HEADER = "X-Fakenodo-Latency"
+ERROR_RATE_HEADER = "X-Fakenodo-Error-Rate"
+PERIODS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+LATENCY_ARITY = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+
+class InjectedFault(Exception):
+    def __init__(self, status: int, endpoint: str, retry_after: Optional[float] = None):
+        reason = "Rate limit exceeded" if status == 429 else "Injected failure"
+        super().__init__(f"{reason} on {endpoint} ({status})")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_latency(spec) -> Callable[[random.Random], float]:
+    """Turn a latency spec (milliseconds) into a sampler returning seconds."""
+    name, _, params = str(spec).partition(":")
+    if not params:
+        name, params = "fixed", name
+    try:
+        args = [float(a) for a in params.split(":")]
+    except ValueError:
+        args = []
+    if LATENCY_ARITY.get(name) != len(args):
+        raise ValueError(f"Invalid fakenodo latency spec: {spec!r}")
+
+    def sample(rng: random.Random) -> float:
+        if name == "uniform":
+            ms = rng.uniform(args[0], args[1])
+        elif name == "normal":
+            ms = rng.gauss(args[0], args[1])
+        elif name == "lognormal":
+            ms = args[0] * math.exp(rng.gauss(0, args[1]))
+        elif name == "exponential":
+            ms = rng.expovariate(1 / args[0]) if args[0] > 0 else 0.0
+        else:
+            ms = args[0]
+        return min(max(ms, 0.0) / 1000, MAX_LATENCY_SECONDS)
+
+    return sample
+
+
+class TokenBucket:
+    def __init__(self, spec: str):
+        try:
+            count, period = str(spec).split("/")
+            self.capacity = float(count)
+            self.period = PERIODS[period] if period in PERIODS else float(period)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid fakenodo rate limit: {spec!r}")
+        self.rate = self.capacity / self.period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> Optional[float]:
+        """Take a token. Returns None when allowed, else the seconds until a token is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+
+class FaultInjector:
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None, seed=None, allow_headers: bool = False):
+        self.profiles = profiles or {}
+        self.allow_headers = allow_headers
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._latency = {name: parse_latency(p["latency"]) for name, p in self.profiles.items() if p.get("latency")}
+        self._buckets = {name: TokenBucket(p["rate_limit"]) for name, p in self.profiles.items() if p.get("rate_limit")}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.profiles) or self.allow_headers
+
+    def _setting(self, endpoint: str, key: str):
+        for name in (endpoint, ANY_ENDPOINT):
+            if key in self.profiles.get(name, {}):
+                return name, self.profiles[name][key]
+        return None, None
+
+    def _random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def apply(self, endpoint: str, headers: Optional[Mapping[str, str]] = None):
+        """Throttle, delay or fail a call to ``endpoint`` following its profile.
+
+        Raises ``InjectedFault`` for the calls that must fail; the others return after the delay.
+        """
+        if not self.enabled:
+            return
+        headers = headers if self.allow_headers and headers is not None else {}
+
+        for name in (endpoint, ANY_ENDPOINT):
+            bucket = self._buckets.get(name)
+            retry_after = bucket.take() if bucket else None
+            if retry_after is not None:
+                raise InjectedFault(429, endpoint, retry_after=retry_after)
+
+        if headers.get(LATENCY_HEADER):
+            sampler = parse_latency(headers[LATENCY_HEADER])
+        else:
+            name, _ = self._setting(endpoint, "latency")
+            sampler = self._latency.get(name)
+        if sampler is not None:
+            with self._rng_lock:
+                delay = sampler(self._rng)
+            time.sleep(delay)
+
+        error_rate = headers.get(ERROR_RATE_HEADER)
+        if error_rate is None:
+            error_rate = self._setting(endpoint, "error_rate")[1]
+        if error_rate and self._random() < float(error_rate):
+            raise InjectedFault(int(self._setting(endpoint, "error_status")[1] or DEFAULT_ERROR_STATUS), endpoint)
+
+
+def load_profiles(value) -> Dict[str, Dict]:
+    """Profiles from a dict, a JSON string or the path of a JSON file."""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+    if os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def create_injector(config=None) -> FaultInjector:
+    config = config or {}
+
+    def setting(name, default=None):
+        return config.get(name) or os.getenv(name, default)
+
+    allow_headers = str(setting("FAKENODO_FAULT_HEADERS", "")).lower() in ("1", "true", "yes")
+    return FaultInjector(load_profiles(setting("FAKENODO_FAULTS")), setting("FAKENODO_FAULTS_SEED"), allow_headers)
+
+
+_default_injector = None
+_injector_lock = threading.Lock()
+
+
+def get_injector() -> FaultInjector:
+    """The injector of the current app, created on first use; a process-wide one outside the app."""
+    global _default_injector
+    if has_app_context():
+        injector = current_app.extensions.get(EXTENSION_KEY)
+        if injector is None:
+            with _injector_lock:
+                injector = current_app.extensions.get(EXTENSION_KEY)
+                if injector is None:
+                    injector = current_app.extensions[EXTENSION_KEY] = create_injector(current_app.config)
+        return injector
+    if _default_injector is None:
+        with _injector_lock:
+            if _default_injector is None:
+                _default_injector = create_injector()
+    return _default_injector
+
+
+def inject(endpoint: str, headers: Optional[Mapping[str, str]] = None):
+    get_injector().apply(endpoint, headers)
@@ -5,40 +5,41 @@ Meets the requested behaviours:
 - Edit metadata only → no new DOI/version
 - Change/add files and publish → new DOI/version
 - Configurable via FAKENODO_URL (prefix /fakenodo/api)
+- Records live in the store chosen by FAKENODO_STORE (see store.py), shared by every worker
+- Optional latency, failures and 429s per endpoint through FAKENODO_FAULTS (see faults.py)
 """
 
 from __future__ import annotations
 
-import itertools
-from typing import Dict, List, Optional
+import hashlib
 
-from flask import Blueprint, jsonify, request
-
-fakenodo_module = Blueprint("fakenodo", __name__, url_prefix="/fakenodo/api")
-
-_STATE: Dict[str, object] = {
-    "next_id": itertools.count(1),
-    "records": {},          # rec_id -> record dict
-    "versions": {},         # conceptrecid -> list of rec_ids
-}
+import math
 
+from flask import Blueprint, jsonify, request, url_for
 
-def _new_id() -> int:
-    return next(_STATE["next_id"])  # type: ignore[arg-type]
+from app.modules.fakenodo.faults import InjectedFault, inject
+from app.modules.fakenodo.store import DEFAULT_PAGE_SIZE, DEFAULT_SORT, MAX_PAGE_SIZE, SORTS, STATUSES, get_store
 
-
-def _get_record(rec_id: int) -> Optional[Dict]:
-    return _STATE["records"].get(rec_id)  # type: ignore[index]
+fakenodo_module = Blueprint("fakenodo", __name__, url_prefix="/fakenodo/api")
 
 
-def _add_version(conceptrecid: int, rec_id: int) -> None:
-    versions: Dict = _STATE["versions"]  # type: ignore[assignment]
-    versions.setdefault(conceptrecid, []).append(rec_id)
+@fakenodo_module.before_request
+def inject_faults():
+    # Latency, errors and rate limits of the endpoint's fault profile (see faults.py)
+    try:
+        inject(request.endpoint.rsplit(".", 1)[-1], request.headers)
+    except InjectedFault as fault:
+        response = jsonify({"status": fault.status, "message": str(fault)})
+        response.status_code = fault.status
+        if fault.retry_after is not None:
+            response.headers["Retry-After"] = str(math.ceil(fault.retry_after))
+        return response
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
 
-def _get_versions(conceptrecid: int) -> List[int]:
-    versions: Dict = _STATE["versions"]  # type: ignore[assignment]
-    return versions.get(conceptrecid, [])
+def _not_found():
+    return jsonify({"message": "Deposition not found"}), 404
 
 
 # Test connection (GET /fakenodo/api)
@@ -48,131 +49,137 @@ def test_connection_fakenodo():
     return jsonify(response), 200
 
 
-# List all depositions (return list directly as Zenodo does)
+# List depositions, one page at a time (return list directly as Zenodo does)
 @fakenodo_module.route("/deposit/depositions", methods=["GET"])
 def get_all_depositions():
-    return jsonify(list(_STATE["records"].values())), 200
+    page = request.args.get("page", 1, type=int)
+    size = request.args.get("size", DEFAULT_PAGE_SIZE, type=int)
+    sort = request.args.get("sort") or DEFAULT_SORT
+    # Without a relevance score, best match is the most recent first
+    sort = DEFAULT_SORT if sort == "bestmatch" else sort
+    status = request.args.get("status") or None
+    q = request.args.get("q")
+    if page < 1 or not 1 <= size <= MAX_PAGE_SIZE:
+        return jsonify({"message": f"page must be 1 or more and size between 1 and {MAX_PAGE_SIZE}"}), 400
+    if sort not in SORTS:
+        return jsonify({"message": f"sort must be one of {list(SORTS)}"}), 400
+    if status is not None and status not in STATUSES:
+        return jsonify({"message": f"status must be one of {list(STATUSES)}"}), 400
+    try:
+        records, total = get_store().search(q=q, status=status, sort=sort, page=page, size=size)
+    except ValueError as e:
+        return jsonify({"message": f"Invalid q: {e}"}), 400
+
+    response = jsonify(records)
+    response.headers["X-Total-Count"] = str(total)
+    last = max((total + size - 1) // size, 1)
+    params = {k: v for k, v in {"q": q, "status": status, "sort": sort, "size": size}.items() if v}
+    links = {"first": 1, "last": last}
+    if page > 1:
+        links["prev"] = min(page - 1, last)
+    if page < last:
+        links["next"] = page + 1
+    response.headers["Link"] = ", ".join(
+        f'<{url_for("fakenodo.get_all_depositions", page=n, _external=True, **params)}>; rel="{rel}"'
+        for rel, n in links.items()
+    )
+    return response, 200
 
 
 # Create deposition
 @fakenodo_module.route("/deposit/depositions", methods=["POST"])
 def create_new_deposition():
     payload = request.get_json(silent=True) or {}
-    metadata = payload.get("metadata", {})
-    rec_id = _new_id()
-    record = {
-        "id": rec_id,
-        "conceptrecid": rec_id,  # first version = concept id
-        "metadata": metadata,
-        "files": [],
-        "doi": None,
-        "published": False,
-        "files_modified": False,
-    }
-    _STATE["records"][rec_id] = record
-    _add_version(rec_id, rec_id)
+    record = get_store().create(payload.get("metadata", {}))
     return jsonify(record), 201
 
 
 # Get deposition
 @fakenodo_module.route("/deposit/depositions/<int:deposition_id>", methods=["GET"])
 def get_deposition(deposition_id):
-    record = _get_record(deposition_id)
+    record = get_store().get(deposition_id)
     if not record:
-        return jsonify({"message": "Deposition not found"}), 404
+        return _not_found()
     return jsonify(record), 200
 
 
 # Update metadata only (no new DOI/version)
 @fakenodo_module.route("/deposit/depositions/<int:deposition_id>", methods=["PUT"])
 def update_metadata(deposition_id):
-    record = _get_record(deposition_id)
-    if not record:
-        return jsonify({"message": "Deposition not found"}), 404
-
     payload = request.get_json(silent=True) or {}
-    new_metadata = payload.get("metadata", {})
-    record["metadata"].update(new_metadata)
+    record = get_store().update_metadata(deposition_id, payload.get("metadata", {}))
+    if not record:
+        return _not_found()
     return jsonify(record), 200
 
 
 # Delete deposition
 @fakenodo_module.route("/deposit/depositions/<deposition_id>", methods=["DELETE"])
 def delete_deposition_fakenodo(deposition_id):
-    deposition_id_int = int(deposition_id)
-    if deposition_id_int in _STATE["records"]:
-        del _STATE["records"][deposition_id_int]
+    if get_store().delete(int(deposition_id)):
         return jsonify({"message": "Deposition deleted"}), 200
-    return jsonify({"message": "Deposition not found"}), 404
+    return _not_found()
 
 
 # Upload file
 @fakenodo_module.route("/deposit/depositions/<int:deposition_id>/files", methods=["POST"])
 def upload_file(deposition_id):
-    record = _get_record(deposition_id)
-    if not record:
-        return jsonify({"message": "Deposition not found"}), 404
-
     # Get filename from form data or from uploaded file
+    file = list(request.files.values())[0] if request.files else None
     filename = request.form.get("filename") or request.form.get("name")
-    if not filename and request.files:
-        # If filename not in form, get it from the uploaded file
-        file = list(request.files.values())[0] if request.files else None
-        filename = file.filename if file else "unnamed_file"
     if not filename:
-        filename = "unnamed_file"
-    
+        filename = file.filename if file and file.filename else "unnamed_file"
+
+    # Only the checksum and size of the content are kept, like the listing of a real deposition
+    checksum, filesize = None, None
+    if file is not None:
+        md5 = hashlib.md5()
+        filesize = 0
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b""):
+            md5.update(chunk)
+            filesize += len(chunk)
+        checksum = md5.hexdigest()
+
     # dedupe by filename
-    record["files"] = [f for f in record["files"] if f.get("filename") != filename]
-    record["files"].append({"filename": filename})
-    record["files_modified"] = True
+    entry = get_store().add_file(deposition_id, filename, checksum=checksum, filesize=filesize)
+    if entry is None:
+        return _not_found()
+    entry["link"] = f"http://fakenodo.org/files/{deposition_id}/files/{filename}"
+    return jsonify(entry), 201
+
 
-    return jsonify({"filename": filename, "link": f"http://fakenodo.org/files/{deposition_id}/files/{filename}"}), 201
+# List the files of a deposition
+@fakenodo_module.route("/deposit/depositions/<int:deposition_id>/files", methods=["GET"])
+def list_files(deposition_id):
+    files = get_store().list_files(deposition_id)
+    if files is None:
+        return _not_found()
+    return jsonify(files), 200
+
+
+# Delete a file of a deposition (the file id is its name)
+@fakenodo_module.route("/deposit/depositions/<int:deposition_id>/files/<path:file_id>", methods=["DELETE"])
+def delete_file(deposition_id, file_id):
+    if not get_store().delete_file(deposition_id, file_id):
+        return jsonify({"message": "File not found"}), 404
+    return "", 204
 
 
 # Publish deposition
 @fakenodo_module.route("/deposit/depositions/<int:deposition_id>/actions/publish", methods=["POST"])
 def publish_deposition(deposition_id):
-    record = _get_record(deposition_id)
+    # If already published and files changed -> new version with new DOI; the full record is
+    # returned as Zenodo does, which includes id, doi, conceptrecid and metadata
+    record = get_store().publish(deposition_id)
     if not record:
-        return jsonify({"message": "Deposition not found"}), 404
-
-    # If already published and files changed -> new version with new DOI
-    if record.get("published") and record.get("files_modified"):
-        conceptrecid = record["conceptrecid"]
-        new_rec_id = _new_id()
-        new_record = {
-            "id": new_rec_id,
-            "conceptrecid": conceptrecid,
-            "metadata": record["metadata"].copy(),
-            "files": record["files"].copy(),
-            "doi": f"10.5072/fakenodo.{new_rec_id}",
-            "published": True,
-            "files_modified": False,
-        }
-        _STATE["records"][new_rec_id] = new_record
-        _add_version(conceptrecid, new_rec_id)
-        # Return the full new record as Zenodo does
-        return jsonify(new_record), 202
-
-    # First publish or metadata-only change
-    if not record.get("doi"):
-        record["doi"] = f"10.5072/fakenodo.{deposition_id}"
-    record["published"] = True
-    record["files_modified"] = False
-    # Return the full record as Zenodo does, which includes id, doi, conceptrecid and metadata
+        return _not_found()
     return jsonify(record), 202
 
 
 # List versions for a concept
 @fakenodo_module.route("/deposit/depositions/<int:deposition_id>/versions", methods=["GET"])
 def list_versions(deposition_id):
-    record = _get_record(deposition_id)
-    if not record:
-        return jsonify({"message": "Deposition not found"}), 404
-
-    conceptrecid = record["conceptrecid"]
-    version_ids = _get_versions(conceptrecid)
-    records: Dict[int, Dict] = _STATE["records"]  # type: ignore[assignment]
-    versions = [records[vid] for vid in version_ids if vid in records]
+    versions = get_store().versions(deposition_id)
+    if versions is None:
+        return _not_found()
     return jsonify({"versions": versions}), 200
@@ -1,18 +1,18 @@
 """Fakenodo service for local/development dataset synchronization.
 
-This service provides a simple in-memory mock of Zenodo API functionality
-without requiring external API calls or tokens. It communicates with the
-fakenodo blueprint API endpoints running in the same Flask application.
+This service provides a mock of Zenodo API functionality without requiring external API calls
+or tokens. It works directly on the store behind the fakenodo blueprint, so depositions created
+here are the ones the blueprint lists, with the same ids and DOIs. Calls go through the same
+fault profiles as the blueprint endpoints of the same name: a slow or failing fakenodo is slow
+or failing for the hub too (an injected failure is raised as ``InjectedFault``).
 """
 
-import itertools
 import logging
-import os
-from flask_login import current_user
 
 from app.modules.dataset.models import DataSet
+from app.modules.fakenodo.faults import inject
+from app.modules.fakenodo.store import get_store
 from app.modules.hubfile.models import Hubfile
-from core.configuration.configuration import uploads_folder_name
 from core.services.BaseService import BaseService
 
 logger = logging.getLogger(__name__)
@@ -23,10 +23,7 @@ class FakenodoService(BaseService):
 
     def __init__(self):
         super().__init__(None)  # No repository needed
-        
-        # Counter for generating fake DOIs
-        self._counter = itertools.count(1)
-        
+
         # Set dummy URL for compatibility (not actually used)
         self.FAKENODO_API_URL = "http://fake-zenodo-simulator/api"
         self.ZENODO_API_URL = self.FAKENODO_API_URL
@@ -36,64 +33,71 @@ class FakenodoService(BaseService):
     def test_connection(self) -> bool:
         """Test connection to fakenodo API - always returns True (fake)."""
         logger.info("Fakenodo connection test - returning True (simulated)")
+        inject("test_connection_fakenodo")
         return True
 
     def create_new_deposition(self, dataset: DataSet) -> dict:
         """Create a fake deposition - NO REAL API CALL."""
-        # Use dataset.id to ensure unique deposition IDs
-        deposition_id = dataset.id
-        logger.info(f"Creating FAKE deposition for dataset {dataset.id} with ID {deposition_id}")
-        
-        # Return fake response matching Zenodo format
-        return {
-            "id": deposition_id,
-            "conceptrecid": deposition_id,
-            "metadata": {
-                "title": dataset.ds_meta_data.title,
-                "description": dataset.ds_meta_data.description,
-            },
-            "files": [],
-            "doi": None,
-            "published": False,
+        inject("create_new_deposition")
+        metadata = {
+            "title": dataset.ds_meta_data.title,
+            "description": dataset.ds_meta_data.description,
         }
+        record = get_store().create(metadata)
+        logger.info(f"Creating FAKE deposition for dataset {dataset.id} with ID {record['id']}")
+        return record
 
     def upload_file(self, dataset: DataSet, deposition_id: int, file: Hubfile, user=None) -> dict:
         """Fake upload file - NO REAL API CALL."""
         filename = file.name
         logger.info(f"FAKE upload of {filename} to deposition {deposition_id}")
-        
-        # Return fake success response
-        return {
-            "filename": filename,
-            "link": f"http://fake-zenodo.org/files/{deposition_id}/{filename}"
-        }
+        inject("upload_file")
+        entry = get_store().add_file(deposition_id, filename, checksum=file.checksum, filesize=file.size)
+        if entry is None:
+            raise Exception(f"Failed to upload files. Deposition {deposition_id} not found")
+        entry["link"] = f"http://fake-zenodo.org/files/{deposition_id}/{filename}"
+        return entry
+
+    def upload_files(self, dataset: DataSet, deposition_id: int, files=None, progress=None, max_workers=None) -> dict:
+        """Fake upload of several files - NO REAL API CALL. Files already there are skipped."""
+        files = dataset.files() if files is None else files
+        inject("list_files")
+        existing = {f["filename"]: f["checksum"] for f in get_store().list_files(deposition_id) or []}
+        report = {"uploaded": [], "skipped": [], "failed": {}}
+        for file in files:
+            if existing.get(file.name) == file.checksum:
+                report["skipped"].append(file.name)
+                continue
+            try:
+                self.upload_file(dataset, deposition_id, file)
+            except Exception as exc:
+                report["failed"][file.name] = str(exc)
+                continue
+            if progress:
+                progress(file.name, file.size, file.size)
+            report["uploaded"].append(file.name)
+        return report
 
     def publish_deposition(self, deposition_id: int) -> dict:
         """Fake publish - NO REAL API CALL."""
-        fake_doi = f"10.5072/fakenodo.{deposition_id}"
-        logger.info(f"FAKE publish of deposition {deposition_id} with DOI {fake_doi}")
-        
-        # Return fake published response
-        return {
-            "id": deposition_id,
-            "conceptrecid": deposition_id,
-            "doi": fake_doi,
-            "published": True,
-        }
+        inject("publish_deposition")
+        record = get_store().publish(deposition_id)
+        if record is None:
+            raise Exception("Failed to publish deposition")
+        logger.info(f"FAKE publish of deposition {deposition_id} with DOI {record['doi']}")
+        return record
 
     def get_deposition(self, deposition_id: int) -> dict:
         """Fake get deposition - NO REAL API CALL."""
         logger.info(f"FAKE get deposition {deposition_id}")
-        
-        return {
-            "id": deposition_id,
-            "conceptrecid": deposition_id,
-            "doi": f"10.5072/fakenodo.{deposition_id}",
-            "published": True,
-        }
+        inject("get_deposition")
+        record = get_store().get(deposition_id)
+        if record is None:
+            raise Exception("Failed to get deposition")
+        return record
 
     def get_doi(self, deposition_id: int) -> str:
         """Get fake DOI - NO REAL API CALL."""
-        fake_doi = f"10.5072/fakenodo.{deposition_id}"
+        fake_doi = self.get_deposition(deposition_id).get("doi")
         logger.info(f"FAKE DOI returned: {fake_doi}")
-        return fake_doi
\ No newline at end of file
+        return fake_doi
@@ -0,0 +1,536 @@
+"""Where fakenodo keeps its depositions.
+
+``MemoryStore`` holds them in the process, behind a lock. ``SQLiteStore`` keeps them in a SQLite
+file that every gunicorn worker opens, so all workers see the same depositions and ids, and the
+data survives a restart. Writes take SQLite's write lock up front (``BEGIN IMMEDIATE``), so a
+publish that creates a new version is atomic across threads and processes.
+
+The store is chosen by ``FAKENODO_STORE`` ("sqlite" or "memory") and ``FAKENODO_DB_PATH``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import copy
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+EXTENSION_KEY = "fakenodo_store"
+DEFAULT_DB_PATH = "fakenodo.sqlite3"
+# Listing, as Zenodo's: newest first, 10 per page unless asked otherwise
+SORTS = ("mostrecent", "-mostrecent")
+DEFAULT_SORT = "mostrecent"
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+QUERY_FIELDS = ("id", "conceptrecid", "doi")
+STATUSES = ("draft", "published")
+# Ids per SQL statement when loading many records
+SQLITE_BATCH = 500
+
+
+def _doi(rec_id: int) -> str:
+    return f"10.5072/fakenodo.{rec_id}"
+
+
+def parse_query(q: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """``"conceptrecid:12"`` -> ("conceptrecid", "12"); plain text -> ("title", text); nothing -> (None, None)."""
+    q = (q or "").strip()
+    if not q:
+        return None, None
+    field, sep, value = q.partition(":")
+    if sep and field in QUERY_FIELDS:
+        value = value.strip().strip('"')
+        if field != "doi" and not value.isdigit():
+            raise ValueError(f"{field} must be a number")
+        return field, value
+    return "title", q
+
+
+def _page_bounds(total: int, sort: str, page: int, size: int) -> Tuple[int, int]:
+    """Slice of the id-ordered matches making up the page (reversed afterwards for "mostrecent")."""
+    offset = (page - 1) * size
+    if sort == "mostrecent":
+        end = max(total - offset, 0)
+        return max(end - size, 0), end
+    return min(offset, total), min(offset + size, total)
+
+
+class FakenodoStore:
+    """Deposition records shaped like Zenodo's: id, conceptrecid, metadata, files, doi, published."""
+
+    def create(self, metadata: Dict) -> Dict:
+        raise NotImplementedError
+
+    def get(self, rec_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def update_metadata(self, rec_id: int, metadata: Dict) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def delete(self, rec_id: int) -> bool:
+        raise NotImplementedError
+
+    def add_file(self, rec_id: int, filename: str, checksum: str = None, filesize: int = None) -> Optional[Dict]:
+        """Add (or replace) a file of a deposition. Returns the file entry, None if no such deposition."""
+        raise NotImplementedError
+
+    def list_files(self, rec_id: int) -> Optional[List[Dict]]:
+        raise NotImplementedError
+
+    def delete_file(self, rec_id: int, filename: str) -> bool:
+        raise NotImplementedError
+
+    def publish(self, rec_id: int) -> Optional[Dict]:
+        """Publish a deposition. Republishing after a file change creates a new version (and DOI)."""
+        raise NotImplementedError
+
+    def all(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        status: Optional[str] = None,
+        sort: str = DEFAULT_SORT,
+        page: int = 1,
+        size: int = DEFAULT_PAGE_SIZE,
+    ) -> Tuple[List[Dict], int]:
+        """One page of depositions and the number of matches, like Zenodo's deposition listing.
+
+        ``q`` is ``id:<id>``, ``conceptrecid:<id>``, ``doi:<doi>`` or text looked up in the titles;
+        ``status`` is "draft" or "published"; ``sort`` is "mostrecent" (newest first) or
+        "-mostrecent".
+        """
+        raise NotImplementedError
+
+    def versions(self, rec_id: int) -> Optional[List[Dict]]:
+        """Every version sharing the deposition's concept, oldest first."""
+        raise NotImplementedError
+
+
+class MemoryStore(FakenodoStore):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._records: Dict[int, Dict] = {}
+        # Ordered indexes: every rec_id, and the rec_ids of each concept, ascending
+        self._order: List[int] = []
+        self._versions: Dict[int, List[int]] = {}  # conceptrecid -> rec_ids
+        self._by_doi: Dict[str, int] = {}
+
+    def create(self, metadata):
+        with self._lock:
+            rec_id = next(self._ids)
+            record = {
+                "id": rec_id,
+                "conceptrecid": rec_id,  # first version = concept id
+                "metadata": copy.deepcopy(metadata),
+                "files": [],
+                "doi": None,
+                "published": False,
+                "files_modified": False,
+            }
+            self._records[rec_id] = record
+            # Ids only grow, so appending keeps the indexes sorted
+            self._order.append(rec_id)
+            self._versions.setdefault(rec_id, []).append(rec_id)
+            return copy.deepcopy(record)
+
+    def get(self, rec_id):
+        with self._lock:
+            record = self._records.get(rec_id)
+            return copy.deepcopy(record) if record else None
+
+    def update_metadata(self, rec_id, metadata):
+        with self._lock:
+            record = self._records.get(rec_id)
+            if record is None:
+                return None
+            record["metadata"].update(copy.deepcopy(metadata))
+            return copy.deepcopy(record)
+
+    def delete(self, rec_id):
+        with self._lock:
+            record = self._records.pop(rec_id, None)
+            if record is None:
+                return False
+            del self._order[bisect.bisect_left(self._order, rec_id)]
+            versions = self._versions.get(record["conceptrecid"], [])
+            del versions[bisect.bisect_left(versions, rec_id)]
+            self._by_doi.pop(record["doi"], None)
+            return True
+
+    def add_file(self, rec_id, filename, checksum=None, filesize=None):
+        with self._lock:
+            record = self._records.get(rec_id)
+            if record is None:
+                return None
+            entry = {"id": filename, "filename": filename, "checksum": checksum, "filesize": filesize}
+            record["files"] = [f for f in record["files"] if f["filename"] != filename] + [entry]
+            record["files_modified"] = True
+            return dict(entry)
+
+    def list_files(self, rec_id):
+        with self._lock:
+            record = self._records.get(rec_id)
+            return copy.deepcopy(record["files"]) if record else None
+
+    def delete_file(self, rec_id, filename):
+        with self._lock:
+            record = self._records.get(rec_id)
+            if record is None or not any(f["filename"] == filename for f in record["files"]):
+                return False
+            record["files"] = [f for f in record["files"] if f["filename"] != filename]
+            record["files_modified"] = True
+            return True
+
+    def publish(self, rec_id):
+        with self._lock:
+            record = self._records.get(rec_id)
+            if record is None:
+                return None
+            if record["published"] and record["files_modified"]:
+                new_id = next(self._ids)
+                new_record = {
+                    "id": new_id,
+                    "conceptrecid": record["conceptrecid"],
+                    "metadata": copy.deepcopy(record["metadata"]),
+                    "files": copy.deepcopy(record["files"]),
+                    "doi": _doi(new_id),
+                    "published": True,
+                    "files_modified": False,
+                }
+                self._records[new_id] = new_record
+                self._order.append(new_id)
+                self._versions.setdefault(record["conceptrecid"], []).append(new_id)
+                self._by_doi[new_record["doi"]] = new_id
+                return copy.deepcopy(new_record)
+            if not record["doi"]:
+                record["doi"] = _doi(rec_id)
+                self._by_doi[record["doi"]] = rec_id
+            record["published"] = True
+            record["files_modified"] = False
+            return copy.deepcopy(record)
+
+    def all(self):
+        with self._lock:
+            return copy.deepcopy(list(self._records.values()))
+
+    def search(self, q=None, status=None, sort=DEFAULT_SORT, page=1, size=DEFAULT_PAGE_SIZE):
+        field, value = parse_query(q)
+        with self._lock:
+            if field == "id":
+                candidates = [int(value)] if int(value) in self._records else []
+            elif field == "conceptrecid":
+                candidates = self._versions.get(int(value), [])
+            elif field == "doi":
+                candidates = [self._by_doi[value]] if value in self._by_doi else []
+            else:
+                candidates = self._order
+            if field == "title" or status:
+                text = (value or "").lower()
+                published = status == "published"
+                candidates = [
+                    i
+                    for i in candidates
+                    if (not status or self._records[i]["published"] == published)
+                    and text in str(self._records[i]["metadata"].get("title") or "").lower()
+                ]
+            start, end = _page_bounds(len(candidates), sort, page, size)
+            ids = candidates[start:end]
+            if sort == "mostrecent":
+                ids = ids[::-1]
+            return [copy.deepcopy(self._records[i]) for i in ids], len(candidates)
+
+    def versions(self, rec_id):
+        with self._lock:
+            record = self._records.get(rec_id)
+            if record is None:
+                return None
+            ids = self._versions.get(record["conceptrecid"], [])
+            return [copy.deepcopy(self._records[i]) for i in ids]
+
+
+class SQLiteStore(FakenodoStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conceptrecid INTEGER NOT NULL,
+            metadata TEXT NOT NULL,
+            doi TEXT,
+            published INTEGER NOT NULL DEFAULT 0,
+            files_modified INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS ix_records_conceptrecid ON records (conceptrecid, id);
+        CREATE INDEX IF NOT EXISTS ix_records_published ON records (published, id);
+        CREATE INDEX IF NOT EXISTS ix_records_doi ON records (doi);
+        CREATE TABLE IF NOT EXISTS files (
+            record_id INTEGER NOT NULL REFERENCES records (id) ON DELETE CASCADE,
+            filename TEXT NOT NULL,
+            checksum TEXT,
+            filesize INTEGER,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (record_id, filename)
+        );
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        # sqlite3 connections may not be shared between threads: one per thread
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        # Readers do not block the writer, nor the writer the readers
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly by _read and _write
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _read(self):
+        # One snapshot for the record and its files
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _file(row) -> Dict:
+        return {
+            "id": row["filename"],
+            "filename": row["filename"],
+            "checksum": row["checksum"],
+            "filesize": row["filesize"],
+        }
+
+    @classmethod
+    def _files(cls, conn, rec_id: int) -> List[Dict]:
+        rows = conn.execute(
+            "SELECT filename, checksum, filesize FROM files WHERE record_id = ? ORDER BY position", (rec_id,)
+        )
+        return [cls._file(row) for row in rows]
+
+    def _records(self, conn, rec_ids: List[int]) -> List[Dict]:
+        """The records with these ids, in the same order, loaded with two queries per batch."""
+        records = []
+        for i in range(0, len(rec_ids), SQLITE_BATCH):
+            batch = rec_ids[i:i + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT * FROM records WHERE id IN ({placeholders})", batch)
+            rows = {row["id"]: row for row in rows}
+            files = defaultdict(list)
+            for row in conn.execute(
+                "SELECT record_id, filename, checksum, filesize FROM files "
+                f"WHERE record_id IN ({placeholders}) ORDER BY record_id, position",
+                batch,
+            ):
+                files[row["record_id"]].append(self._file(row))
+            records.extend(
+                {
+                    "id": row["id"],
+                    "conceptrecid": row["conceptrecid"],
+                    "metadata": json.loads(row["metadata"]),
+                    "files": files[row["id"]],
+                    "doi": row["doi"],
+                    "published": bool(row["published"]),
+                    "files_modified": bool(row["files_modified"]),
+                }
+                for row in (rows.get(rec_id) for rec_id in batch)
+                if row is not None
+            )
+        return records
+
+    def _record(self, conn, rec_id: int) -> Optional[Dict]:
+        records = self._records(conn, [rec_id])
+        return records[0] if records else None
+
+    def create(self, metadata):
+        with self._write() as conn:
+            rec_id = conn.execute(
+                "INSERT INTO records (conceptrecid, metadata) VALUES (0, ?)", (json.dumps(metadata),)
+            ).lastrowid
+            conn.execute("UPDATE records SET conceptrecid = id WHERE id = ?", (rec_id,))
+            return self._record(conn, rec_id)
+
+    def get(self, rec_id):
+        with self._read() as conn:
+            return self._record(conn, rec_id)
+
+    def update_metadata(self, rec_id, metadata):
+        with self._write() as conn:
+            record = self._record(conn, rec_id)
+            if record is None:
+                return None
+            record["metadata"].update(metadata)
+            conn.execute("UPDATE records SET metadata = ? WHERE id = ?", (json.dumps(record["metadata"]), rec_id))
+            return record
+
+    def delete(self, rec_id):
+        with self._write() as conn:
+            return conn.execute("DELETE FROM records WHERE id = ?", (rec_id,)).rowcount == 1
+
+    def add_file(self, rec_id, filename, checksum=None, filesize=None):
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM records WHERE id = ?", (rec_id,)).fetchone() is None:
+                return None
+            conn.execute("DELETE FROM files WHERE record_id = ? AND filename = ?", (rec_id, filename))
+            conn.execute(
+                "INSERT INTO files (record_id, filename, checksum, filesize, position) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM files WHERE record_id = ?))",
+                (rec_id, filename, checksum, filesize, rec_id),
+            )
+            conn.execute("UPDATE records SET files_modified = 1 WHERE id = ?", (rec_id,))
+            return {"id": filename, "filename": filename, "checksum": checksum, "filesize": filesize}
+
+    def list_files(self, rec_id):
+        with self._read() as conn:
+            if conn.execute("SELECT 1 FROM records WHERE id = ?", (rec_id,)).fetchone() is None:
+                return None
+            return self._files(conn, rec_id)
+
+    def delete_file(self, rec_id, filename):
+        with self._write() as conn:
+            deleted = conn.execute(
+                "DELETE FROM files WHERE record_id = ? AND filename = ?", (rec_id, filename)
+            ).rowcount
+            if deleted:
+                conn.execute("UPDATE records SET files_modified = 1 WHERE id = ?", (rec_id,))
+            return deleted == 1
+
+    def publish(self, rec_id):
+        with self._write() as conn:
+            record = self._record(conn, rec_id)
+            if record is None:
+                return None
+            if record["published"] and record["files_modified"]:
+                new_id = conn.execute(
+                    "INSERT INTO records (conceptrecid, metadata, published) VALUES (?, ?, 1)",
+                    (record["conceptrecid"], json.dumps(record["metadata"])),
+                ).lastrowid
+                conn.execute("UPDATE records SET doi = ? WHERE id = ?", (_doi(new_id), new_id))
+                conn.execute(
+                    "INSERT INTO files (record_id, filename, checksum, filesize, position) "
+                    "SELECT ?, filename, checksum, filesize, position FROM files WHERE record_id = ?",
+                    (new_id, rec_id),
+                )
+                return self._record(conn, new_id)
+            conn.execute(
+                "UPDATE records SET doi = COALESCE(doi, ?), published = 1, files_modified = 0 WHERE id = ?",
+                (_doi(rec_id), rec_id),
+            )
+            return self._record(conn, rec_id)
+
+    def all(self):
+        with self._read() as conn:
+            ids = [row["id"] for row in conn.execute("SELECT id FROM records ORDER BY id")]
+            return self._records(conn, ids)
+
+    def search(self, q=None, status=None, sort=DEFAULT_SORT, page=1, size=DEFAULT_PAGE_SIZE):
+        field, value = parse_query(q)
+        where, params = [], []
+        if field == "title":
+            where.append("json_extract(metadata, '$.title') LIKE ? ESCAPE '\\'")
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        elif field is not None:
+            where.append(f"{field} = ?")
+            params.append(value if field == "doi" else int(value))
+        if status:
+            where.append("published = ?")
+            params.append(1 if status == "published" else 0)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        order = "DESC" if sort == "mostrecent" else "ASC"
+        with self._read() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM records{clause}", params).fetchone()[0]
+            ids = [
+                row["id"]
+                for row in conn.execute(
+                    f"SELECT id FROM records{clause} ORDER BY id {order} LIMIT ? OFFSET ?",
+                    params + [size, (page - 1) * size],
+                )
+            ]
+            return self._records(conn, ids), total
+
+    def versions(self, rec_id):
+        with self._read() as conn:
+            row = conn.execute("SELECT conceptrecid FROM records WHERE id = ?", (rec_id,)).fetchone()
+            if row is None:
+                return None
+            ids = conn.execute(
+                "SELECT id FROM records WHERE conceptrecid = ? ORDER BY id", (row["conceptrecid"],)
+            ).fetchall()
+            return self._records(conn, [r["id"] for r in ids])
+
+
+def create_store(config=None) -> FakenodoStore:
+    """Build the store selected by FAKENODO_STORE ("sqlite" by default, or "memory")."""
+    config = config or {}
+
+    def setting(name, default=None):
+        return config.get(name) or os.getenv(name, default)
+
+    if (setting("FAKENODO_STORE", "sqlite") or "sqlite").lower() == "memory":
+        return MemoryStore()
+    path = setting("FAKENODO_DB_PATH", DEFAULT_DB_PATH)
+    if not os.path.isabs(path):
+        path = os.path.join(os.getenv("WORKING_DIR", ""), path)
+    return SQLiteStore(path)
+
+
+_default_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> FakenodoStore:
+    """The store of the current app, created on first use; a process-wide one outside the app."""
+    global _default_store
+    if has_app_context():
+        store = current_app.extensions.get(EXTENSION_KEY)
+        if store is None:
+            with _store_lock:
+                store = current_app.extensions.get(EXTENSION_KEY)
+                if store is None:
+                    store = current_app.extensions[EXTENSION_KEY] = create_store(current_app.config)
+        return store
+    if _default_store is None:
+        with _store_lock:
+            if _default_store is None:
+                _default_store = create_store()
+    return _default_store
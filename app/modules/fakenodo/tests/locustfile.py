@@ -1,17 +1,31 @@
+import os
+
 from locust import HttpUser, TaskSet, task
 
 from core.environment.host import get_host_for_locust_testing
 
 
+# Per-request fault injection, honoured when the server runs with FAKENODO_FAULT_HEADERS=1
+FAULT_HEADERS = {
+    header: value
+    for header, value in {
+        "X-Fakenodo-Latency": os.getenv("LOCUST_FAKENODO_LATENCY"),
+        "X-Fakenodo-Error-Rate": os.getenv("LOCUST_FAKENODO_ERROR_RATE"),
+    }.items()
+    if value
+}
+
+
 class FakenodoBehavior(TaskSet):
     def on_start(self):
         """Initialize by listing depositions."""
+        self.client.headers.update(FAULT_HEADERS)
         self.list_depositions()
 
     @task(3)
     def list_depositions(self):
         """List all depositions - most frequent operation."""
-        response = self.client.get("/fakenodo/depositions")
+        response = self.client.get("/fakenodo/api/deposit/depositions")
         if response.status_code != 200:
             print(f"List depositions failed: {response.status_code}")
 
@@ -19,7 +33,7 @@ class FakenodoBehavior(TaskSet):
     def create_deposition(self):
         """Create a new deposition."""
         response = self.client.post(
-            "/fakenodo/depositions",
+            "/fakenodo/api/deposit/depositions",
             json={
                 "metadata": {
                     "title": "Test Dataset",
@@ -42,15 +56,16 @@ class FakenodoBehavior(TaskSet):
     def upload_file_to_deposition(self, rec_id):
         """Upload a file to an existing deposition."""
         response = self.client.post(
-            f"/fakenodo/depositions/{rec_id}/files",
-            json={"name": "test_file.uvl"},
+            f"/fakenodo/api/deposit/depositions/{rec_id}/files",
+            data={"name": "test_file.csv"},
+            files={"file": ("test_file.csv", b"player,points\nA,3\n")},
         )
         if response.status_code != 201:
             print(f"Upload file failed: {response.status_code}")
 
     def publish_deposition(self, rec_id):
         """Publish a deposition."""
-        response = self.client.post(f"/fakenodo/depositions/{rec_id}/actions/publish")
+        response = self.client.post(f"/fakenodo/api/deposit/depositions/{rec_id}/actions/publish")
         if response.status_code != 202:
             print(f"Publish deposition failed: {response.status_code}")
 
@@ -58,13 +73,13 @@ class FakenodoBehavior(TaskSet):
     def get_deposition(self):
         """Get details of a specific deposition (if any exist)."""
         # First, try to get the list to find an existing ID
-        response = self.client.get("/fakenodo/depositions")
+        response = self.client.get("/fakenodo/api/deposit/depositions")
         if response.status_code == 200:
             depositions = response.json()
             if depositions:
                 # Get the first deposition
                 rec_id = depositions[0].get("id")
-                response = self.client.get(f"/fakenodo/depositions/{rec_id}")
+                response = self.client.get(f"/fakenodo/api/deposit/depositions/{rec_id}")
                 if response.status_code != 200:
                     print(f"Get deposition failed: {response.status_code}")
 
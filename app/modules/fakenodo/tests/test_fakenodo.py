@@ -1,10 +1,22 @@
 import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
 from flask import Flask
+
+from app.modules.fakenodo.faults import FaultInjector, InjectedFault, parse_latency
 from app.modules.fakenodo.routes import fakenodo_module
+from app.modules.fakenodo.services import FakenodoService
+from app.modules.fakenodo.store import SQLiteStore
 
 
-def _make_app():
+def _make_app(**config):
     app = Flask(__name__)
+    app.config.update({"FAKENODO_STORE": "memory", **config})
     app.register_blueprint(fakenodo_module)
     return app
 
@@ -77,3 +89,136 @@ def test_list_returns_created_records():
     arr = r.get_json()
     assert isinstance(arr, list)
     assert len(arr) >= 3
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    db_path = str(tmp_path / "fakenodo.sqlite3")
+    # Two apps on the same file behave like two gunicorn workers
+    worker_a = _make_app(FAKENODO_STORE="sqlite", FAKENODO_DB_PATH=db_path).test_client()
+    worker_b = _make_app(FAKENODO_STORE="sqlite", FAKENODO_DB_PATH=db_path).test_client()
+
+    dep_id = worker_a.post(BASE, json={"metadata": {"title": "Shared"}}).get_json()["id"]
+    r = worker_b.post(f"{BASE}/{dep_id}/files", data={"name": "a.csv"})
+    assert r.status_code == 201
+    assert worker_a.post(f"{BASE}/{dep_id}/actions/publish").get_json()["doi"] == f"10.5072/fakenodo.{dep_id}"
+
+    record = worker_b.get(f"{BASE}/{dep_id}").get_json()
+    assert record["published"] is True
+    assert [f["filename"] for f in record["files"]] == ["a.csv"]
+
+
+def test_sqlite_store_concurrent_writes(tmp_path):
+    store = SQLiteStore(str(tmp_path / "fakenodo.sqlite3"))
+    concept = store.create({"title": "Concept"})["id"]
+    store.publish(concept)
+    ids, versions = [], []
+
+    def work(i):
+        ids.append(store.create({"title": f"R{i}"})["id"])
+        store.add_file(concept, f"f{i}.csv", checksum=str(i), filesize=i)
+        versions.append(store.publish(concept)["id"])
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(ids)) == 8
+    # Each publish after a file change is one new version; none lost or duplicated
+    assert len(store.versions(concept)) == 1 + len([v for v in versions if v != concept])
+    assert len(store.list_files(concept)) == 8
+    # A new store on the same file (restart) sees everything
+    assert len(SQLiteStore(store.path).all()) == len(store.all())
+
+
+def test_fault_profiles_per_endpoint():
+    faults = {
+        "*": {"rate_limit": "3/m"},
+        "publish_deposition": {"error_rate": 1, "error_status": 502},
+        "get_deposition": {"latency": "fixed:100"},
+    }
+    client = _make_app(FAKENODO_FAULTS=json.dumps(faults)).test_client()
+
+    dep_id = client.post(BASE, json={"metadata": {}}).get_json()["id"]
+    assert client.post(f"{BASE}/{dep_id}/actions/publish").status_code == 502
+
+    start = time.monotonic()
+    assert client.get(f"{BASE}/{dep_id}").status_code == 200
+    assert time.monotonic() - start >= 0.1
+
+    # Fourth call within the minute
+    r = client.get(f"{BASE}/{dep_id}")
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+
+
+def test_fault_headers_only_when_enabled():
+    headers = {"X-Fakenodo-Error-Rate": "1"}
+    assert _make_app().test_client().get(BASE, headers=headers).status_code == 200
+    client = _make_app(FAKENODO_FAULT_HEADERS=True).test_client()
+    assert client.get(BASE, headers=headers).status_code == 503
+    assert client.get(BASE, headers={"X-Fakenodo-Latency": "gamma:1"}).status_code == 400
+
+
+def test_fakenodo_service_sees_the_same_faults():
+    app = _make_app(FAKENODO_FAULTS=json.dumps({"upload_file": {"error_rate": 1}}))
+    with app.app_context():
+        service = FakenodoService()
+        dataset = SimpleNamespace(id=1, ds_meta_data=SimpleNamespace(title="T", description="D"))
+        dep_id = service.create_new_deposition(dataset)["id"]
+        file = SimpleNamespace(name="a.csv", checksum="abc", size=3)
+        with pytest.raises(InjectedFault):
+            service.upload_file(dataset, dep_id, file)
+        report = service.upload_files(dataset, dep_id, files=[file])
+        assert list(report["failed"]) == ["a.csv"]
+
+
+def test_latency_distributions_are_seeded_and_bounded():
+    sampler, rng = parse_latency("lognormal:100:0.5"), random.Random(1)
+    samples = [sampler(rng) for _ in range(200)]
+    assert all(0 <= s <= 60 for s in samples)
+    assert 0.05 < sorted(samples)[100] < 0.2
+    a, b = FaultInjector({"x": {"error_rate": 0.5}}, seed=7), FaultInjector({"x": {"error_rate": 0.5}}, seed=7)
+
+    def outcomes(injector):
+        results = []
+        for _ in range(20):
+            try:
+                injector.apply("x")
+                results.append(True)
+            except InjectedFault:
+                results.append(False)
+        return results
+
+    assert outcomes(a) == outcomes(b)
+    with pytest.raises(ValueError):
+        parse_latency("normal:100")
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_listing_is_paginated_searchable_and_sorted(store, tmp_path):
+    client = _make_app(FAKENODO_STORE=store, FAKENODO_DB_PATH=str(tmp_path / "f.sqlite3")).test_client()
+    ids = [client.post(BASE, json={"metadata": {"title": f"Season {i}"}}).get_json()["id"] for i in range(25)]
+    for dep_id in ids[:5]:
+        client.post(f"{BASE}/{dep_id}/actions/publish")
+
+    r = client.get(BASE)
+    assert [d["id"] for d in r.get_json()] == ids[::-1][:10]
+    assert r.headers["X-Total-Count"] == "25"
+    assert 'page=2' in r.headers["Link"] and 'rel="next"' in r.headers["Link"]
+
+    r = client.get(BASE, query_string={"page": 3, "size": 10, "sort": "-mostrecent"})
+    assert [d["id"] for d in r.get_json()] == ids[20:]
+    assert 'rel="next"' not in r.headers["Link"]
+
+    r = client.get(BASE, query_string={"q": "season 1", "status": "draft", "size": 100})
+    # "Season 1" and "Season 10".."Season 19", minus the published "Season 1"
+    assert sorted(d["metadata"]["title"] for d in r.get_json()) == sorted(f"Season {i}" for i in range(10, 20))
+    r = client.get(BASE, query_string={"q": f"conceptrecid:{ids[3]}"})
+    assert [d["id"] for d in r.get_json()] == [ids[3]]
+    r = client.get(BASE, query_string={"q": f"doi:10.5072/fakenodo.{ids[4]}"})
+    assert [d["id"] for d in r.get_json()] == [ids[4]]
+
+    for bad in ({"page": 0}, {"size": 5000}, {"sort": "title"}, {"status": "x"}, {"q": "id:abc"}):
+        assert client.get(BASE, query_string=bad).status_code == 400
@@ -1,3 +1,6 @@
 from core.blueprints.base_blueprint import BaseBlueprint
 
 hubfile_bp = BaseBlueprint("hubfile", __name__, template_folder="templates")
+
+# Register the ORM listeners that maintain the file view/download counters
+from app.modules.hubfile import listeners  # noqa: E402,F401
@@ -0,0 +1,47 @@
+"""ORM listeners that keep the hub-wide file view/download ``DSCounter`` rows up to date.
+
+They mirror ``app.modules.dataset.listeners``: every flush that inserts or deletes a record, or
+deletes a file, adjusts the counters in the same transaction.
+"""
+
+from sqlalchemy import event, func, select
+
+from app.modules.dataset.models import CounterName
+from app.modules.dataset.repositories import DSCounterRepository
+from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+
+
+@event.listens_for(HubfileViewRecord, "after_insert")
+def count_view(mapper, connection, target):
+    DSCounterRepository.bump(connection, CounterName.HUBFILE_VIEWS)
+
+
+@event.listens_for(HubfileDownloadRecord, "after_insert")
+def count_download(mapper, connection, target):
+    DSCounterRepository.bump(connection, CounterName.HUBFILE_DOWNLOADS)
+
+
+@event.listens_for(HubfileViewRecord, "after_delete")
+def uncount_view(mapper, connection, target):
+    DSCounterRepository.bump(connection, CounterName.HUBFILE_VIEWS, amount=-1)
+
+
+@event.listens_for(HubfileDownloadRecord, "after_delete")
+def uncount_download(mapper, connection, target):
+    DSCounterRepository.bump(connection, CounterName.HUBFILE_DOWNLOADS, amount=-1)
+
+
+@event.listens_for(Hubfile, "before_delete")
+def uncount_file(mapper, connection, target):
+    # The records reference the file, so they go with it
+    for name, model in (
+        (CounterName.HUBFILE_VIEWS, HubfileViewRecord),
+        (CounterName.HUBFILE_DOWNLOADS, HubfileDownloadRecord),
+    ):
+        table = model.__table__
+        count = connection.execute(
+            select(func.count()).select_from(table).where(table.c.file_id == target.id)
+        ).scalar()
+        if count:
+            connection.execute(table.delete().where(table.c.file_id == target.id))
+            DSCounterRepository.bump(connection, name, amount=-count)
@@ -51,6 +51,9 @@ class Hubfile(db.Model):
 
 class HubfileViewRecord(db.Model):
     __tablename__ = "file_view_record"
+    # view_file dedupes views by (user, file, cookie)
+    __table_args__ = (db.Index("ix_file_view_record_user_file_cookie", "user_id", "file_id", "view_cookie"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     file_id = db.Column(db.Integer, db.ForeignKey("file.id"), nullable=False)
@@ -63,6 +66,11 @@ class HubfileViewRecord(db.Model):
 
 class HubfileDownloadRecord(db.Model):
     __tablename__ = "file_download_record"
+    # download_file dedupes downloads by (user, file, cookie)
+    __table_args__ = (
+        db.Index("ix_file_download_record_user_file_cookie", "user_id", "file_id", "download_cookie"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     file_id = db.Column(db.Integer, db.ForeignKey("file.id"))
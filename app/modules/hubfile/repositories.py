@@ -1,8 +1,9 @@
-from sqlalchemy import func
+from sqlalchemy import func, insert
 
 from app import db
 from app.modules.auth.models import User
-from app.modules.dataset.models import DataSet
+from app.modules.dataset.models import CounterName, DataSet
+from app.modules.dataset.repositories import DSCounterRepository
 from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
 from core.repositories.BaseRepository import BaseRepository
 
@@ -23,20 +24,50 @@ class HubfileRepository(BaseRepository):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return db.session.query(DataSet).join(Hubfile, Hubfile.dataset_id == DataSet.id).filter(Hubfile.id == hubfile.id).first()
 
+    def get_owner_id_by_dataset_id(self, dataset_id: int) -> int:
+        return db.session.query(DataSet.user_id).filter(DataSet.id == dataset_id).scalar()
+
+    def get_by_dataset_id(self, dataset_id: int) -> list[Hubfile]:
+        return self.model.query.filter_by(dataset_id=dataset_id).order_by(self.model.id).all()
+
+    def create_many(self, dataset_id: int, rows: list[dict]) -> list[int]:
+        """Insert the files of one dataset in a single statement. Returns their ids in insert order.
+
+        Nothing is committed; ids are read back by name because not every backend returns them
+        from a multi-row INSERT.
+        """
+        if not rows:
+            return []
+        rows = [dict(row, dataset_id=dataset_id) for row in rows]
+        self.session.execute(insert(self.model), rows)
+        names = [row["name"] for row in rows]
+        ids = dict(
+            self.session.query(self.model.name, self.model.id)
+            .filter(self.model.dataset_id == dataset_id, self.model.name.in_(names))
+            .all()
+        )
+        return [ids[name] for name in names]
+
 
 class HubfileViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(HubfileViewRecord)
+        self.counter_repository = DSCounterRepository()
 
     def total_hubfile_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.counter_repository.get_value(CounterName.HUBFILE_VIEWS)
+
+    def count_all(self) -> int:
+        return self.session.query(func.count(self.model.id)).scalar() or 0
 
 
 class HubfileDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(HubfileDownloadRecord)
+        self.counter_repository = DSCounterRepository()
 
     def total_hubfile_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+        return self.counter_repository.get_value(CounterName.HUBFILE_DOWNLOADS)
+
+    def count_all(self) -> int:
+        return self.session.query(func.count(self.model.id)).scalar() or 0
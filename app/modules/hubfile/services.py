@@ -1,4 +1,9 @@
-import os
+import csv
+import io
+import mimetypes
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
 
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
@@ -8,7 +13,10 @@ from app.modules.hubfile.repositories import (
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from core.managers.cache_manager import get_cache
+from core.managers.storage_manager import get_storage
 from core.services.BaseService import BaseService
+from core.storage import storage_key
 
 
 class HubfileService(BaseService):
@@ -16,6 +24,8 @@ class HubfileService(BaseService):
         super().__init__(HubfileRepository())
         self.hubfile_view_record_repository = HubfileViewRecordRepository()
         self.hubfile_download_record_repository = HubfileDownloadRecordRepository()
+        # dataset_id -> owner user_id; a dataset never changes owner, so this is safe to keep per instance
+        self._owner_ids = {}
 
     def get_owner_user_by_hubfile(self, hubfile: Hubfile) -> User:
         return self.repository.get_owner_user_by_hubfile(hubfile)
@@ -23,17 +33,62 @@ class HubfileService(BaseService):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return self.repository.get_dataset_by_hubfile(hubfile)
 
+    def get_owner_id_by_dataset_id(self, dataset_id: int) -> int:
+        if dataset_id not in self._owner_ids:
+            self._owner_ids[dataset_id] = self.repository.get_owner_id_by_dataset_id(dataset_id)
+        return self._owner_ids[dataset_id]
+
+    def get_storage_key_by_hubfile(self, hubfile: Hubfile) -> str:
+        """Storage key of the file, e.g. ``user_1/dataset_2/matches.csv``."""
+        return storage_key(self.get_owner_id_by_dataset_id(hubfile.dataset_id), hubfile.dataset_id, hubfile.name)
+
     def get_path_by_hubfile(self, hubfile: Hubfile) -> str:
+        return get_storage().get_local_path(self.get_storage_key_by_hubfile(hubfile))
+
+    def get_paths_by_dataset(self, dataset: DataSet) -> list[tuple[Hubfile, str]]:
+        """Resolve the absolute path of every file of a dataset with a single query for the files."""
+        self._owner_ids[dataset.id] = dataset.user_id
 
-        hubfile_user = self.get_owner_user_by_hubfile(hubfile)
-        hubfile_dataset = self.get_dataset_by_hubfile(hubfile)
-        working_dir = os.getenv("WORKING_DIR", os.getcwd())
+        hubfiles = self.repository.get_by_dataset_id(dataset.id)
+        return [(hubfile, self.get_path_by_hubfile(hubfile)) for hubfile in hubfiles]
 
-        path = os.path.join(
-            working_dir, "uploads", f"user_{hubfile_user.id}", f"dataset_{hubfile_dataset.id}", hubfile.name
+    def get_download_response(self, hubfile: Hubfile):
+        """Build the attachment response for a file, keyed by its checksum as strong ETag.
+
+        In "app" mode Werkzeug answers Range, If-Range and If-None-Match itself. In "x-accel" mode
+        If-None-Match is answered here and nginx streams the bytes (and ranges) from its internal location.
+        """
+        # nginx can only serve what sits in the local uploads folder it aliases
+        if current_app.config.get("FILE_SENDFILE_MODE") == "x-accel" and get_storage().name == "local":
+            return self._x_accel_response(hubfile)
+
+        return send_file(
+            self.get_path_by_hubfile(hubfile),
+            as_attachment=True,
+            download_name=hubfile.name,
+            etag=hubfile.checksum,
+            conditional=True,
+            max_age=0,
         )
 
-        return path
+    def _x_accel_response(self, hubfile: Hubfile):
+        response = current_app.response_class(status=200)
+        response.set_etag(hubfile.checksum)
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["Cache-Control"] = "no-cache"
+
+        if request.if_none_match.contains(hubfile.checksum):
+            response.status_code = 304
+            return response
+
+        # nginx serves the bytes. It drops this ETag on the redirect; the internal location re-emits
+        # it (add_header ETag $upstream_http_etag), so If-Range is checked against the checksum
+        prefix = current_app.config.get("X_ACCEL_REDIRECT_PREFIX", "/_protected").rstrip("/")
+        key = self.get_storage_key_by_hubfile(hubfile)
+        response.headers["X-Accel-Redirect"] = f"{prefix}/uploads/{quote(key)}"
+        response.headers["Content-Type"] = mimetypes.guess_type(hubfile.name)[0] or "application/octet-stream"
+        response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(hubfile.name)}"
+        return response
 
     def total_hubfile_views(self) -> int:
         return self.hubfile_view_record_repository.total_hubfile_views()
@@ -46,3 +101,147 @@ class HubfileService(BaseService):
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+
+class HubfileViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(HubfileViewRecordRepository())
+
+
+class HubfilePreviewService:
+    """Paged preview of CSV files for /file/view.
+
+    The first request for a file scans it once and stores its encoding, dialect, header row and a
+    sparse row-offset index (one byte offset every ``OFFSET_STRIDE`` data rows) in the fragment
+    cache, keyed by checksum. Later pages seek straight to the nearest indexed row.
+    """
+
+    SAMPLE_BYTES = 8192
+    OFFSET_STRIDE = 100
+    ENCODINGS = ["utf-8", "utf-8-sig", "utf-16", "latin-1", "cp1252"]
+    CACHE_KEY = "hubfile:preview:{checksum}:{size}"
+
+    def get_metadata(self, hubfile: Hubfile, file_path: str) -> dict:
+        cache = get_cache()
+        key = self.CACHE_KEY.format(checksum=hubfile.checksum, size=hubfile.size)
+        metadata = None
+        if cache is not None:
+            try:
+                metadata = cache.get(key)
+            except Exception:
+                metadata = None
+        if metadata is not None:
+            return metadata
+
+        metadata = self.build_metadata(file_path, getattr(hubfile, "name", ""))
+        if cache is not None:
+            try:
+                cache.set(key, metadata, timeout=current_app.config.get("FILE_PREVIEW_CACHE_TIMEOUT", 3600))
+            except Exception:
+                pass
+        return metadata
+
+    def build_metadata(self, file_path: str, filename: str = "") -> dict:
+        with open(file_path, "rb") as fb:
+            sample = fb.read(self.SAMPLE_BYTES)
+
+        # ZIP signature: a binary archive (e.g. XLSX), not a plain CSV
+        if sample.startswith(b"PK"):
+            return {"binary": True}
+
+        encoding = "latin-1"
+        for enc in self.ENCODINGS:
+            try:
+                sample.decode(enc)
+                encoding = enc
+                break
+            except Exception:
+                continue
+
+        sample_text = sample.decode(encoding, errors="replace")
+        metadata = {"binary": False, "encoding": encoding, "is_csv": False}
+        if not (filename.lower().endswith(".csv") or "," in sample_text or "\t" in sample_text):
+            return metadata
+
+        delimiter, quotechar = ",", '"'
+        try:
+            dialect = csv.Sniffer().sniff(sample_text, delimiters=",;\t|")
+            delimiter, quotechar = dialect.delimiter, dialect.quotechar or '"'
+        except Exception:
+            pass
+
+        metadata.update({"is_csv": True, "delimiter": delimiter, "quotechar": quotechar})
+        metadata.update(self._build_index(file_path, encoding, delimiter, quotechar))
+        return metadata
+
+    def _build_index(self, file_path, encoding, delimiter, quotechar) -> dict:
+        # Byte-level scanning splits on b"\n", which is only safe for ASCII-compatible encodings
+        if encoding.startswith("utf-16"):
+            with open(file_path, "r", encoding=encoding, errors="replace", newline="") as f:
+                reader = csv.reader(f, delimiter=delimiter, quotechar=quotechar)
+                headers = next(reader, None)
+                total_rows = sum(1 for _ in reader)
+            return {"headers": headers, "offsets": None, "total_rows": total_rows}
+
+        quote = quotechar.encode(encoding)
+        headers = None
+        offsets = []
+        total_rows = 0
+        with open(file_path, "rb") as fb:
+            position = 0
+            record_start = 0
+            quotes = 0
+            header_end = None
+            for line in iter(fb.readline, b""):
+                if quotes == 0:
+                    record_start = position
+                position += len(line)
+                quotes += line.count(quote)
+                # A record ends at a newline outside quotes; escaped quotes ("") keep the count even
+                if quotes % 2:
+                    continue
+                quotes = 0
+                if header_end is None:
+                    header_end = position
+                    continue
+                if total_rows % self.OFFSET_STRIDE == 0:
+                    offsets.append(record_start)
+                total_rows += 1
+
+            if header_end is not None:
+                fb.seek(0)
+                header_text = fb.read(header_end).decode(encoding, errors="replace")
+                headers = next(csv.reader(io.StringIO(header_text), delimiter=delimiter, quotechar=quotechar), None)
+
+        return {"headers": headers, "offsets": offsets, "total_rows": total_rows}
+
+    def get_page(self, file_path: str, metadata: dict, page: int = 1, per_page: int = 50) -> dict:
+        total_rows = metadata["total_rows"]
+        total_pages = max(1, -(-total_rows // per_page))
+        page = min(max(1, page), total_pages)
+        start = (page - 1) * per_page
+
+        with open(file_path, "rb") as fb:
+            offsets = metadata["offsets"]
+            if offsets:
+                fb.seek(offsets[start // self.OFFSET_STRIDE])
+                skip = start % self.OFFSET_STRIDE
+            else:
+                # No index (empty file or utf-16): skip the header and the preceding rows
+                skip = start + 1
+            text = io.TextIOWrapper(fb, encoding=metadata["encoding"], errors="replace", newline="")
+            reader = csv.reader(text, delimiter=metadata["delimiter"], quotechar=metadata["quotechar"])
+            for _ in range(skip):
+                if next(reader, None) is None:
+                    break
+            rows = [row for _, row in zip(range(per_page), reader)]
+
+        return {
+            "headers": metadata["headers"],
+            "rows": rows,
+            "encoding": metadata["encoding"],
+            "page": page,
+            "per_page": per_page,
+            "total_rows": total_rows,
+            "total_pages": total_pages,
+        }
@@ -0,0 +1,161 @@
+import os
+import shutil
+
+from core.storage import LocalStorage, S3Storage, storage_key
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_local_storage_stores_identical_content_once(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    first = storage.save(storage_key(1, 1, "a.csv"), _write(tmp_path / "in" / "a.csv", b"id\n1\n"))
+    second = storage.save(storage_key(2, 7, "b.csv"), _write(tmp_path / "in" / "b.csv", b"id\n1\n"))
+
+    assert first.digest == second.digest and first.size == 5
+    path_a, path_b = storage.get_local_path(first.key), storage.get_local_path(second.key)
+    assert os.path.samefile(path_a, path_b)
+    assert not (tmp_path / "in" / "a.csv").exists()
+    assert storage.keys() == ["user_1/dataset_1/a.csv", "user_2/dataset_7/b.csv"]
+
+    storage.delete(first.key)
+    with storage.open(second.key) as f:
+        assert f.read() == b"id\n1\n"
+
+    storage.delete(second.key)
+    assert not os.path.exists(storage._blob_path(first.digest))
+
+
+def test_local_storage_save_survives_a_concurrent_delete_of_the_blob(tmp_path):
+    class RacingStorage(LocalStorage):
+        """Deletes the blob's last other key right before the new key is linked."""
+
+        race = None
+
+        def _link(self, blob, dest):
+            if self.race:
+                self.delete(self.race)
+                self.race = None
+            super()._link(blob, dest)
+
+    storage = RacingStorage(str(tmp_path / "uploads"))
+    first = storage.save(storage_key(1, 1, "a.csv"), _write(tmp_path / "in" / "a.csv", b"id\n1\n"))
+    storage.race = first.key
+    second = storage.save(storage_key(1, 2, "b.csv"), _write(tmp_path / "in" / "b.csv", b"id\n1\n"))
+
+    assert not storage.exists(first.key)
+    with storage.open(second.key) as f:
+        assert f.read() == b"id\n1\n"
+    assert os.path.samefile(storage.get_local_path(second.key), storage._blob_path(second.digest))
+    assert not (tmp_path / "in" / "b.csv").exists()
+
+
+def test_local_storage_dedupes_files_written_before_the_blob_store(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    for dataset_id in (1, 2, 3):
+        _write(tmp_path / "uploads" / "user_1" / f"dataset_{dataset_id}" / "same.csv", b"x" * 1000)
+
+    assert storage.dedupe() == 2000
+    paths = [storage.get_local_path(storage_key(1, dataset_id, "same.csv")) for dataset_id in (1, 2, 3)]
+    assert os.stat(paths[0]).st_nlink == 4  # three keys plus the blob
+    assert storage.dedupe() == 0
+
+
+class LocalS3StandIn:
+    """In-memory stand-in for the subset of the boto3 S3 client used by S3Storage."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(Key)
+        return {"Metadata": self.objects[(Bucket, Key)][1]}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, "rb") as f:
+            self.objects[(Bucket, Key)] = (f.read(), (ExtraArgs or {}).get("Metadata", {}))
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, "wb") as f:
+            f.write(self.objects[(Bucket, Key)][0])
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        return {"Contents": [{"Key": key} for key in keys], "IsTruncated": False}
+
+
+def test_s3_storage_round_trip_through_a_fresh_cache(tmp_path):
+    client = LocalS3StandIn()
+    writer = S3Storage("hub", prefix="padel", client=client, cache_dir=str(tmp_path / "writer"))
+    stored = writer.save(storage_key(1, 2, "m.csv"), _write(tmp_path / "in" / "m.csv", b"a,b\n1,2\n"))
+
+    assert ("hub", "padel/user_1/dataset_2/m.csv") in client.objects
+    assert client.objects[("hub", "padel/user_1/dataset_2/m.csv")][1]["md5"] == stored.checksum
+
+    # Another web node, with nothing cached locally yet
+    reader = S3Storage("hub", prefix="padel", client=client, cache_dir=str(tmp_path / "reader"))
+    assert reader.exists(stored.key)
+    with reader.open(stored.key) as f:
+        assert f.read() == b"a,b\n1,2\n"
+    assert reader.keys("user_1/") == [stored.key]
+
+    reader.delete(stored.key)
+    assert not writer.exists(stored.key)
+    shutil.rmtree(tmp_path / "reader")
+    assert not os.path.exists(reader.get_local_path(stored.key))
+
+
+def test_s3_storage_never_serves_a_key_saved_again_from_another_node(tmp_path):
+    client = LocalS3StandIn()
+    node_a = S3Storage("hub", client=client, cache_dir=str(tmp_path / "a"))
+    node_b = S3Storage("hub", client=client, cache_dir=str(tmp_path / "b"))
+    key = storage_key(1, 2, "m.csv")
+
+    node_a.save(key, _write(tmp_path / "in" / "v1.csv", b"v1\n"))
+    with node_b.open(key) as f:
+        assert f.read() == b"v1\n"
+
+    node_a.save(key, _write(tmp_path / "in" / "v2.csv", b"v2\n"))
+    with node_b.open(key) as f:
+        assert f.read() == b"v2\n"
+
+
+def test_s3_storage_evicts_least_recently_used_copies(tmp_path):
+    client = LocalS3StandIn()
+    writer = S3Storage("hub", client=client, cache_dir=str(tmp_path / "writer"))
+    keys = [storage_key(1, 1, f"{name}.csv") for name in "abc"]
+    for key, fill in zip(keys, b"abc"):
+        writer.save(key, _write(tmp_path / "in" / key, bytes([fill]) * 100))
+
+    reader = S3Storage("hub", client=client, cache_dir=str(tmp_path / "reader"), cache_max_bytes=250)
+    first = reader.get_local_path(keys[0])
+    os.utime(first, (1, 1))
+    second = reader.get_local_path(keys[1])
+    third = reader.get_local_path(keys[2])
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    with reader.open(keys[0]) as f:
+        assert f.read() == b"a" * 100
+
+
+def test_local_storage_delete_finds_the_blob_without_reading_the_file(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    stored = storage.save(storage_key(1, 1, "a.csv"), _write(tmp_path / "in" / "a.csv", b"id\n1\n"))
+
+    def fail(path):
+        raise AssertionError("file hashed again")
+
+    monkeypatch.setattr("core.storage.local.hash_file", fail)
+    storage.delete(stored.key)
+
+    assert not os.path.exists(storage._blob_path(stored.digest))
+    assert not os.listdir(os.path.join(storage.root, LocalStorage.BLOBS_DIR, LocalStorage.INODES_DIR))
+    assert storage.collect_garbage() == 0
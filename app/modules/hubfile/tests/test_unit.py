@@ -1,3 +1,7 @@
+import glob
+import os
+import re
+
 import pytest
 
 
@@ -22,3 +26,164 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+@pytest.fixture
+def stored_hubfile(test_client, tmp_path, monkeypatch):
+    """A 1000-byte CSV stored under a temporary uploads folder."""
+    from app import db
+    from app.modules.auth.models import User
+    from app.modules.dataset.models import DataSet, DSMetaData, TournamentType
+    from app.modules.dataset.services import calculate_checksum_and_size
+    from app.modules.hubfile.models import Hubfile
+
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path / "uploads"))
+    with test_client.application.app_context():
+        user = User.query.filter_by(email="download_user@example.com").first()
+        if user is None:
+            user = User(email="download_user@example.com", password="test1234")
+            db.session.add(user)
+            db.session.commit()
+        metadata = DSMetaData(title="Download", description="Download", tournament_type=TournamentType.OPEN)
+        db.session.add(metadata)
+        db.session.commit()
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+        directory = tmp_path / "uploads" / f"user_{user.id}" / f"dataset_{dataset.id}"
+        directory.mkdir(parents=True)
+        path = directory / "matches.csv"
+        path.write_bytes(b"".join(f"{i:09d}\n".encode() for i in range(100)))
+        checksum, size = calculate_checksum_and_size(str(path))
+
+        hubfile = Hubfile(name="matches.csv", checksum=checksum, size=size, dataset_id=dataset.id)
+        db.session.add(hubfile)
+        db.session.commit()
+        file_id = hubfile.id
+
+    return file_id, checksum, path.read_bytes()
+
+
+def test_download_supports_ranges_keyed_by_checksum(test_client, stored_hubfile):
+    file_id, checksum, content = stored_hubfile
+    url = f"/file/download/{file_id}"
+
+    full = test_client.get(url)
+    assert full.status_code == 200
+    assert full.data == content
+    assert full.headers["ETag"] == f'"{checksum}"'
+    assert full.headers["Accept-Ranges"] == "bytes"
+
+    partial = test_client.get(url, headers={"Range": "bytes=10-19", "If-Range": f'"{checksum}"'})
+    assert partial.status_code == 206
+    assert partial.data == content[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(content)}"
+
+    stale = test_client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"outdated"'})
+    assert stale.status_code == 200
+    assert stale.data == content
+
+    assert test_client.get(url, headers={"If-None-Match": f'"{checksum}"'}).status_code == 304
+
+
+def test_download_offloads_to_nginx_in_x_accel_mode(test_client, stored_hubfile, monkeypatch):
+    file_id, checksum, _ = stored_hubfile
+    monkeypatch.setitem(test_client.application.config, "FILE_SENDFILE_MODE", "x-accel")
+
+    response = test_client.get(f"/file/download/{file_id}", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 200
+    assert response.data == b""
+    assert response.headers["X-Accel-Redirect"].startswith("/_protected/uploads/user_")
+    assert response.headers["X-Accel-Redirect"].endswith("/matches.csv")
+    # nginx drops this header on the redirect; its internal location sends it back (next test)
+    assert response.headers["ETag"] == f'"{checksum}"'
+    assert "matches.csv" in response.headers["Content-Disposition"]
+
+    not_modified = test_client.get(f"/file/download/{file_id}", headers={"If-None-Match": f'"{checksum}"'})
+    assert not_modified.status_code == 304
+    assert "X-Accel-Redirect" not in not_modified.headers
+
+
+def test_nginx_internal_locations_re_emit_the_app_etag():
+    # nginx keeps only a few app headers on X-Accel-Redirect; without the ETag, If-Range never matches
+    nginx_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "docker", "nginx")
+    configs = sorted(glob.glob(os.path.join(nginx_dir, "nginx.*conf*")))
+    assert configs
+    for path in configs:
+        with open(path, encoding="utf-8") as f:
+            location = re.search(r"location /_protected/uploads/ \{(.*?)\}", f.read(), re.S)
+        assert location, path
+        assert "add_header ETag $upstream_http_etag always;" in location.group(1), path
+        assert "etag off;" in location.group(1), path
+
+
+def test_view_file_pages_through_csv_rows(test_client, stored_hubfile):
+    file_id, _, content = stored_hubfile
+    lines = content.decode().splitlines()
+
+    response = test_client.get(f"/file/view/{file_id}?page=2&per_page=10")
+    data = response.get_json()
+    assert data["type"] == "csv"
+    assert data["headers"] == [lines[0]]
+    assert data["rows"] == [[line] for line in lines[11:21]]
+    assert (data["page"], data["total_rows"], data["total_pages"]) == (2, 99, 10)
+
+
+def test_preview_index_seeks_across_strides_and_quoted_newlines(tmp_path):
+    from app.modules.hubfile.services import HubfilePreviewService
+
+    path = tmp_path / "quoted.csv"
+    rows = [[str(i), f"note {i}\nsecond line" if i % 7 == 0 else f"note {i}"] for i in range(250)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        import csv
+
+        writer = csv.writer(f)
+        writer.writerow(["id", "note"])
+        writer.writerows(rows)
+
+    service = HubfilePreviewService()
+    metadata = service.build_metadata(str(path), "quoted.csv")
+    assert metadata["headers"] == ["id", "note"]
+    assert metadata["total_rows"] == 250
+    assert len(metadata["offsets"]) == 3
+
+    page = service.get_page(str(path), metadata, page=5, per_page=30)
+    assert page["rows"] == rows[120:150]
+    assert service.get_page(str(path), metadata, page=99, per_page=30)["rows"] == rows[240:]
+
+
+def test_path_resolution_does_not_query_per_file(test_client, stored_hubfile):
+    from sqlalchemy import event
+
+    from app import db
+    from app.modules.dataset.models import DataSet
+    from app.modules.hubfile.models import Hubfile
+    from app.modules.hubfile.services import HubfileService
+
+    file_id = stored_hubfile[0]
+    with test_client.application.app_context():
+        hubfile = db.session.get(Hubfile, file_id)
+        dataset = db.session.get(DataSet, hubfile.dataset_id)
+        for i in range(3):
+            db.session.add(Hubfile(name=f"extra_{i}.csv", checksum="x", size=1, dataset_id=dataset.id))
+        db.session.commit()
+        # Reload after the commit expired them, as a request would have them loaded
+        db.session.refresh(dataset)
+        db.session.refresh(hubfile)
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            service = HubfileService()
+            paths = service.get_paths_by_dataset(dataset)
+            single = service.get_path_by_hubfile(hubfile)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(paths) == 4
+        assert paths[0][1] == single
+        assert single.endswith(f"user_{dataset.user_id}/dataset_{dataset.id}/matches.csv")
+        # One query for the files; the owner comes from the loaded dataset and the memo
+        assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
@@ -0,0 +1,6 @@
+from core.blueprints.base_blueprint import BaseBlueprint
+
+players_bp = BaseBlueprint("players", __name__)
+
+# Keep the player index in step with published datasets
+from app.modules.players import listeners  # noqa: E402,F401
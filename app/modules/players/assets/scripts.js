@@ -0,0 +1 @@
+console.log("Hi, I am a script loaded from players module");
@@ -0,0 +1,17 @@
+"""Signal receivers that feed newly published match files into the player index."""
+
+from app.modules.dataset.signals import dataset_files_attached, dataset_published
+from app.modules.players.services import PlayerIndexService
+
+
+@dataset_published.connect
+def index_published_dataset(sender, dataset_id=None, **kwargs):
+    if dataset_id:
+        PlayerIndexService().schedule_ingest(dataset_id)
+
+
+@dataset_files_attached.connect
+def index_attached_files(sender, dataset_id=None, **kwargs):
+    # Drafts are indexed once they are published
+    if dataset_id:
+        PlayerIndexService().schedule_ingest(dataset_id)
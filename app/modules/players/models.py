@@ -0,0 +1,102 @@
+from app import db
+
+INITIAL_RATING = 1500.0
+
+
+class Player(db.Model):
+    """A player seen in any indexed match, with running totals and Elo rating."""
+
+    __tablename__ = "player"
+    __table_args__ = (db.Index("ix_player_rating", "rating"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False, unique=True)
+    matches = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    rating = db.Column(db.Float, nullable=False, default=INITIAL_RATING)
+
+    @property
+    def win_rate(self):
+        return self.wins / self.matches if self.matches else None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "matches": self.matches,
+            "wins": self.wins,
+            "win_rate": self.win_rate,
+            "rating": round(self.rating, 1),
+        }
+
+    def __repr__(self):
+        return f"<Player {self.id} {self.name}>"
+
+
+class PlayerPair(db.Model):
+    """Two players who played together; ``player1_id`` is always the lower id."""
+
+    __tablename__ = "player_pair"
+    __table_args__ = (
+        db.UniqueConstraint("player1_id", "player2_id", name="uq_player_pair_players"),
+        db.Index("ix_player_pair_player2", "player2_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    player1_id = db.Column(db.Integer, db.ForeignKey("player.id"), nullable=False)
+    player2_id = db.Column(db.Integer, db.ForeignKey("player.id"), nullable=False)
+    matches = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+
+    player1 = db.relationship("Player", foreign_keys=[player1_id])
+    player2 = db.relationship("Player", foreign_keys=[player2_id])
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "players": [self.player1.to_dict(), self.player2.to_dict()],
+            "matches": self.matches,
+            "wins": self.wins,
+            "win_rate": self.wins / self.matches if self.matches else None,
+        }
+
+
+class PadelMatch(db.Model):
+    """One match row of an ingested CSV (the fact table of the player index)."""
+
+    __tablename__ = "padel_match"
+    __table_args__ = (
+        db.Index("ix_padel_match_pairs", "pair1_id", "pair2_id"),
+        db.Index("ix_padel_match_pair2", "pair2_id"),
+        # One match per CSV row, so a file indexed twice fails instead of counting twice
+        db.UniqueConstraint("hubfile_id", "row_number", name="uq_padel_match_hubfile_row"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    hubfile_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), nullable=False)
+    # Data row of the CSV file, starting at 1
+    row_number = db.Column(db.Integer, nullable=False)
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=False, index=True)
+    tournament = db.Column(db.String(255), nullable=True)
+    category = db.Column(db.String(32), nullable=True)
+    phase = db.Column(db.String(64), nullable=True)
+    played_on = db.Column(db.Date, nullable=True)
+    pair1_id = db.Column(db.Integer, db.ForeignKey("player_pair.id"), nullable=False)
+    pair2_id = db.Column(db.Integer, db.ForeignKey("player_pair.id"), nullable=False)
+    # NULL when the row names no winner that matches either pair
+    winner_pair_id = db.Column(db.Integer, db.ForeignKey("player_pair.id"), nullable=True)
+    result = db.Column(db.String(64), nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "dataset_id": self.dataset_id,
+            "tournament": self.tournament,
+            "category": self.category,
+            "phase": self.phase,
+            "played_on": self.played_on.isoformat() if self.played_on else None,
+            "pair1_id": self.pair1_id,
+            "pair2_id": self.pair2_id,
+            "winner_pair_id": self.winner_pair_id,
+            "result": self.result,
+        }
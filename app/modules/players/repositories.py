@@ -0,0 +1,108 @@
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, desc, or_
+
+from app.modules.players.models import PadelMatch, Player, PlayerPair
+from core.repositories.BaseRepository import BaseRepository
+
+
+class PlayerRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Player)
+
+    def get_or_create_many(self, names: Iterable[str]) -> Dict[str, Player]:
+        """Players by name, inserting the missing ones (one SELECT plus one flush).
+
+        The existing rows are locked until commit, in name order, so concurrent ingestions
+        update the totals of a shared player one after the other.
+        """
+        names = set(names)
+        existing = self.model.query.filter(self.model.name.in_(names)).order_by(self.model.name).with_for_update()
+        players = {player.name: player for player in existing}
+        for name in names - set(players):
+            players[name] = Player(name=name)
+            self.session.add(players[name])
+        self.session.flush()
+        return players
+
+    def ranking(self, limit: int, min_matches: int = 1) -> List[Player]:
+        return (
+            self.model.query.filter(self.model.matches >= min_matches)
+            .order_by(desc(self.model.rating), self.model.id)
+            .limit(limit)
+            .all()
+        )
+
+    def search(self, query: str, limit: int) -> List[Player]:
+        """Players whose name contains ``query``, case-insensitively (a scan: no index applies)."""
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return (
+            self.model.query.filter(self.model.name.ilike(f"%{pattern}%", escape="\\"))
+            .order_by(desc(self.model.matches), self.model.name)
+            .limit(limit)
+            .all()
+        )
+
+
+class PlayerPairRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(PlayerPair)
+
+    def get_or_create_many(self, keys: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], PlayerPair]:
+        """Pairs by (lower player id, higher player id), inserting the missing ones."""
+        keys = set(keys)
+        if not keys:
+            return {}
+        player_ids = {player_id for key in keys for player_id in key}
+        existing = (
+            self.model.query.filter(self.model.player1_id.in_(player_ids), self.model.player2_id.in_(player_ids))
+            .order_by(self.model.id)
+            .with_for_update()
+        )
+        pairs = {(pair.player1_id, pair.player2_id): pair for pair in existing}
+        for key in keys - set(pairs):
+            pairs[key] = PlayerPair(player1_id=key[0], player2_id=key[1], matches=0, wins=0)
+            self.session.add(pairs[key])
+        self.session.flush()
+        return {key: pairs[key] for key in keys}
+
+    def ids_with_player(self, player_id: int) -> List[int]:
+        rows = self.session.query(self.model.id).filter(
+            or_(self.model.player1_id == player_id, self.model.player2_id == player_id)
+        )
+        return [row.id for row in rows]
+
+    def partners(self, player_id: int, limit: int) -> List[PlayerPair]:
+        return (
+            self.model.query.filter(or_(self.model.player1_id == player_id, self.model.player2_id == player_id))
+            .order_by(desc(self.model.matches))
+            .limit(limit)
+            .all()
+        )
+
+
+class PadelMatchRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(PadelMatch)
+
+    def indexed_hubfile_ids(self, dataset_id: int) -> set:
+        rows = self.session.query(self.model.hubfile_id).filter(self.model.dataset_id == dataset_id).distinct()
+        return {row.hubfile_id for row in rows}
+
+    def between(self, pairs_a: List[int], pairs_b: List[int]) -> List[PadelMatch]:
+        """Matches where a pair from ``pairs_a`` faced a pair from ``pairs_b``, newest first."""
+        if not pairs_a or not pairs_b:
+            return []
+        return (
+            self.model.query.filter(
+                or_(
+                    and_(self.model.pair1_id.in_(pairs_a), self.model.pair2_id.in_(pairs_b)),
+                    and_(self.model.pair1_id.in_(pairs_b), self.model.pair2_id.in_(pairs_a)),
+                )
+            )
+            .order_by(desc(self.model.played_on), desc(self.model.id))
+            .all()
+        )
+
+    def chronological(self):
+        return self.model.query.order_by(self.model.played_on, self.model.id).yield_per(5000)
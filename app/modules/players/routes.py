@@ -0,0 +1,39 @@
+from flask import jsonify, request
+
+from app.modules.players import players_bp
+from app.modules.players.services import PlayerIndexService
+
+
+@players_bp.route("/players/api/ranking", methods=["GET"])
+def ranking():
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    min_matches = max(request.args.get("min_matches", 1, type=int), 0)
+    return jsonify({"players": PlayerIndexService().ranking(limit=limit, min_matches=min_matches)})
+
+
+@players_bp.route("/players/api/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "").strip()
+    if len(query) < 2:
+        return jsonify({"message": "Query must have at least 2 characters"}), 400
+    return jsonify({"players": PlayerIndexService().search(query)})
+
+
+@players_bp.route("/players/api/<int:player_id>", methods=["GET"])
+def player_stats(player_id):
+    stats = PlayerIndexService().player_stats(player_id)
+    if stats is None:
+        return jsonify({"message": "Player not found"}), 404
+    return jsonify(stats)
+
+
+@players_bp.route("/players/api/head-to-head", methods=["GET"])
+def head_to_head():
+    player_a = request.args.get("a", type=int)
+    player_b = request.args.get("b", type=int)
+    if not player_a or not player_b or player_a == player_b:
+        return jsonify({"message": "Provide two different player ids as 'a' and 'b'"}), 400
+    record = PlayerIndexService().head_to_head(player_a, player_b)
+    if record is None:
+        return jsonify({"message": "Player not found"}), 404
+    return jsonify(record)
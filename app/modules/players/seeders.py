@@ -0,0 +1,14 @@
+from app.modules.dataset.models import DataSet
+from app.modules.players.services import PlayerIndexService
+from core.seeders.BaseSeeder import BaseSeeder
+
+
+class PlayersSeeder(BaseSeeder):
+
+    priority = 3  # After the datasets and their files
+
+    def run(self):
+        # Seeded datasets are published, so their matches belong in the player index
+        service = PlayerIndexService()
+        for dataset in DataSet.query.all():
+            service.ingest_dataset(dataset.id)
@@ -0,0 +1,250 @@
+"""
+Player index: players, pairs and match facts extracted from published padel CSVs.
+
+Files are ingested once, when their dataset is published (or when files are attached to an
+already published dataset); each CSV row becomes at most one match. Win/loss totals and
+Elo ratings are updated as matches are added, in the order they were played, so rankings,
+player stats and head-to-head records are indexed lookups. Name search matches anywhere in
+the name and scans the player table (one row per distinct player).
+"""
+import csv
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.modules.dataset.models import DataSet
+from app.modules.players.models import INITIAL_RATING, PadelMatch
+from app.modules.players.repositories import PadelMatchRepository, PlayerPairRepository, PlayerRepository
+from core.managers.task_manager import submit_task
+from core.services.BaseService import BaseService
+
+logger = logging.getLogger(__name__)
+
+ELO_K = 32
+MAX_INGEST_ATTEMPTS = 5
+PAIR_FIELDS = (("pareja1_jugador1", "pareja1_jugador2"), ("pareja2_jugador1", "pareja2_jugador2"))
+SET_FIELDS = (("set1_pareja1", "set1_pareja2"), ("set2_pareja1", "set2_pareja2"), ("set3_pareja1", "set3_pareja2"))
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+class PlayerIndexService(BaseService):
+    def __init__(self):
+        super().__init__(PlayerRepository())
+        self.pair_repository = PlayerPairRepository()
+        self.match_repository = PadelMatchRepository()
+
+    # Ingestion
+
+    def ingest_dataset(self, dataset_id: int) -> int:
+        """Index the CSV files of a published dataset that are not indexed yet. Returns the new matches."""
+        for attempt in range(1, MAX_INGEST_ATTEMPTS + 1):
+            try:
+                added = self._ingest(dataset_id)
+                db.session.commit()
+                return added
+            except IntegrityError:
+                # Another ingestion inserted some of the same players, pairs or rows first; a new
+                # attempt sees them, and skips the files it finished
+                db.session.rollback()
+                logger.info(f"Player index conflict for dataset {dataset_id} (attempt {attempt})")
+        logger.warning(f"Gave up indexing the players of dataset {dataset_id} after {MAX_INGEST_ATTEMPTS} conflicts")
+        return 0
+
+    def _ingest(self, dataset_id: int) -> int:
+        from app.modules.hubfile.services import HubfileService
+
+        # Claim the dataset first: a concurrent ingestion of it waits here, then finds its files indexed
+        if db.session.query(DataSet.id).filter(DataSet.id == dataset_id).with_for_update().scalar() is None:
+            return 0
+        dataset = DataSet.query.get(dataset_id)
+        if not dataset.ds_meta_data.dataset_doi:
+            return 0
+
+        indexed = self.match_repository.indexed_hubfile_ids(dataset_id)
+        rows = []
+        for hubfile, path in HubfileService().get_paths_by_dataset(dataset):
+            if hubfile.id in indexed or not hubfile.name.lower().endswith(".csv"):
+                continue
+            rows.extend((hubfile, row_number, row) for row_number, row in self._read_rows(path))
+        if not rows:
+            return 0
+        return self._add_matches(rows)
+
+    def schedule_ingest(self, dataset_id: int):
+        return submit_task(PlayerIndexService().ingest_dataset, dataset_id)
+
+    @staticmethod
+    def _read_rows(path: str):
+        from app.modules.dataset.services_padel import PadelMetricsService
+
+        encoding = PadelMetricsService._detect_encoding(path)
+        if encoding is None:
+            logger.warning(f"Could not decode CSV file for the player index: {path}")
+            return
+        with open(path, "r", encoding=encoding, newline="") as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                players = [(row.get(a) or "").strip() for pair in PAIR_FIELDS for a in pair]
+                if all(players):
+                    yield row_number, row
+
+    def _add_matches(self, rows) -> int:
+        names = {(row.get(field) or "").strip() for _, _, row in rows for pair in PAIR_FIELDS for field in pair}
+        players = self.repository.get_or_create_many(names)
+
+        matches = []
+        pair_keys = set()
+        for hubfile, row_number, row in rows:
+            sides = []
+            for fields in PAIR_FIELDS:
+                ids = sorted(players[row[field].strip()].id for field in fields)
+                sides.append(tuple(ids))
+            pair_keys.update(sides)
+            matches.append((hubfile, row_number, row, sides))
+        pairs = self.pair_repository.get_or_create_many(pair_keys)
+
+        new_matches = []
+        for hubfile, row_number, row, (side1, side2) in matches:
+            pair1, pair2 = pairs[side1], pairs[side2]
+            winner = self._winner(row)
+            match = PadelMatch(
+                hubfile_id=hubfile.id,
+                row_number=row_number,
+                dataset_id=hubfile.dataset_id,
+                tournament=(row.get("nombre_torneo") or None),
+                category=(row.get("categoria") or None),
+                phase=(row.get("fase") or None),
+                played_on=self._parse_date(row.get("fecha_inicio_torneo")),
+                pair1_id=pair1.id,
+                pair2_id=pair2.id,
+                winner_pair_id={1: pair1.id, 2: pair2.id}.get(winner),
+                result=(row.get("resultado_string") or None),
+            )
+            new_matches.append(match)
+        db.session.add_all(new_matches)
+
+        players_by_id = {player.id: player for player in players.values()}
+        pairs_by_id = {pair.id: pair for pair in pairs.values()}
+        for match in sorted(new_matches, key=lambda m: (m.played_on is not None, m.played_on)):
+            self._apply(match, pairs_by_id, players_by_id)
+        db.session.flush()
+        return len(new_matches)
+
+    @staticmethod
+    def _winner(row: Dict[str, str]) -> Optional[int]:
+        """1 or 2 for the winning pair, from ``pareja_ganadora`` or else from the set scores."""
+        declared = (row.get("pareja_ganadora") or "").strip()
+        for side, fields in enumerate(PAIR_FIELDS, start=1):
+            names = [row[field].strip() for field in fields]
+            if declared and declared in ("_".join(names), "_".join(reversed(names))):
+                return side
+
+        sets = [0, 0]
+        for first, second in SET_FIELDS:
+            try:
+                games = int(row.get(first) or ""), int(row.get(second) or "")
+            except ValueError:
+                continue
+            if games[0] != games[1]:
+                sets[games[1] > games[0]] += 1
+        if sets[0] != sets[1]:
+            return 1 if sets[0] > sets[1] else 2
+        return None
+
+    @staticmethod
+    def _parse_date(value: Optional[str]):
+        try:
+            return datetime.strptime((value or "").strip(), "%d.%m.%Y").date()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _apply(match: PadelMatch, pairs_by_id, players_by_id):
+        """Add one match to the pair/player totals and move the players' Elo ratings."""
+        sides = [pairs_by_id[match.pair1_id], pairs_by_id[match.pair2_id]]
+        members = [[players_by_id[pair.player1_id], players_by_id[pair.player2_id]] for pair in sides]
+
+        for pair, team in zip(sides, members):
+            pair.matches = (pair.matches or 0) + 1
+            for player in team:
+                player.matches = (player.matches or 0) + 1
+        if match.winner_pair_id is None:
+            return
+
+        winner = 0 if match.winner_pair_id == match.pair1_id else 1
+        sides[winner].wins = (sides[winner].wins or 0) + 1
+        for player in members[winner]:
+            player.wins = (player.wins or 0) + 1
+
+        # Team strength is the mean of its players; both players move by the team's change
+        team_ratings = [sum(p.rating or INITIAL_RATING for p in team) / 2 for team in members]
+        change = ELO_K * (1 - expected_score(team_ratings[winner], team_ratings[1 - winner]))
+        for player in members[winner]:
+            player.rating = (player.rating or INITIAL_RATING) + change
+        for player in members[1 - winner]:
+            player.rating = (player.rating or INITIAL_RATING) - change
+
+    def rebuild_ratings(self):
+        """Replay every indexed match in date order (after late, out-of-order imports)."""
+        players_by_id = {player.id: player for player in self.repository.model.query}
+        pairs_by_id = {pair.id: pair for pair in self.pair_repository.model.query}
+        for player in players_by_id.values():
+            player.matches, player.wins, player.rating = 0, 0, INITIAL_RATING
+        for pair in pairs_by_id.values():
+            pair.matches, pair.wins = 0, 0
+        for match in self.match_repository.chronological():
+            self._apply(match, pairs_by_id, players_by_id)
+        db.session.commit()
+
+    # Queries
+
+    def ranking(self, limit: int = 50, min_matches: int = 1) -> List[Dict[str, Any]]:
+        return [player.to_dict() for player in self.repository.ranking(limit, min_matches)]
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return [player.to_dict() for player in self.repository.search(query, limit)]
+
+    def player_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
+        player = self.repository.get_by_id(player_id)
+        if player is None:
+            return None
+        stats = player.to_dict()
+        stats["partners"] = []
+        for pair in self.pair_repository.partners(player_id, limit=5):
+            partner = pair.player2 if pair.player1_id == player_id else pair.player1
+            stats["partners"].append({
+                "player": {"id": partner.id, "name": partner.name},
+                "matches": pair.matches,
+                "wins": pair.wins,
+                "win_rate": pair.wins / pair.matches if pair.matches else None,
+            })
+        return stats
+
+    def head_to_head(self, player_a_id: int, player_b_id: int, recent: int = 10) -> Optional[Dict[str, Any]]:
+        player_a = self.repository.get_by_id(player_a_id)
+        player_b = self.repository.get_by_id(player_b_id)
+        if player_a is None or player_b is None:
+            return None
+
+        pairs_a = set(self.pair_repository.ids_with_player(player_a_id))
+        pairs_b = set(self.pair_repository.ids_with_player(player_b_id))
+        # Matches they played together are not head-to-head
+        shared = pairs_a & pairs_b
+        matches = self.match_repository.between(list(pairs_a - shared), list(pairs_b - shared))
+
+        wins_a = sum(1 for match in matches if match.winner_pair_id in pairs_a)
+        wins_b = sum(1 for match in matches if match.winner_pair_id in pairs_b)
+        return {
+            "player_a": player_a.to_dict(),
+            "player_b": player_b.to_dict(),
+            "matches": len(matches),
+            "wins_a": wins_a,
+            "wins_b": wins_b,
+            "expected_a": expected_score(player_a.rating, player_b.rating),
+            "recent": [match.to_dict() for match in matches[:recent]],
+        }
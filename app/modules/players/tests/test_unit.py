@@ -0,0 +1,166 @@
+import pytest
+
+from core.storage import LocalStorage
+
+HEADER = (
+    "nombre_torneo,anio_torneo,fecha_inicio_torneo,fecha_final_torneo,pista_principal,categoria,fase,ronda,"
+    "pareja1_jugador1,pareja1_jugador2,pareja2_jugador1,pareja2_jugador2,set1_pareja1,set1_pareja2,"
+    "set2_pareja1,set2_pareja2,set3_pareja1,set3_pareja2,pareja_ganadora,pareja_perdedora,resultado_string\n"
+)
+
+
+def _row(date, pair1, pair2, sets, winner=None):
+    scores = [str(score) for games in sets for score in games] + [""] * (6 - 2 * len(sets))
+    names = {1: "_".join(pair1), 2: "_".join(pair2)}
+    return ",".join(
+        ["Open Test", date[-4:], date, date, "Central", "Masculino", "Final", "Cuadro", *pair1, *pair2, *scores,
+         names.get(winner, ""), names.get(3 - winner, "") if winner else "", "-"]
+    ) + "\n"
+
+
+@pytest.fixture
+def published_dataset(test_client, tmp_path, monkeypatch):
+    """A published dataset with two match files stored in a temporary local store."""
+    from app import db
+    from app.modules.auth.models import User
+    from app.modules.dataset.models import DataSet, DSMetaData, TournamentType
+    from app.modules.hubfile.models import Hubfile
+    from core.storage import storage_key
+
+    storage = LocalStorage(str(tmp_path / "store"))
+    monkeypatch.setitem(test_client.application.extensions, "storage", storage)
+    # Unique names per test: the database is shared by the module's tests
+    ana, bea, carla, dana = (f"{name} {tmp_path.name}" for name in ("Ana", "Bea", "Carla", "Dana"))
+    files = {
+        "first.csv": HEADER
+        + _row("01.02.2024", (ana, bea), (carla, dana), [(6, 3), (6, 4)], winner=1)
+        + _row("02.02.2024", (carla, dana), (ana, bea), [(6, 3), (3, 6), (7, 5)], winner=1),
+        # No declared winner: decided by the set scores
+        "second.csv": HEADER + _row("10.03.2024", (bea, ana), (dana, carla), [(6, 2), (6, 2)]),
+    }
+
+    with test_client.application.app_context():
+        user = User.query.filter_by(email="players_user@example.com").first()
+        if user is None:
+            user = User(email="players_user@example.com", password="test1234")
+            db.session.add(user)
+            db.session.commit()
+        metadata = DSMetaData(title="Players", description="Players", tournament_type=TournamentType.OPEN,
+                              dataset_doi=f"10.1234/players.{tmp_path.name}")
+        db.session.add(metadata)
+        db.session.commit()
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+        for name, content in files.items():
+            path = tmp_path / name
+            path.write_text(content, encoding="utf-8")
+            stored = storage.save(storage_key(user.id, dataset.id, name), str(path))
+            db.session.add(Hubfile(name=name, checksum=stored.checksum, size=stored.size, dataset_id=dataset.id))
+        db.session.commit()
+        return dataset.id, {"Ana": ana, "Bea": bea, "Carla": carla, "Dana": dana}
+
+
+def _ids(test_client, names):
+    from app.modules.players.models import Player
+
+    with test_client.application.app_context():
+        return [Player.query.filter_by(name=name).one().id for name in names]
+
+
+def test_ingestion_builds_head_to_head_and_ratings(test_client, published_dataset):
+    from app.modules.players.services import PlayerIndexService
+
+    dataset_id, names = published_dataset
+    with test_client.application.app_context():
+        assert PlayerIndexService().ingest_dataset(dataset_id) == 3
+        # Files already indexed are not read again
+        assert PlayerIndexService().ingest_dataset(dataset_id) == 0
+
+    ana, bea, carla = _ids(test_client, [names["Ana"], names["Bea"], names["Carla"]])
+    response = test_client.get(f"/players/api/head-to-head?a={ana}&b={carla}")
+    assert response.status_code == 200
+    record = response.get_json()
+    assert (record["matches"], record["wins_a"], record["wins_b"]) == (3, 2, 1)
+    assert record["recent"][0]["played_on"] == "2024-03-10"
+
+    # Partners are not opponents
+    assert test_client.get(f"/players/api/head-to-head?a={ana}&b={bea}").get_json()["matches"] == 0
+
+    stats = test_client.get(f"/players/api/{ana}").get_json()
+    assert (stats["matches"], stats["wins"]) == (3, 2)
+    assert stats["partners"][0]["player"]["name"] == names["Bea"]
+    assert stats["partners"][0]["matches"] == 3
+
+
+def test_elo_ratings_are_zero_sum_and_rank_the_winners(test_client, published_dataset):
+    from app.modules.players.models import INITIAL_RATING, Player
+    from app.modules.players.services import PlayerIndexService
+
+    dataset_id, names = published_dataset
+    with test_client.application.app_context():
+        PlayerIndexService().ingest_dataset(dataset_id)
+        players = Player.query.filter(Player.name.in_(names.values())).all()
+        ratings = {player.name: player.rating for player in players}
+
+        assert sum(ratings.values()) == pytest.approx(4 * INITIAL_RATING)
+        assert ratings[names["Ana"]] == ratings[names["Bea"]] > INITIAL_RATING > ratings[names["Carla"]]
+
+        # Replaying everything in date order gives the same ratings as incremental ingestion
+        PlayerIndexService().rebuild_ratings()
+        assert {p.name: p.rating for p in players} == pytest.approx(ratings)
+
+    ranking = test_client.get("/players/api/ranking?limit=500").get_json()["players"]
+    ranked = [player["name"] for player in ranking]
+    assert ranked.index(names["Ana"]) < ranked.index(names["Carla"])
+
+
+def test_rows_indexed_by_a_concurrent_ingestion_are_not_counted_twice(test_client, published_dataset, monkeypatch):
+    from app.modules.players.models import PadelMatch, Player
+    from app.modules.players.repositories import PadelMatchRepository
+    from app.modules.players.services import MAX_INGEST_ATTEMPTS, PlayerIndexService
+
+    dataset_id, names = published_dataset
+    with test_client.application.app_context():
+        assert PlayerIndexService().ingest_dataset(dataset_id) == 3
+
+        # Every attempt misses the rows of the other ingestion, as if it had not committed yet
+        lookups = []
+        monkeypatch.setattr(PadelMatchRepository, "indexed_hubfile_ids", lambda self, _: lookups.append(1) or set())
+        assert PlayerIndexService().ingest_dataset(dataset_id) == 0
+
+        assert len(lookups) == MAX_INGEST_ATTEMPTS
+        assert PadelMatch.query.filter_by(dataset_id=dataset_id).count() == 3
+        assert Player.query.filter_by(name=names["Ana"]).one().matches == 3
+
+
+def test_player_search_matches_wildcards_literally(test_client):
+    from app import db
+    from app.modules.players.models import Player
+
+    with test_client.application.app_context():
+        db.session.add_all([Player(name="Pe%a Test"), Player(name="Pedro Test")])
+        db.session.commit()
+
+    found = [player["name"] for player in test_client.get("/players/api/search?q=e%").get_json()["players"]]
+    assert found == ["Pe%a Test"]
+
+
+def test_unpublished_datasets_are_not_indexed(test_client, published_dataset):
+    from app import db
+    from app.modules.dataset.models import DataSet
+    from app.modules.players.services import PlayerIndexService
+
+    dataset_id, _ = published_dataset
+    with test_client.application.app_context():
+        db.session.get(DataSet, dataset_id).ds_meta_data.dataset_doi = None
+        db.session.commit()
+        assert PlayerIndexService().ingest_dataset(dataset_id) == 0
+
+
+def test_player_api_rejects_bad_requests(test_client):
+    assert test_client.get("/players/api/head-to-head?a=1").status_code == 400
+    assert test_client.get("/players/api/head-to-head?a=999999&b=999998").status_code == 404
+    assert test_client.get("/players/api/999999").status_code == 404
+    assert test_client.get("/players/api/search?q=a").status_code == 400
@@ -4,13 +4,11 @@ import logging
 
 from app import db
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DSDownloadRecord, DataSet, DSMetaData
+from app.modules.dataset.models import ActivityMetric, DataSet
 from app.modules.profile import profile_bp
 from app.modules.profile.forms import UserProfileForm
 from app.modules.profile.services import UserProfileService
-from app.modules.dataset.services import DataSetService
-from app.modules.dataset.models import DSDownloadRecord, DSViewRecord, DataSet, DSMetaData
-from sqlalchemy import func
+from app.modules.dataset.services import DataSetService, DSActivityRollupService
 
 logger = logging.getLogger(__name__)
 
@@ -72,53 +70,23 @@ def metrics_dashboard():
     - Downloads I made: number of downloads performed by this user.
     - Views of my datasets: number of view records for datasets owned by this user.
     - Synchronizations: number of this user's datasets that have a DOI (considered synchronized).
+    - Trends: daily activity over the last 30 days and totals for the last 24 hours.
     """
     logger.info(f"Loading metrics dashboard for user_id={current_user.id}")
-    
-    # Uploaded datasets
-    uploaded_datasets = db.session.query(func.count(DataSet.id)).filter(DataSet.user_id == current_user.id).scalar()
-    logger.info(f"Uploaded datasets: {uploaded_datasets}")
-
-    # Downloads of datasets owned by the current user (downloads of MY datasets by anyone)
-    downloads_of_my_datasets = (
-        db.session.query(func.count(DSDownloadRecord.id))
-        .join(DataSet, DSDownloadRecord.dataset_id == DataSet.id)
-        .filter(DataSet.user_id == current_user.id)
-        .scalar()
-    )
-    logger.info(f"Downloads of my datasets: {downloads_of_my_datasets}")
-
-    # Downloads made by the current user (datasets I downloaded from anyone)
-    downloads_i_made = (
-        db.session.query(func.count(DSDownloadRecord.id))
-        .filter(DSDownloadRecord.user_id == current_user.id)
-        .scalar()
-    )
-    logger.info(f"Downloads I made: {downloads_i_made}")
 
-    # Views of datasets owned by the current user
-    views = (
-        db.session.query(func.count(DSViewRecord.id))
-        .join(DataSet, DSViewRecord.dataset_id == DataSet.id)
-        .filter(DataSet.user_id == current_user.id)
-        .scalar()
-    )
-    logger.info(f"Views of my datasets: {views}")
-
-    # Synchronizations: datasets with a non-null dataset_doi
-    synchronizations = (
-        db.session.query(func.count(DataSet.id))
-        .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
-        .filter(DataSet.user_id == current_user.id, DSMetaData.dataset_doi.isnot(None))
-        .scalar()
-    )
-    logger.info(f"Synchronizations count: {synchronizations}")
+    # Totals, last-24h activity and daily trends all come from one query over the rollups
+    activity = DSActivityRollupService().get_user_dashboard(current_user.id)
+    totals = activity["totals"]
+    logger.info(f"Metrics dashboard totals: {totals}")
 
     return render_template(
         "profile/metrics_dashboard.html",
-        uploaded_datasets=uploaded_datasets,
-        downloads_of_my_datasets=downloads_of_my_datasets,
-        downloads_i_made=downloads_i_made,
-        views=views,
-        synchronizations=synchronizations,
+        uploaded_datasets=totals[ActivityMetric.UPLOADS],
+        downloads_of_my_datasets=totals[ActivityMetric.DOWNLOADS_RECEIVED],
+        downloads_i_made=totals[ActivityMetric.DOWNLOADS_MADE],
+        views=totals[ActivityMetric.VIEWS_RECEIVED],
+        synchronizations=totals[ActivityMetric.SYNCHRONIZATIONS],
+        last_24h=activity["last_24h"],
+        trend_labels=activity["labels"],
+        trend_series=activity["series"],
     )
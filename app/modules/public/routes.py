@@ -1,31 +1,52 @@
 import logging
 
-from flask import render_template
+from flask import current_app, render_template
+from markupsafe import Markup
 
-from app.modules.dataset.services import DataSetService
+from app.modules.dataset.models import CounterName
+from app.modules.dataset.services import DataSetService, DSCounterService
+from app.modules.dataset.signals import dataset_published
 from app.modules.public import public_bp
+from core.managers.cache_manager import cached_fragment, invalidate_fragments
 
 logger = logging.getLogger(__name__)
 
+HUB_STATS_FRAGMENT = "public:hub_stats"
+LATEST_DATASETS_FRAGMENT = "public:latest_datasets"
+
+
+def render_hub_stats():
+    # Statistics are read from the materialized counters (one query for all of them)
+    counters = DSCounterService().get_global_counters()
+    return render_template(
+        "public/_hub_stats.html",
+        datasets_counter=counters[CounterName.SYNCHRONIZED_DATASETS],
+        total_dataset_downloads=counters[CounterName.DATASET_DOWNLOADS],
+        total_dataset_views=counters[CounterName.DATASET_VIEWS],
+    )
+
+
+def render_latest_datasets():
+    return render_template("public/_latest_datasets.html", datasets=DataSetService().latest_synchronized())
+
+
+@dataset_published.connect
+def invalidate_homepage_fragments(sender, **kwargs):
+    """A newly published dataset changes both the counters and the latest list."""
+    invalidate_fragments(HUB_STATS_FRAGMENT, LATEST_DATASETS_FRAGMENT)
+
 
 @public_bp.route("/")
 def index():
     logger.info("Access index")
-    dataset_service = DataSetService()
-
-    # Statistics: total datasets
-    datasets_counter = dataset_service.count_synchronized_datasets()
-
-    # Statistics: total downloads
-    total_dataset_downloads = dataset_service.total_dataset_downloads()
 
-    # Statistics: total views
-    total_dataset_views = dataset_service.total_dataset_views()
+    # Both fragments are the same for every visitor, so they are served from the fragment cache
+    timeout = current_app.config.get("FRAGMENT_CACHE_TIMEOUT")
+    hub_stats_fragment = cached_fragment(HUB_STATS_FRAGMENT, render_hub_stats, timeout=timeout)
+    latest_datasets_fragment = cached_fragment(LATEST_DATASETS_FRAGMENT, render_latest_datasets, timeout=timeout)
 
     return render_template(
         "public/index.html",
-        datasets=dataset_service.latest_synchronized(),
-        datasets_counter=datasets_counter,
-        total_dataset_downloads=total_dataset_downloads,
-        total_dataset_views=total_dataset_views,
+        hub_stats_fragment=Markup(hub_stats_fragment),
+        latest_datasets_fragment=Markup(latest_datasets_fragment),
     )
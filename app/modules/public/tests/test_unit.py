@@ -0,0 +1,57 @@
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DataSet, DSMetaData, TournamentType
+from app.modules.dataset.services import DataSetService
+from app.modules.public.routes import HUB_STATS_FRAGMENT, LATEST_DATASETS_FRAGMENT
+from core.managers.cache_manager import get_cache
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """Creates an unsynchronized dataset that the tests publish."""
+    with test_client.application.app_context():
+        user = User(email="public_user@example.com", password="test1234")
+        db.session.add(user)
+        db.session.commit()
+
+        metadata = DSMetaData(
+            title="Homepage fragment dataset",
+            description="Published during the test",
+            tournament_type=TournamentType.OPEN,
+            tags="homepage",
+        )
+        db.session.add(metadata)
+        db.session.commit()
+        db.session.add(DataSet(user_id=user.id, ds_meta_data_id=metadata.id))
+        db.session.commit()
+
+    yield test_client
+
+
+def test_index_fragments_are_cached(test_client):
+    get_cache().clear()
+
+    response = test_client.get("/")
+    assert response.status_code == 200
+    assert b"Hub statistics" in response.data
+    assert get_cache().get(HUB_STATS_FRAGMENT) is not None
+    assert get_cache().get(LATEST_DATASETS_FRAGMENT) is not None
+
+    # A cached fragment is served as-is on the next request
+    get_cache().set(HUB_STATS_FRAGMENT, "<p>cached stats</p>")
+    response = test_client.get("/")
+    assert b"cached stats" in response.data
+
+
+def test_publishing_a_dataset_invalidates_fragments(test_client):
+    test_client.get("/")
+    assert b"Homepage fragment dataset" not in test_client.get("/").data
+
+    metadata = DSMetaData.query.filter_by(title="Homepage fragment dataset").first()
+    DataSetService().update_dsmetadata(metadata.id, dataset_doi="10.1234/homepage.1")
+
+    assert get_cache().get(HUB_STATS_FRAGMENT) is None
+    assert get_cache().get(LATEST_DATASETS_FRAGMENT) is None
+    assert b"Homepage fragment dataset" in test_client.get("/").data
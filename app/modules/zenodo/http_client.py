@@ -0,0 +1,154 @@
+"""
+HTTP plumbing shared by every Zenodo call.
+
+One ``requests.Session`` per process keeps connections (and their TLS sessions) alive between
+calls and across threads. Every request gets a connect and a read timeout. Transient failures
+(connection errors, 429 and 5xx answers) are retried with backoff, but only for idempotent
+methods: a POST that may have reached Zenodo is never replayed here, callers decide that.
+File uploads are streamed as multipart bodies read from disk in blocks, never built in memory.
+"""
+import os
+import threading
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+UPLOAD_BLOCK_SIZE = 256 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_timeout() -> Tuple[float, float]:
+    """(connect, read) timeouts in seconds, from ZENODO_CONNECT_TIMEOUT and ZENODO_READ_TIMEOUT."""
+    return (
+        _env_float("ZENODO_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+        _env_float("ZENODO_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+    )
+
+
+def build_session(pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        # Hand the last response back to the caller instead of raising MaxRetryError
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """The process-wide session (ZENODO_POOL_SIZE connections per host, ZENODO_RETRIES retries)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(
+                    pool_size=int(_env_float("ZENODO_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                    retries=int(_env_float("ZENODO_RETRIES", DEFAULT_RETRIES)),
+                )
+    return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+class MultipartFileStream:
+    """A ``multipart/form-data`` body with one file part, read from the open file on demand.
+
+    ``requests`` sends it with a Content-Length (from ``len``) and reads it block by block, so
+    uploading a large file needs no more memory than one block. ``on_progress`` is called with
+    (file bytes sent, file size) after every block of the file.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        file_field: str,
+        filename: str,
+        fileobj,
+        size: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        self.boundary = uuid.uuid4().hex
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        if size is None:
+            size = os.fstat(fileobj.fileno()).st_size
+        self._parts = [_BytesPart(head), fileobj, _BytesPart(tail)]
+        self._length = len(head) + size + len(tail)
+        self._fileobj = fileobj
+        self._size = size
+        self._sent = 0
+        self._on_progress = on_progress
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = UPLOAD_BLOCK_SIZE
+        while self._parts:
+            part = self._parts[0]
+            chunk = part.read(size)
+            if chunk:
+                if part is self._fileobj and self._on_progress is not None:
+                    self._sent += len(chunk)
+                    self._on_progress(self._sent, self._size)
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+
+class _BytesPart:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._offset = 0
+
+    def read(self, size: int) -> bytes:
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return chunk
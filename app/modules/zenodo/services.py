@@ -1,22 +1,28 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
 from dotenv import load_dotenv
 from flask import Response, jsonify
 from flask_login import current_user
 
 from app.modules.dataset.models import DataSet
 from app.modules.hubfile.models import Hubfile
-from app.modules.zenodo.repositories import ZenodoRepository
-from core.configuration.configuration import uploads_folder_name
+from app.modules.zenodo.http_client import MultipartFileStream, get_session, get_timeout
+from core.managers.storage_manager import get_storage
 from core.services.BaseService import BaseService
+from core.storage import storage_key
 from app.modules.dataset.repositories import DSMetaDataRepository
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Files of one deposition uploaded at the same time; keep it at or below ZENODO_POOL_SIZE
+UPLOAD_WORKERS = int(os.getenv("ZENODO_UPLOAD_WORKERS", 4))
+# Depositions asked for per page when listing them all
+LIST_PAGE_SIZE = 100
+
 
 class ZenodoService(BaseService):
 
@@ -63,8 +69,10 @@ class ZenodoService(BaseService):
     def get_zenodo_access_token(self):
         return os.getenv("ZENODO_ACCESS_TOKEN")
 
-    def __init__(self):
-        super().__init__(ZenodoRepository())
+    def __init__(self, session=None):
+        super().__init__(None)  # Depositions live in Zenodo, nothing is stored locally
+        self.session = session or get_session()
+        self.timeout = get_timeout()
         self.ZENODO_ACCESS_TOKEN = self.get_zenodo_access_token()
         self.ZENODO_API_URL = self.get_zenodo_url()
         self.headers = {"Content-Type": "application/json"}
@@ -77,6 +85,23 @@ class ZenodoService(BaseService):
         else:
             self.params = {}
 
+    def _request(self, method: str, url: str, **kwargs):
+        """Send a request through the pooled session with the access token and timeouts."""
+        kwargs.setdefault("params", self.params)
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    @staticmethod
+    def _error_details(response) -> str:
+        try:
+            return str(response.json())
+        except ValueError:
+            return f"{response.status_code} {response.text[:500]}"
+
+    def _post_file(self, url: str, filename: str, fh, on_progress=None):
+        body = MultipartFileStream({"name": filename}, "file", filename, fh, on_progress=on_progress)
+        return self._request("POST", url, data=body, headers={"Content-Type": body.content_type})
+
     def test_connection(self) -> bool:
         """
         Test the connection with Zenodo.
@@ -84,7 +109,7 @@ class ZenodoService(BaseService):
         Returns:
             bool: True if the connection is successful, False otherwise.
         """
-        response = requests.get(self.ZENODO_API_URL, params=self.params, headers=self.headers)
+        response = self._request("GET", self.ZENODO_API_URL, headers=self.headers)
         return response.status_code == 200
 
     def test_full_connection(self) -> Response:
@@ -116,7 +141,7 @@ class ZenodoService(BaseService):
             }
         }
 
-        response = requests.post(self.ZENODO_API_URL, json=data, params=self.params, headers=self.headers)
+        response = self._request("POST", self.ZENODO_API_URL, json=data, headers=self.headers)
 
         if response.status_code != 201:
             return jsonify(
@@ -129,16 +154,14 @@ class ZenodoService(BaseService):
         deposition_id = response.json()["id"]
 
         # Step 2: Upload an empty file to the deposition
-        data = {"name": "test_file.txt"}
-        files = {"file": open(file_path, "rb")}
         publish_url = f"{self.ZENODO_API_URL}/{deposition_id}/files"
-        response = requests.post(publish_url, params=self.params, data=data, files=files)
-        files["file"].close()  # Close the file after uploading
+        try:
+            with open(file_path, "rb") as fh:
+                response = self._post_file(publish_url, "test_file.txt", fh)
+        finally:
+            os.remove(file_path)
 
         logger.info(f"Publish URL: {publish_url}")
-        logger.info(f"Params: {self.params}")
-        logger.info(f"Data: {data}")
-        logger.info(f"Files: {files}")
         logger.info(f"Response Status Code: {response.status_code}")
         logger.info(f"Response Content: {response.content}")
 
@@ -147,24 +170,34 @@ class ZenodoService(BaseService):
             success = False
 
         # Step 3: Delete the deposition
-        response = requests.delete(f"{self.ZENODO_API_URL}/{deposition_id}", params=self.params)
-
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        self._request("DELETE", f"{self.ZENODO_API_URL}/{deposition_id}")
 
         return jsonify({"success": success, "messages": messages})
 
-    def get_all_depositions(self) -> dict:
+    def get_all_depositions(self, q: str = None, status: str = None) -> list:
         """
-        Get all depositions from Zenodo.
+        Get all depositions from Zenodo, following the listing page by page.
+
+        Args:
+            q (str): Optional search query, e.g. ``conceptrecid:123``.
+            status (str): Optional ``draft`` or ``published``.
 
         Returns:
-            dict: The response in JSON format with the depositions.
+            list: The depositions, most recent first.
         """
-        response = requests.get(self.ZENODO_API_URL, params=self.params, headers=self.headers)
-        if response.status_code != 200:
-            raise Exception("Failed to get depositions")
-        return response.json()
+        params = {**self.params, "size": LIST_PAGE_SIZE, "sort": "mostrecent"}
+        params.update({k: v for k, v in {"q": q, "status": status}.items() if v})
+        depositions = []
+        page = 1
+        while True:
+            response = self._request("GET", self.ZENODO_API_URL, params={**params, "page": page}, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception("Failed to get depositions")
+            batch = response.json()
+            depositions.extend(batch)
+            if len(batch) < LIST_PAGE_SIZE:
+                return depositions
+            page += 1
 
     def create_new_deposition(self, dataset: DataSet) -> dict:
         """
@@ -223,9 +256,9 @@ class ZenodoService(BaseService):
 
         data = {"metadata": metadata}
 
-        response = requests.post(self.ZENODO_API_URL, params=self.params, json=data, headers=self.headers)
+        response = self._request("POST", self.ZENODO_API_URL, json=data, headers=self.headers)
         if response.status_code != 201:
-            error_message = f"Failed to create deposition. Error details: {response.json()}"
+            error_message = f"Failed to create deposition. Error details: {self._error_details(response)}"
             raise Exception(error_message)
         return response.json()
 
@@ -241,19 +274,94 @@ class ZenodoService(BaseService):
         Returns:
             dict: The response in JSON format with the details of the uploaded file.
         """
-        filename = file.name
-        data = {"name": filename}
         user_id = current_user.id if user is None else user.id
-        file_path = os.path.join(uploads_folder_name(), f"user_{str(user_id)}", f"dataset_{dataset.id}/", filename)
-        files = {"file": open(file_path, "rb")}
+        return self._upload(deposition_id, storage_key(user_id, dataset.id, file.name), file.name)
 
+    def _upload(self, deposition_id: int, key: str, filename: str, storage=None, on_progress=None) -> dict:
         publish_url = f"{self.ZENODO_API_URL}/{deposition_id}/files"
-        response = requests.post(publish_url, params=self.params, data=data, files=files)
+        with (storage or get_storage()).open(key) as fh:
+            response = self._post_file(publish_url, filename, fh, on_progress=on_progress)
         if response.status_code != 201:
-            error_message = f"Failed to upload files. Error details: {response.json()}"
+            error_message = f"Failed to upload files. Error details: {self._error_details(response)}"
             raise Exception(error_message)
         return response.json()
 
+    def get_deposition_files(self, deposition_id: int) -> list:
+        """
+        Get the files already uploaded to a deposition in Zenodo.
+
+        Args:
+            deposition_id (int): The ID of the deposition in Zenodo.
+
+        Returns:
+            list: The files of the deposition, each with its ``id``, ``filename`` and ``checksum``.
+        """
+        response = self._request("GET", f"{self.ZENODO_API_URL}/{deposition_id}/files", headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get deposition files. Error details: {self._error_details(response)}")
+        return response.json()
+
+    def delete_deposition_file(self, deposition_id: int, file_id: str):
+        response = self._request("DELETE", f"{self.ZENODO_API_URL}/{deposition_id}/files/{file_id}")
+        if response.status_code not in (204, 404):
+            raise Exception(f"Failed to delete deposition file. Error details: {self._error_details(response)}")
+
+    def upload_files(self, dataset: DataSet, deposition_id: int, files=None, progress=None, max_workers=None) -> dict:
+        """
+        Upload the files of a dataset to a deposition in Zenodo, several at a time.
+
+        Files the deposition already holds with the same checksum are skipped, so calling this
+        again after a partial failure only sends what is missing. A file with the same name but a
+        different checksum is replaced.
+
+        Args:
+            dataset (DataSet): The dataset whose files are uploaded.
+            deposition_id (int): The ID of the deposition in Zenodo.
+            files (list[Hubfile]): The files to upload, all files of the dataset by default.
+            progress (callable): Called as ``progress(filename, bytes_sent, total_bytes)`` from the
+                upload threads.
+            max_workers (int): Uploads running at the same time, ``UPLOAD_WORKERS`` by default.
+
+        Returns:
+            dict: The names of the ``uploaded`` and ``skipped`` files, and the ``failed`` ones with
+            their error.
+        """
+        files = dataset.files() if files is None else files
+        # Plain values only: the upload threads have no app context and must not touch the ORM
+        storage = get_storage()
+        pending = [(f.name, f.checksum, storage_key(dataset.user_id, dataset.id, f.name)) for f in files]
+        report = {"uploaded": [], "skipped": [], "failed": {}}
+
+        remote = {f.get("filename"): f for f in self.get_deposition_files(deposition_id)}
+        to_upload = []
+        for name, checksum, key in pending:
+            existing = remote.get(name)
+            if existing is not None:
+                if (existing.get("checksum") or "").removeprefix("md5:") == checksum:
+                    report["skipped"].append(name)
+                    continue
+                self.delete_deposition_file(deposition_id, existing["id"])
+            to_upload.append((name, key))
+        if not to_upload:
+            return report
+
+        def upload(name, key):
+            on_progress = (lambda sent, total: progress(name, sent, total)) if progress else None
+            return self._upload(deposition_id, key, name, storage=storage, on_progress=on_progress)
+
+        workers = min(max_workers or UPLOAD_WORKERS, len(to_upload))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(upload, name, key): name for name, key in to_upload}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    report["uploaded"].append(name)
+                except Exception as exc:
+                    logger.warning(f"Upload of {name} to deposition {deposition_id} failed: {exc}")
+                    report["failed"][name] = str(exc)
+        return report
+
     def publish_deposition(self, deposition_id: int) -> dict:
         """
         Publish a deposition in Zenodo.
@@ -265,7 +373,7 @@ class ZenodoService(BaseService):
             dict: The response in JSON format with the details of the published deposition.
         """
         publish_url = f"{self.ZENODO_API_URL}/{deposition_id}/actions/publish"
-        response = requests.post(publish_url, params=self.params, headers=self.headers)
+        response = self._request("POST", publish_url, headers=self.headers)
         if response.status_code != 202:
             raise Exception("Failed to publish deposition")
         return response.json()
@@ -281,7 +389,7 @@ class ZenodoService(BaseService):
             dict: The response in JSON format with the details of the deposition.
         """
         deposition_url = f"{self.ZENODO_API_URL}/{deposition_id}"
-        response = requests.get(deposition_url, params=self.params, headers=self.headers)
+        response = self._request("GET", deposition_url, headers=self.headers)
         if response.status_code != 200:
             raise Exception("Failed to get deposition")
         return response.json()
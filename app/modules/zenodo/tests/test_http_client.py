@@ -0,0 +1,181 @@
+import hashlib
+import io
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask import Flask
+from werkzeug.serving import make_server
+
+from app.modules.zenodo.http_client import MultipartFileStream, build_session
+from app.modules.fakenodo.routes import fakenodo_module
+from app.modules.zenodo import services as zenodo_services
+from app.modules.zenodo.services import ZenodoService
+from core.storage import LocalStorage, storage_key
+
+
+class FlakyZenodoHandler(BaseHTTPRequestHandler):
+    """A deposition files API that keeps uploads in memory, can answer 503 to deposition GETs
+    (``server.flaky`` times) and 500 to the upload of the files in ``server.broken``."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.server.calls.append(("GET", self.path))
+        if self.path.endswith("/files"):
+            files = [
+                {"id": name, "filename": name, "checksum": hashlib.md5(data).hexdigest()}
+                for name, data in self.server.uploads.items()
+            ]
+            self._reply(200, files)
+        elif self.server.flaky:
+            self.server.flaky -= 1
+            self._reply(503, {"message": "try again"})
+        else:
+            self._reply(200, {"id": 7, "doi": "10.5072/zenodo.7"})
+
+    def do_DELETE(self):
+        self.server.calls.append(("DELETE", self.path))
+        self.server.uploads.pop(self.path.rsplit("/", 1)[-1], None)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        self.server.calls.append(("POST", self.path))
+        self.server.ports.add(self.client_address[1])
+        length = int(self.headers["Content-Length"])
+        head = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        message = BytesParser(policy=HTTP).parsebytes(head + self.rfile.read(length))
+        parts = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        name = parts["name"].get_content()
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.upload_delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        if name in self.server.broken:
+            self.server.broken.discard(name)
+            self._reply(500, {"message": "disk full"})
+            return
+        self.server.uploads[name] = parts["file"].get_payload(decode=True)
+        self._reply(201, {"filename": name})
+
+
+@pytest.fixture
+def zenodo_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyZenodoHandler)
+    server.calls, server.uploads, server.ports = [], {}, set()
+    server.flaky, server.broken, server.upload_delay = 0, set(), 0
+    server.lock, server.in_flight, server.max_in_flight = threading.Lock(), 0, 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _service(server):
+    service = ZenodoService(session=build_session(pool_size=2, retries=2))
+    service.ZENODO_API_URL = f"http://127.0.0.1:{server.server_port}/api/deposit/depositions"
+    service.params = {}
+    return service
+
+
+def test_idempotent_calls_are_retried(zenodo_server):
+    zenodo_server.flaky = 1
+    assert _service(zenodo_server).get_doi(7) == "10.5072/zenodo.7"
+    assert zenodo_server.calls == [("GET", "/api/deposit/depositions/7")] * 2
+
+
+def test_uploads_are_streamed_over_one_connection(zenodo_server, tmp_path):
+    service = _service(zenodo_server)
+    url = f"{service.ZENODO_API_URL}/7/files"
+    for i in range(3):
+        path = tmp_path / f"round{i}.csv"
+        path.write_bytes(b"a,b\n" * 100_000 + str(i).encode())
+        with open(path, "rb") as fh:
+            assert service._post_file(url, path.name, fh).status_code == 201
+
+    assert zenodo_server.uploads["round2.csv"] == b"a,b\n" * 100_000 + b"2"
+    # Keep-alive: every upload reused the same pooled connection
+    assert len(zenodo_server.ports) == 1
+
+
+def test_multipart_stream_length_matches_body():
+    body = MultipartFileStream({"name": "x.csv"}, "file", "x.csv", io.BytesIO(b"12345"), size=5)
+    data = b"".join(iter(lambda: body.read(7), b""))
+    assert len(data) == len(body)
+    assert data.endswith(f"\r\n--{body.boundary}--\r\n".encode())
+
+
+def test_upload_files_in_parallel_and_resume(zenodo_server, tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(zenodo_services, "get_storage", lambda: storage)
+    hubfiles = []
+    for i in range(4):
+        src = tmp_path / f"match{i}.csv"
+        src.write_bytes(b"x" * (1000 * (i + 1)))
+        stored = storage.save(storage_key(2, 3, src.name), str(src))
+        hubfiles.append(SimpleNamespace(name=src.name, checksum=stored.checksum, size=stored.size))
+    dataset = SimpleNamespace(id=3, user_id=2, files=lambda: hubfiles)
+
+    service = _service(zenodo_server)
+    zenodo_server.upload_delay = 0.2
+    zenodo_server.broken = {"match3.csv"}
+    progress = {}
+    report = service.upload_files(dataset, 7, progress=lambda name, sent, total: progress.update({name: (sent, total)}))
+
+    assert sorted(report["uploaded"]) == ["match0.csv", "match1.csv", "match2.csv"]
+    assert list(report["failed"]) == ["match3.csv"]
+    assert zenodo_server.max_in_flight > 1
+    assert progress["match1.csv"] == (2000, 2000)
+
+    # A retry only sends what is missing or changed
+    zenodo_server.uploads["match0.csv"] = b"truncated"
+    report = service.upload_files(dataset, 7)
+    assert sorted(report["uploaded"]) == ["match0.csv", "match3.csv"]
+    assert sorted(report["skipped"]) == ["match1.csv", "match2.csv"]
+    assert report["failed"] == {}
+    assert zenodo_server.uploads["match0.csv"] == b"x" * 1000
+    assert ("DELETE", "/api/deposit/depositions/7/files/match0.csv") in zenodo_server.calls
+
+
+def test_get_all_depositions_follows_the_pages():
+    app = Flask(__name__)
+    app.config["FAKENODO_STORE"] = "memory"
+    app.register_blueprint(fakenodo_module)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        service = ZenodoService(session=build_session())
+        service.ZENODO_API_URL = f"http://127.0.0.1:{server.server_port}/fakenodo/api/deposit/depositions"
+        service.params = {}
+        for i in range(230):
+            service._request("POST", service.ZENODO_API_URL, json={"metadata": {"title": f"D{i}"}})
+
+        depositions = service.get_all_depositions()
+        assert len(depositions) == 230
+        assert depositions[0]["metadata"]["title"] == "D229"
+        titles = [d["metadata"]["title"] for d in service.get_all_depositions(q="D22")]
+        assert titles == [f"D{i}" for i in range(229, 219, -1)] + ["D22"]
+    finally:
+        server.shutdown()
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Optional dependency: cachelib (shared Redis cache across workers). Fall back to a per-process cache.
+try:  # pragma: no cover - optional in minimal envs
+    from cachelib import RedisCache, SimpleCache  # type: ignore
+except Exception:  # pragma: no cover
+    RedisCache = None
+
+    class SimpleCache:  # type: ignore
+        """Minimal thread-safe TTL cache with the subset of the cachelib API used here."""
+
+        def __init__(self, default_timeout=300, **_):
+            self.default_timeout = default_timeout
+            self._items = {}
+            self._lock = threading.Lock()
+
+        def get(self, key):
+            with self._lock:
+                item = self._items.get(key)
+                if item is None:
+                    return None
+                expires, value = item
+                if expires and expires < time.time():
+                    del self._items[key]
+                    return None
+                return value
+
+        def set(self, key, value, timeout=None):
+            timeout = self.default_timeout if timeout is None else timeout
+            with self._lock:
+                self._items[key] = (time.time() + timeout if timeout else 0, value)
+            return True
+
+        def delete_many(self, *keys):
+            with self._lock:
+                for key in keys:
+                    self._items.pop(key, None)
+            return list(keys)
+
+        def clear(self):
+            with self._lock:
+                self._items.clear()
+            return True
+
+
+EXTENSION_KEY = "fragment_cache"
+
+
+class CacheManager:
+    """Sets up the fragment cache used for expensive, user-independent page fragments.
+
+    Uses Redis when REDIS_URL is configured (shared by every gunicorn worker), otherwise
+    an in-process cache. Each worker then holds its own copy, bounded by the fragment TTL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def init_cache(self):
+        redis_url = os.getenv("REDIS_URL")
+        default_timeout = self.app.config.get("FRAGMENT_CACHE_TIMEOUT", 30)
+
+        cache = None
+        if redis_url and RedisCache is not None:
+            try:
+                import redis  # type: ignore
+
+                cache = RedisCache(
+                    host=redis.Redis.from_url(redis_url),
+                    default_timeout=default_timeout,
+                    key_prefix="padelhub:fragment:",
+                )
+            except Exception as exc:
+                logger.warning(f"Redis fragment cache unavailable, using in-process cache: {exc}")
+
+        if cache is None:
+            cache = SimpleCache(default_timeout=default_timeout)
+
+        self.app.extensions[EXTENSION_KEY] = cache
+        return cache
+
+
+def get_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def cached_fragment(key, render, timeout=None):
+    """Return the cached fragment for `key`, rendering and storing it on a miss."""
+    cache = get_cache()
+    if cache is None:
+        return render()
+
+    try:
+        fragment = cache.get(key)
+    except Exception as exc:
+        logger.warning(f"Fragment cache read failed for {key}: {exc}")
+        fragment = None
+    if fragment is not None:
+        return fragment
+
+    fragment = render()
+    try:
+        cache.set(key, fragment, timeout=timeout)
+    except Exception as exc:
+        logger.warning(f"Fragment cache write failed for {key}: {exc}")
+    return fragment
+
+
+def invalidate_fragments(*keys):
+    cache = get_cache()
+    if cache is None or not keys:
+        return
+    try:
+        cache.delete_many(*keys)
+    except Exception as exc:
+        logger.warning(f"Fragment cache invalidation failed for {keys}: {exc}")
@@ -39,6 +39,32 @@ class Config:
     TIMEZONE = "Europe/Madrid"
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = "uploads"
+    # Seconds a shared page fragment (e.g. homepage stats) may be served from cache
+    FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", "30"))
+    # Seconds the /file/view row-offset index and dialect of a file (keyed by checksum) stay cached
+    FILE_PREVIEW_CACHE_TIMEOUT = int(os.getenv("FILE_PREVIEW_CACHE_TIMEOUT", "3600"))
+    # How /file/download sends bytes: "app" streams them from the worker, "x-accel" hands the
+    # transfer to nginx through X-Accel-Redirect (see the internal locations in docker/nginx)
+    FILE_SENDFILE_MODE = os.getenv("FILE_SENDFILE_MODE", "app")
+    X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "/_protected")
+    # Where dataset files are stored: "local" (content-addressed, under WORKING_DIR/uploads) or "s3"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    S3_BUCKET = os.getenv("S3_BUCKET")
+    S3_PREFIX = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+    # Threads for background pipeline stages (padel metrics, ...); TASKS_EAGER=1 runs them inline
+    TASK_WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+    TASKS_EAGER = os.getenv("TASKS_EAGER", "0") == "1"
+    # Seconds between sweeps for publication jobs left by a stopped process (0 disables them); only
+    # the process holding the lock file sweeps
+    PUBLICATION_SWEEP_SECONDS = int(os.getenv("PUBLICATION_SWEEP_SECONDS", "300"))
+    PUBLICATION_SWEEP_LOCK = os.getenv("PUBLICATION_SWEEP_LOCK", "publication_sweeper.lock")
+    # Fakenodo depositions: "sqlite" (a file shared by every worker, kept across restarts) or "memory"
+    FAKENODO_STORE = os.getenv("FAKENODO_STORE", "sqlite")
+    FAKENODO_DB_PATH = os.getenv("FAKENODO_DB_PATH", "fakenodo.sqlite3")
+    # Latency/error/429 profiles per fakenodo endpoint, as JSON or a JSON file (see fakenodo/faults.py)
+    FAKENODO_FAULTS = os.getenv("FAKENODO_FAULTS")
+    FAKENODO_FAULT_HEADERS = os.getenv("FAKENODO_FAULT_HEADERS", "0") == "1"
 
 
 class DevelopmentConfig(Config):
@@ -60,6 +86,9 @@ class TestingConfig(Config):
         }
     }
     WTF_CSRF_ENABLED = False
+    TASKS_EAGER = True
+    PUBLICATION_SWEEP_SECONDS = 0
+    FAKENODO_STORE = "memory"
 
 
 class ProductionConfig(Config):
@@ -0,0 +1,50 @@
+import logging
+import os
+
+from flask import current_app, has_app_context
+
+from core.storage import LocalStorage, S3Storage
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "storage"
+
+
+def create_storage(config=None):
+    """Build the backend selected by STORAGE_BACKEND ("local" by default, or "s3")."""
+    config = config or {}
+
+    def setting(name, default=None):
+        return config.get(name) or os.getenv(name, default)
+
+    backend = (setting("STORAGE_BACKEND", "local") or "local").lower()
+    if backend == "s3":
+        return S3Storage(
+            bucket=setting("S3_BUCKET"),
+            prefix=setting("S3_PREFIX", ""),
+            endpoint_url=setting("S3_ENDPOINT_URL"),
+            cache_dir=setting("S3_CACHE_DIR"),
+            cache_max_bytes=int(setting("S3_CACHE_MAX_BYTES", 0)) or None,
+        )
+    if backend != "local":
+        logger.warning(f"Unknown STORAGE_BACKEND '{backend}', using local storage")
+    return LocalStorage(setting("STORAGE_ROOT"))
+
+
+class StorageManager:
+    """Sets up the backend every reader and writer of uploaded dataset files goes through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def init_storage(self):
+        storage = create_storage(self.app.config)
+        self.app.extensions[EXTENSION_KEY] = storage
+        return storage
+
+
+def get_storage():
+    if has_app_context() and EXTENSION_KEY in current_app.extensions:
+        return current_app.extensions[EXTENSION_KEY]
+    # Scripts running outside the app
+    return create_storage()
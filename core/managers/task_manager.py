@@ -0,0 +1,152 @@
+import fcntl
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "tasks"
+
+
+class TaskRunner:
+    """Runs pipeline stages (metrics, sidecars, ...) off the request thread.
+
+    Each task gets its own application context, and therefore its own database session.
+    With eager=True tasks run inline, which keeps tests and one-off scripts deterministic.
+    """
+
+    def __init__(self, app, max_workers=2, eager=False):
+        self.app = app
+        self.eager = eager
+        self._executor = None if eager else ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="padelhub-task"
+        )
+        self._stopped = threading.Event()
+        self._locks = {}
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(self._run(func, *args, **kwargs))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        return self._executor.submit(self._run, func, *args, **kwargs)
+
+    def submit_later(self, delay: float, func, *args, **kwargs):
+        """Submit ``func`` after ``delay`` seconds (right away when eager).
+
+        The timer lives in this process only: work that must survive a restart has to be
+        recorded by the caller (e.g. a job row) and picked up again.
+        """
+        if self._executor is None or delay <= 0:
+            return self.submit(func, *args, **kwargs)
+        timer = threading.Timer(delay, self.submit, args=(func,) + args, kwargs=kwargs)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def schedule_every(self, interval: float, func, *args, lock_path: Optional[str] = None, **kwargs):
+        """Submit ``func`` now and then every ``interval`` seconds until shutdown.
+
+        With ``lock_path`` only the process holding an exclusive lock on that file submits it, so
+        every worker can schedule the same task and exactly one of them runs it. The lock goes away
+        with the process that held it, and the next tick of another process takes over.
+        When eager, ``func`` runs once, inline.
+        """
+        self._tick(func, args, kwargs, lock_path)
+        if self._executor is None:
+            return None
+
+        def loop():
+            while not self._stopped.wait(interval):
+                self._tick(func, args, kwargs, lock_path)
+
+        thread = threading.Thread(target=loop, name="padelhub-schedule", daemon=True)
+        thread.start()
+        return thread
+
+    def _tick(self, func, args, kwargs, lock_path) -> bool:
+        if lock_path and not self._hold_lock(lock_path):
+            return False
+        try:
+            self.submit(func, *args, **kwargs)
+        except RuntimeError:
+            # The executor was shut down between two ticks
+            return False
+        return True
+
+    def _hold_lock(self, lock_path: str) -> bool:
+        if lock_path in self._locks:
+            return True
+        lock = open(lock_path, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._locks[lock_path] = lock
+        return True
+
+    def _run(self, func, *args, **kwargs):
+        with self.app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                logger.exception(f"Background task {getattr(func, '__qualname__', func)} failed")
+                raise
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        for lock in self._locks.values():
+            lock.close()
+        self._locks.clear()
+
+
+class TaskManager:
+    """Sets up the in-process task runner used for background pipeline stages."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def init_tasks(self):
+        runner = TaskRunner(
+            self.app,
+            max_workers=self.app.config.get("TASK_WORKERS", 2),
+            eager=self.app.config.get("TASKS_EAGER", False),
+        )
+        self.app.extensions[EXTENSION_KEY] = runner
+        return runner
+
+
+def get_task_runner():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def submit_task(func, *args, **kwargs) -> Future:
+    """Run `func` in the background (inline when there is no task runner)."""
+    runner = get_task_runner()
+    if runner is None:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    return runner.submit(func, *args, **kwargs)
+
+
+def submit_task_later(delay: float, func, *args, **kwargs):
+    """Run `func` in the background after `delay` seconds (inline and at once without a task runner)."""
+    runner = get_task_runner()
+    if runner is None:
+        return submit_task(func, *args, **kwargs)
+    return runner.submit_later(delay, func, *args, **kwargs)
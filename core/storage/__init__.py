@@ -0,0 +1,5 @@
+from core.storage.base import StorageBackend, StoredFile, hash_file, storage_key
+from core.storage.local import LocalStorage
+from core.storage.s3 import S3Storage
+
+__all__ = ["StorageBackend", "StoredFile", "LocalStorage", "S3Storage", "hash_file", "storage_key"]
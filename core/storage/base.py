@@ -0,0 +1,65 @@
+import hashlib
+from typing import NamedTuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class StoredFile(NamedTuple):
+    key: str
+    # MD5 hex digest, the value stored in Hubfile.checksum
+    checksum: str
+    size: int
+    # SHA-256 hex digest, used to address deduplicated blobs
+    digest: str
+
+
+def storage_key(user_id, dataset_id, filename: str) -> str:
+    """Logical key of a dataset file, e.g. ``user_1/dataset_2/matches.csv``."""
+    return f"user_{user_id}/dataset_{dataset_id}/{filename}"
+
+
+def hash_file(path: str):
+    """Stream a file once and return ``(md5, sha256, size)``."""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            md5.update(chunk)
+            sha256.update(chunk)
+            size += len(chunk)
+    return md5.hexdigest(), sha256.hexdigest(), size
+
+
+class StorageBackend:
+    """Where uploaded dataset files live, addressed by logical keys (see ``storage_key``).
+
+    Stored files are immutable: saving to an existing key replaces the file instead of
+    modifying it in place.
+    """
+
+    name = None
+
+    def save(self, key: str, src_path: str, move: bool = True, hashes=None) -> StoredFile:
+        """Store the local file at ``src_path`` under ``key``; with ``move`` the source is consumed.
+
+        ``hashes`` is the file's ``hash_file`` result when the caller already has it (e.g. from
+        upload time), so the file is not read again.
+        """
+        raise NotImplementedError
+
+    def get_local_path(self, key: str) -> str:
+        """Path of a readable local copy of ``key`` (fetched first by remote backends)."""
+        raise NotImplementedError
+
+    def open(self, key: str):
+        return open(self.get_local_path(key), "rb")
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def keys(self, prefix: str = "") -> list[str]:
+        raise NotImplementedError
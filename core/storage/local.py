@@ -0,0 +1,184 @@
+import logging
+import os
+import shutil
+import uuid
+
+from core.configuration.configuration import uploads_folder_name
+from core.storage.base import StorageBackend, StoredFile, hash_file
+
+logger = logging.getLogger(__name__)
+
+
+def _move(src: str, dest: str):
+    """Atomic rename when both paths share a filesystem, copy and delete otherwise."""
+    try:
+        os.replace(src, dest)
+    except OSError:
+        shutil.move(src, dest)
+
+
+class LocalStorage(StorageBackend):
+    """Content-addressed store on the local filesystem.
+
+    Every distinct content is kept once under ``<root>/.blobs/<sha256>``. The logical path
+    ``<root>/<key>`` is a hardlink to that blob, so identical CSVs uploaded to several datasets
+    share their bytes. The blob's link count is its reference count: it is removed when the
+    last key pointing to it is deleted. Because the logical paths are real files, nginx and any
+    code reading ``<root>/<key>`` keep working unchanged.
+
+    If the filesystem refuses hardlinks the key gets a plain copy (no dedupe for that file).
+    ``.blobs/inodes/<inode>`` records the digest of each blob, so deleting a key finds its blob
+    without reading the file again.
+    """
+
+    name = "local"
+    BLOBS_DIR = ".blobs"
+    INODES_DIR = "inodes"
+
+    def __init__(self, root: str = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        # Resolved on every call so WORKING_DIR changes (tests, CLI) are honoured
+        if self._root:
+            return self._root
+        return os.path.join(os.getenv("WORKING_DIR", os.getcwd()), uploads_folder_name())
+
+    def _path(self, key: str) -> str:
+        root = os.path.abspath(self.root)
+        path = os.path.abspath(os.path.join(root, *key.split("/")))
+        if not path.startswith(root + os.sep) or os.path.relpath(path, root).startswith(self.BLOBS_DIR):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, self.BLOBS_DIR, digest[:2], digest[2:4], digest)
+
+    def _inode_path(self, inode: int) -> str:
+        return os.path.join(self.root, self.BLOBS_DIR, self.INODES_DIR, str(inode))
+
+    def _index_blob(self, blob: str, digest: str):
+        path = self._inode_path(os.stat(blob).st_ino)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(digest)
+        os.replace(tmp, path)
+
+    def _blob_digest(self, path: str) -> str:
+        """Digest of the blob ``path`` links to, from the inode index; hashed for blobs saved before it."""
+        try:
+            with open(self._inode_path(os.stat(path).st_ino), "r", encoding="ascii") as f:
+                digest = f.read().strip()
+            # Inode numbers are reused, so the entry only counts if it still names this very file
+            if os.path.samefile(self._blob_path(digest), path):
+                return digest
+        except OSError:
+            pass
+        return hash_file(path)[1]
+
+    def save(self, key: str, src_path: str, move: bool = True, hashes=None) -> StoredFile:
+        checksum, digest, size = hashes or hash_file(src_path)
+        dest = self._path(key)
+        blob = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            self.delete(key)
+
+        # The source is only dropped once the key is linked: a concurrent delete of the blob's last
+        # key can remove the blob at any moment, and then it is stored again from the source
+        try:
+            self._link(blob, dest)
+        except FileNotFoundError:
+            # Write next to the blob and rename, so concurrent readers never see a partial blob
+            tmp = f"{blob}.{uuid.uuid4().hex}.tmp"
+            if move:
+                _move(src_path, tmp)
+            else:
+                shutil.copyfile(src_path, tmp)
+            # Linked before it becomes the blob, so a delete never finds it unreferenced
+            self._link(tmp, dest)
+            os.replace(tmp, blob)
+            self._index_blob(blob, digest)
+        else:
+            if move:
+                os.remove(src_path)
+
+        return StoredFile(key, checksum, size, digest)
+
+    @staticmethod
+    def _link(blob: str, dest: str):
+        """Hardlink ``dest`` to ``blob``; raises FileNotFoundError when the blob does not exist."""
+        try:
+            os.link(blob, dest)
+        except FileNotFoundError:
+            raise
+        except OSError as exc:
+            logger.warning(f"Hardlinks unavailable for {dest}, storing a copy: {exc}")
+            shutil.copyfile(blob, dest)
+
+    def get_local_path(self, key: str) -> str:
+        return self._path(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return
+        # Two links left (this key and the blob): this key is the last reference
+        last_reference = os.stat(path).st_nlink == 2
+        digest = self._blob_digest(path) if last_reference else None
+        os.remove(path)
+        if digest:
+            blob = self._blob_path(digest)
+            if os.path.exists(blob) and os.stat(blob).st_nlink == 1:
+                self._remove_blob(blob)
+
+    def _remove_blob(self, blob: str):
+        inode_path = self._inode_path(os.stat(blob).st_ino)
+        os.remove(blob)
+        if os.path.exists(inode_path):
+            os.remove(inode_path)
+
+    def keys(self, prefix: str = "") -> list[str]:
+        keys = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != self.BLOBS_DIR]
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def dedupe(self, prefix: str = "user_") -> int:
+        """Move files written before this backend existed into the blob store. Returns bytes reclaimed."""
+        reclaimed = 0
+        for key in self.keys(prefix):
+            path = self._path(key)
+            if os.stat(path).st_nlink > 1:
+                continue
+            digest = hash_file(path)[1]
+            already_stored = os.path.exists(self._blob_path(digest))
+            size = os.path.getsize(path)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            os.replace(path, tmp)
+            self.save(key, tmp, move=True)
+            if already_stored:
+                reclaimed += size
+        return reclaimed
+
+    def collect_garbage(self) -> int:
+        """Remove blobs no key links to any more (e.g. keys deleted with plain ``os.remove``)."""
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, self.BLOBS_DIR)):
+            dirnames[:] = [d for d in dirnames if d != self.INODES_DIR]
+            for filename in filenames:
+                blob = os.path.join(dirpath, filename)
+                if os.stat(blob).st_nlink == 1:
+                    self._remove_blob(blob)
+                    removed += 1
+        return removed
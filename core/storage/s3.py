@@ -0,0 +1,175 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+from core.storage.base import StorageBackend, StoredFile, hash_file
+
+logger = logging.getLogger(__name__)
+
+# Optional dependency: boto3 (only needed when STORAGE_BACKEND=s3)
+try:  # pragma: no cover - optional in minimal envs
+    import boto3  # type: ignore
+except Exception:  # pragma: no cover
+    boto3 = None
+
+
+class S3Storage(StorageBackend):
+    """Stores files in an S3-compatible bucket (AWS S3, MinIO, Ceph...), one object per key.
+
+    Readers that need a real file (CSV parsing, exports, send_file) get a copy materialized in
+    ``cache_dir``. Cached copies are named after the content (the object's sha256 metadata, or
+    its ETag), looked up with a HEAD of the key on every read, so a key saved again from another
+    node is never served stale. The least recently used copies are evicted once the cache grows
+    over ``cache_max_bytes``.
+    Any client exposing the boto3 methods used here can be injected, e.g. a local stand-in.
+    """
+
+    name = "s3"
+    DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        endpoint_url: str = None,
+        cache_dir: str = None,
+        cache_max_bytes: int = None,
+    ):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "padelhub-s3-cache")
+        self.cache_max_bytes = cache_max_bytes or self.DEFAULT_CACHE_MAX_BYTES
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _cache_root(self) -> str:
+        return os.path.join(self.cache_dir, self.bucket)
+
+    def _cache_path(self, version: str) -> str:
+        return os.path.join(self._cache_root(), version[:2], version)
+
+    @staticmethod
+    def _version(head) -> str:
+        """Name of the cached copy of an object: its content digest, or its ETag when it has none."""
+        digest = head.get("Metadata", {}).get("sha256")
+        if digest:
+            return digest
+        return "etag-" + str(head.get("ETag", "")).strip('"').replace("/", "_")
+
+    def _head(self, key: str):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception:
+            return None
+
+    def save(self, key: str, src_path: str, move: bool = True, hashes=None) -> StoredFile:
+        checksum, digest, size = hashes or hash_file(src_path)
+
+        head = self._head(key)
+        if not head or head.get("Metadata", {}).get("sha256") != digest:
+            self.client.upload_file(
+                src_path,
+                self.bucket,
+                self._object_key(key),
+                ExtraArgs={"Metadata": {"md5": checksum, "sha256": digest}},
+            )
+
+        # Keep the uploaded bytes as the local copy so the writer node does not download them again
+        cache_path = self._cache_path(digest)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        if os.path.exists(cache_path):
+            os.utime(cache_path)
+            if move:
+                os.remove(src_path)
+        else:
+            tmp = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+            if move:
+                shutil.move(src_path, tmp)
+            else:
+                shutil.copyfile(src_path, tmp)
+            os.replace(tmp, cache_path)
+            self._evict(keep=cache_path)
+
+        return StoredFile(key, checksum, size, digest)
+
+    def get_local_path(self, key: str) -> str:
+        head = self._head(key)
+        if head is None:
+            # Same contract as a missing local file: a path that does not exist
+            return os.path.join(self._cache_root(), "missing", *self._object_key(key).split("/"))
+
+        cache_path = self._cache_path(self._version(head))
+        if os.path.exists(cache_path):
+            # Mark it as recently used for eviction
+            os.utime(cache_path)
+            return cache_path
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.client.download_file(self.bucket, self._object_key(key), tmp)
+            os.replace(tmp, cache_path)
+        except Exception as exc:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            logger.warning(f"Could not fetch {key} from bucket {self.bucket}: {exc}")
+            return cache_path
+        self._evict(keep=cache_path)
+        return cache_path
+
+    def _evict(self, keep: str = None):
+        """Remove the least recently used cached copies until the cache fits in ``cache_max_bytes``."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self._cache_root()):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def delete(self, key: str):
+        # The cached copy may be shared with other keys of the same content; eviction reclaims it
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def keys(self, prefix: str = "") -> list[str]:
+        keys = []
+        token = None
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        while True:
+            kwargs = {"Bucket": self.bucket, "Prefix": self._object_key(prefix)}
+            if token:
+                kwargs["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**kwargs)
+            keys.extend(item["Key"][strip:] for item in page.get("Contents", []))
+            if not page.get("IsTruncated"):
+                break
+            token = page.get("NextContinuationToken")
+        return sorted(keys)
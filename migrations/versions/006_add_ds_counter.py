@@ -0,0 +1,60 @@
+"""add ds_counter table with materialized view/download counters
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'ds_counter' not in inspector.get_table_names():
+        op.create_table('ds_counter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('scope_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name', 'scope_id', name='uq_ds_counter_name_scope')
+        )
+
+    # Backfill from the existing record tables (scope_id 0 = hub-wide)
+    op.execute("DELETE FROM ds_counter")
+    for name, table in (('dataset_downloads', 'ds_download_record'), ('dataset_views', 'ds_view_record')):
+        op.execute(f"""
+            INSERT INTO ds_counter (name, scope_id, value)
+            SELECT '{name}', 0, COUNT(*) FROM {table}
+        """)
+        op.execute(f"""
+            INSERT INTO ds_counter (name, scope_id, value)
+            SELECT '{name}', dataset_id, COUNT(*) FROM {table}
+            WHERE dataset_id IS NOT NULL
+            GROUP BY dataset_id
+        """)
+    for name, table in (('hubfile_downloads', 'file_download_record'), ('hubfile_views', 'file_view_record')):
+        op.execute(f"""
+            INSERT INTO ds_counter (name, scope_id, value)
+            SELECT '{name}', 0, COUNT(*) FROM {table}
+        """)
+    op.execute("""
+        INSERT INTO ds_counter (name, scope_id, value)
+        SELECT 'synchronized_datasets', 0, COUNT(*)
+        FROM data_set JOIN ds_meta_data ON data_set.ds_meta_data_id = ds_meta_data.id
+        WHERE ds_meta_data.dataset_doi IS NOT NULL
+    """)
+
+
+def downgrade():
+    op.drop_table('ds_counter')
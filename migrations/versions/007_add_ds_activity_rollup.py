@@ -0,0 +1,75 @@
+"""add ds_activity_rollup table with hourly/daily activity buckets
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+# bucket expressions per granularity (MariaDB/MySQL)
+BUCKETS = {
+    'hour': "DATE_ADD(DATE({col}), INTERVAL HOUR({col}) HOUR)",
+    'day': "CAST(DATE({col}) AS DATETIME)",
+}
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'ds_activity_rollup' not in inspector.get_table_names():
+        op.create_table('ds_activity_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('metric', sa.String(length=32), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('metric', 'granularity', 'bucket_start', 'user_id', 'dataset_id',
+                            name='uq_ds_activity_rollup_bucket')
+        )
+        op.create_index('ix_ds_activity_rollup_user_bucket', 'ds_activity_rollup',
+                        ['user_id', 'granularity', 'bucket_start'])
+        op.create_index('ix_ds_activity_rollup_dataset_bucket', 'ds_activity_rollup',
+                        ['dataset_id', 'granularity', 'bucket_start'])
+
+    # Backfill every bucket from the existing rows: (metric, source, date column, user expression)
+    sources = [
+        ('views_received', 'ds_view_record r JOIN data_set d ON r.dataset_id = d.id', 'r.view_date', 'd.user_id'),
+        ('downloads_received', 'ds_download_record r JOIN data_set d ON r.dataset_id = d.id', 'r.download_date',
+         'd.user_id'),
+        ('downloads_made', 'ds_download_record r JOIN data_set d ON r.dataset_id = d.id', 'r.download_date',
+         'r.user_id'),
+        ('uploads', 'data_set d', 'd.created_at', 'd.user_id'),
+        ('synchronizations', 'data_set d JOIN ds_meta_data m ON d.ds_meta_data_id = m.id '
+         'AND m.dataset_doi IS NOT NULL', 'd.created_at', 'd.user_id'),
+    ]
+    op.execute("DELETE FROM ds_activity_rollup")
+    for metric, source, date_column, user_column in sources:
+        for granularity, bucket in BUCKETS.items():
+            bucket_expr = bucket.format(col=date_column)
+            op.execute(f"""
+                INSERT INTO ds_activity_rollup (metric, granularity, bucket_start, user_id, dataset_id, value)
+                SELECT '{metric}', '{granularity}', {bucket_expr}, {user_column}, d.id, COUNT(*)
+                FROM {source}
+                WHERE {user_column} IS NOT NULL
+                GROUP BY {bucket_expr}, {user_column}, d.id
+            """)
+
+
+def downgrade():
+    op.drop_index('ix_ds_activity_rollup_dataset_bucket', table_name='ds_activity_rollup')
+    op.drop_index('ix_ds_activity_rollup_user_bucket', table_name='ds_activity_rollup')
+    op.drop_table('ds_activity_rollup')
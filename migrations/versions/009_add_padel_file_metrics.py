@@ -0,0 +1,74 @@
+"""add padel_file_metrics per-file summaries (and padel_dataset_metrics where missing)
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+
+    # The model existed before any migration created its table
+    if 'padel_dataset_metrics' not in tables:
+        op.create_table('padel_dataset_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=False),
+        sa.Column('total_matches', sa.Integer(), nullable=True),
+        sa.Column('total_tournaments', sa.Integer(), nullable=True),
+        sa.Column('unique_players', sa.Integer(), nullable=True),
+        sa.Column('date_range_start', sa.Date(), nullable=True),
+        sa.Column('date_range_end', sa.Date(), nullable=True),
+        sa.Column('categories', sa.String(length=200), nullable=True),
+        sa.Column('tournament_names', sa.Text(), nullable=True),
+        sa.Column('has_set3_matches', sa.Boolean(), nullable=True),
+        sa.Column('avg_sets_per_match', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dataset_id')
+        )
+
+    if 'padel_file_metrics' not in tables:
+        op.create_table('padel_file_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hubfile_id', sa.Integer(), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=False),
+        sa.Column('checksum', sa.String(length=120), nullable=False),
+        sa.Column('total_matches', sa.Integer(), nullable=False),
+        sa.Column('total_sets', sa.Integer(), nullable=False),
+        sa.Column('has_set3_matches', sa.Boolean(), nullable=False),
+        sa.Column('date_range_start', sa.Date(), nullable=True),
+        sa.Column('date_range_end', sa.Date(), nullable=True),
+        sa.Column('tournament_names', sa.Text(), nullable=True),
+        sa.Column('categories', sa.Text(), nullable=True),
+        sa.Column('player_names', sa.Text(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['hubfile_id'], ['file.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hubfile_id')
+        )
+        op.create_index('ix_padel_file_metrics_dataset_id', 'padel_file_metrics', ['dataset_id'])
+
+
+def downgrade():
+    op.drop_index('ix_padel_file_metrics_dataset_id', table_name='padel_file_metrics')
+    op.drop_table('padel_file_metrics')
+
+    # Revision 008 has no padel_dataset_metrics, whether upgrade() created it or found it there;
+    # its rows are derived data that scripts/rebuild_padel_metrics.py recomputes
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'padel_dataset_metrics' in tables:
+        op.drop_table('padel_dataset_metrics')
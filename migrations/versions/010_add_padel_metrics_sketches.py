@@ -0,0 +1,44 @@
+"""store players as HyperLogLog sketches in padel metrics summaries
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    dataset_columns = [col['name'] for col in inspector.get_columns('padel_dataset_metrics')]
+    if 'total_sets' not in dataset_columns:
+        op.add_column('padel_dataset_metrics', sa.Column('total_sets', sa.Integer(), nullable=True))
+    if 'players_sketch' not in dataset_columns:
+        op.add_column('padel_dataset_metrics', sa.Column('players_sketch', sa.LargeBinary(), nullable=True))
+
+    file_columns = [col['name'] for col in inspector.get_columns('padel_file_metrics')]
+    if 'players_sketch' not in file_columns:
+        op.add_column('padel_file_metrics', sa.Column('players_sketch', sa.LargeBinary(), nullable=True))
+
+    if 'player_names' in file_columns:
+        # The name lists are not turned into sketches here, so this migration does not depend on
+        # the app's sketch code: rows left without a sketch are recomputed from their CSV by the
+        # next refresh (scripts/rebuild_padel_metrics.py does them all)
+        op.drop_column('padel_file_metrics', 'player_names')
+
+
+def downgrade():
+    op.add_column('padel_file_metrics', sa.Column('player_names', sa.Text(), nullable=True))
+    op.drop_column('padel_file_metrics', 'players_sketch')
+    op.drop_column('padel_dataset_metrics', 'players_sketch')
+    op.drop_column('padel_dataset_metrics', 'total_sets')
@@ -0,0 +1,48 @@
+"""add padel_catalog_aggregate and per-file/dataset match breakdowns
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+
+Existing metrics have no breakdown yet: run scripts/rebuild_padel_metrics.py afterwards to
+fill them and the aggregate.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    for table in ('padel_dataset_metrics', 'padel_file_metrics'):
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'breakdown' not in columns:
+            op.add_column(table, sa.Column('breakdown', sa.Text(), nullable=True))
+
+    if 'padel_catalog_aggregate' not in inspector.get_table_names():
+        op.create_table('padel_catalog_aggregate',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.Column('datasets', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dimension', 'key', name='uq_padel_catalog_aggregate_key')
+        )
+        op.create_index('ix_padel_catalog_aggregate_dimension_value', 'padel_catalog_aggregate',
+                        ['dimension', 'value'])
+
+
+def downgrade():
+    op.drop_index('ix_padel_catalog_aggregate_dimension_value', table_name='padel_catalog_aggregate')
+    op.drop_table('padel_catalog_aggregate')
+    op.drop_column('padel_file_metrics', 'breakdown')
+    op.drop_column('padel_dataset_metrics', 'breakdown')
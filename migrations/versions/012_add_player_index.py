@@ -0,0 +1,80 @@
+"""add player, player_pair and padel_match tables for the player index
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+
+    if 'player' not in tables:
+        op.create_table('player',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('matches', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+        op.create_index('ix_player_rating', 'player', ['rating'])
+
+    if 'player_pair' not in tables:
+        op.create_table('player_pair',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('player1_id', sa.Integer(), nullable=False),
+        sa.Column('player2_id', sa.Integer(), nullable=False),
+        sa.Column('matches', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['player1_id'], ['player.id'], ),
+        sa.ForeignKeyConstraint(['player2_id'], ['player.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('player1_id', 'player2_id', name='uq_player_pair_players')
+        )
+        op.create_index('ix_player_pair_player2', 'player_pair', ['player2_id'])
+
+    if 'padel_match' not in tables:
+        op.create_table('padel_match',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hubfile_id', sa.Integer(), nullable=False),
+        sa.Column('row_number', sa.Integer(), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=False),
+        sa.Column('tournament', sa.String(length=255), nullable=True),
+        sa.Column('category', sa.String(length=32), nullable=True),
+        sa.Column('phase', sa.String(length=64), nullable=True),
+        sa.Column('played_on', sa.Date(), nullable=True),
+        sa.Column('pair1_id', sa.Integer(), nullable=False),
+        sa.Column('pair2_id', sa.Integer(), nullable=False),
+        sa.Column('winner_pair_id', sa.Integer(), nullable=True),
+        sa.Column('result', sa.String(length=64), nullable=True),
+        sa.ForeignKeyConstraint(['hubfile_id'], ['file.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['pair1_id'], ['player_pair.id'], ),
+        sa.ForeignKeyConstraint(['pair2_id'], ['player_pair.id'], ),
+        sa.ForeignKeyConstraint(['winner_pair_id'], ['player_pair.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hubfile_id', 'row_number', name='uq_padel_match_hubfile_row')
+        )
+        op.create_index('ix_padel_match_dataset_id', 'padel_match', ['dataset_id'])
+        op.create_index('ix_padel_match_pairs', 'padel_match', ['pair1_id', 'pair2_id'])
+        op.create_index('ix_padel_match_pair2', 'padel_match', ['pair2_id'])
+
+
+def downgrade():
+    op.drop_table('padel_match')
+    op.drop_table('player_pair')
+    op.drop_table('player')
@@ -0,0 +1,64 @@
+"""add api_token and dataset_idempotency_key for the dataset creation API
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+
+    if 'api_token' not in tables:
+        op.create_table('api_token',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('prefix', sa.String(length=16), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token_hash')
+        )
+        op.create_index('ix_api_token_user_id', 'api_token', ['user_id'])
+
+    if 'dataset_idempotency_key' not in tables:
+        op.create_table('dataset_idempotency_key',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'key', name='uq_dataset_idempotency_key_user_key')
+        )
+        op.create_index(
+            'ix_dataset_idempotency_key_created_at', 'dataset_idempotency_key', ['created_at']
+        )
+
+
+def downgrade():
+    op.drop_index('ix_dataset_idempotency_key_created_at', table_name='dataset_idempotency_key')
+    op.drop_table('dataset_idempotency_key')
+    op.drop_index('ix_api_token_user_id', table_name='api_token')
+    op.drop_table('api_token')
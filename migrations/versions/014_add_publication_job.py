@@ -0,0 +1,44 @@
+"""add publication_job for background Zenodo publication with retries
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'publication_job' not in inspector.get_table_names():
+        op.create_table('publication_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dataset_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dataset_id')
+        )
+        op.create_index(
+            'ix_publication_job_status_next_attempt', 'publication_job', ['status', 'next_attempt_at']
+        )
+
+
+def downgrade():
+    op.drop_index('ix_publication_job_status_next_attempt', table_name='publication_job')
+    op.drop_table('publication_job')
@@ -0,0 +1,43 @@
+"""count only published datasets in the padel catalog aggregate, keep its players sketch
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+
+The aggregate built before this revision also counts drafts: run
+scripts/rebuild_padel_metrics.py afterwards to rebuild it from the published datasets.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    metrics_columns = [col['name'] for col in inspector.get_columns('padel_dataset_metrics')]
+    if 'in_catalog' not in metrics_columns:
+        op.add_column('padel_dataset_metrics',
+                      sa.Column('in_catalog', sa.Boolean(), nullable=False, server_default=sa.false()))
+        # Published datasets are the ones with a DOI
+        connection.execute(sa.text(
+            "UPDATE padel_dataset_metrics SET in_catalog = :published WHERE dataset_id IN ("
+            "SELECT data_set.id FROM data_set JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id "
+            "WHERE ds_meta_data.dataset_doi IS NOT NULL)"
+        ), {"published": True})
+
+    aggregate_columns = [col['name'] for col in inspector.get_columns('padel_catalog_aggregate')]
+    if 'sketch' not in aggregate_columns:
+        op.add_column('padel_catalog_aggregate', sa.Column('sketch', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('padel_catalog_aggregate', 'sketch')
+    op.drop_column('padel_dataset_metrics', 'in_catalog')
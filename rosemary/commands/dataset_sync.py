@@ -0,0 +1,52 @@
+import click
+from flask.cli import with_appcontext
+
+from app.modules.auth.models import User
+from app.modules.dataset.models import PublicationJob
+from app.modules.dataset.services_publication import SYNC_WORKERS, DataSetPublicationService
+
+STATUS_COLORS = {PublicationJob.PUBLISHED: "green", PublicationJob.FAILED: "red"}
+
+
+@click.command("dataset:sync", help="Publishes the unsynchronized datasets of a user, or of the whole hub.")
+@click.option("--user", "email", help="Email of the user whose datasets are synced.")
+@click.option("--all", "all_users", is_flag=True, help="Sync the unsynchronized datasets of every user.")
+@click.option("--include-anonymous", is_flag=True, help="Also publish anonymous datasets, revealing their authors.")
+@click.option("--workers", default=SYNC_WORKERS, show_default=True, help="Datasets published at the same time.")
+@with_appcontext
+def dataset_sync(email, all_users, include_anonymous, workers):
+    if bool(email) == all_users:
+        raise click.UsageError("Pass either --user EMAIL or --all.")
+
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            click.echo(click.style(f"No user with email {email}.", fg="red"))
+            return
+        user_id = user.id
+
+    report = DataSetPublicationService().sync_all(
+        user_id, include_anonymous=include_anonymous, wait=True, workers=max(1, workers)
+    )
+    if not report["connected"]:
+        click.echo(click.style("Zenodo is not reachable, nothing was synced.", fg="red"))
+        return
+
+    for dataset_id, job in sorted(report["datasets"].items()):
+        line = f"Dataset {dataset_id}: {job['status']}"
+        if job.get("last_error"):
+            line += f" ({job['last_error']})"
+        click.echo(click.style(line, fg=STATUS_COLORS.get(job["status"], "yellow")))
+    for dataset_id, reason in sorted(report["skipped"].items()):
+        click.echo(f"Dataset {dataset_id}: skipped, {reason}")
+
+    statuses = [job["status"] for job in report["datasets"].values()]
+    published = statuses.count(PublicationJob.PUBLISHED)
+    failed = statuses.count(PublicationJob.FAILED)
+    # Pending ones failed an attempt and retry later (scripts/resume_publication_jobs.py)
+    pending = len(statuses) - published - failed
+    click.echo(
+        f"{len(statuses)} synced: {published} published, {failed} failed, {pending} pending; "
+        f"{len(report['skipped'])} skipped."
+    )
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark padel dataset metrics on a synthetic match file.
+
+Compares the previous implementation (whole file in memory, DictReader, strptime per row)
+with the columnar engine reading the CSV in Arrow blocks and reading the typed sidecar.
+
+Run from the project root: python3 scripts/benchmark_padel_metrics.py --rows 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+sys.path.insert(0, os.getcwd())
+
+HEADER = [
+    "nombre_torneo", "anio_torneo", "fecha_inicio_torneo", "fecha_final_torneo", "pista_principal", "categoria",
+    "fase", "ronda", "pareja1_jugador1", "pareja1_jugador2", "pareja2_jugador1", "pareja2_jugador2",
+    "set1_pareja1", "set1_pareja2", "set2_pareja1", "set2_pareja2", "set3_pareja1", "set3_pareja2",
+    "pareja_ganadora", "pareja_perdedora", "resultado_string",
+]
+
+
+def generate(path, rows):
+    random.seed(7)
+    players = [f"Player {i}" for i in range(4000)]
+    tournaments = [(f"Open {i}", date(2015, 1, 1) + timedelta(days=7 * i)) for i in range(500)]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for _ in range(rows):
+            name, start = random.choice(tournaments)
+            p = random.sample(players, 4)
+            third = random.random() < 0.3
+            sets = [6, 4, 4, 6, 6, 3] if third else [6, 4, 6, 2, "", ""]
+            writer.writerow(
+                [name, start.year, start.strftime("%d.%m.%Y"), (start + timedelta(days=6)).strftime("%d.%m.%Y"),
+                 "Court", random.choice(["Masculino", "Femenino", "Mixto"]), "Final", "Cuadro", *p, *sets,
+                 f"{p[0]}_{p[1]}", f"{p[2]}_{p[3]}", "6-4 / 6-2"]
+            )
+
+
+def previous_implementation(path):
+    """The row loop PadelMetricsService used before the columnar engine."""
+    metrics = {"total_matches": 0, "tournaments": set(), "players": set(), "categories": set(), "dates": [],
+               "has_set3": False, "total_sets": 0}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        content = f.read()
+    for row in csv.DictReader(StringIO(content)):
+        metrics["total_matches"] += 1
+        if row.get("nombre_torneo"):
+            metrics["tournaments"].add(row["nombre_torneo"])
+        for field in ["pareja1_jugador1", "pareja1_jugador2", "pareja2_jugador1", "pareja2_jugador2"]:
+            if row.get(field):
+                metrics["players"].add(row[field])
+        if row.get("categoria"):
+            metrics["categories"].add(row["categoria"])
+        if row.get("fecha_inicio_torneo"):
+            try:
+                metrics["dates"].append(datetime.strptime(row["fecha_inicio_torneo"], "%d.%m.%Y"))
+            except ValueError:
+                pass
+        if row.get("set3_pareja1") or row.get("set3_pareja2"):
+            metrics["has_set3"] = True
+            metrics["total_sets"] += 3
+        else:
+            metrics["total_sets"] += 2
+    return metrics
+
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<44} {time.perf_counter() - started:8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    from app.modules.dataset.services_columnar import ColumnarSidecarService
+    from app.modules.dataset.services_padel import PadelMetricsService
+    from app.modules.dataset.sketches import HyperLogLog
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "matches.csv")
+        timed(f"generate {args.rows:,} matches", generate, path, args.rows)
+        print(f"{'file size':<44} {os.path.getsize(path) / 1024 ** 2:8.1f}MB\n")
+
+        before = timed("previous row loop", previous_implementation, path)
+        streamed = timed("columnar engine, CSV in Arrow blocks", PadelMetricsService.calculate_metrics_from_csv, path)
+
+        os.environ["STORAGE_ROOT"] = os.path.join(tmp, "storage")
+        timed("build typed sidecar (once per upload)", ColumnarSidecarService().build, "bench", path)
+        sidecar = timed(
+            "columnar engine, memory-mapped sidecar", PadelMetricsService.calculate_metrics_from_csv, path, "bench"
+        )
+
+        for result in (streamed, sidecar):
+            assert result["total_matches"] == before["total_matches"]
+            assert result["total_sets"] == before["total_sets"]
+            assert result["players"] == HyperLogLog().update(before["players"])
+            assert result["tournaments"] == before["tournaments"]
+            assert result["date_min"] == min(before["dates"]).date()
+            assert result["date_max"] == max(before["dates"]).date()
+        print("\nAll engines agree on every metric.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Move dataset files written before the content-addressed store into it, so identical
+CSVs share one blob, then drop blobs no file points to any more.
+
+Run from the project root: python3 scripts/dedupe_uploads.py
+(uses WORKING_DIR and UPLOADS_DIR like the app; STORAGE_BACKEND must be "local")
+"""
+import os
+import sys
+
+sys.path.insert(0, os.getcwd())
+
+from core.managers.storage_manager import create_storage  # noqa: E402
+
+storage = create_storage()
+if storage.name != "local":
+    sys.exit(f"Deduplication only applies to local storage (STORAGE_BACKEND={storage.name})")
+
+reclaimed = storage.dedupe()
+removed = storage.collect_garbage()
+print(f"Deduplicated {storage.root}: {reclaimed / (1024 ** 2):.1f} MB reclaimed, {removed} orphan blobs removed")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Recompute the padel metrics of every dataset (only files whose summaries are missing or
+outdated are read) and rebuild the catalog analytics aggregate from them. Files without a
+columnar sidecar of the current version get one first. Run it once after the migrations
+that add metric columns, and after a sidecar version change.
+
+Run from the project root: python3 scripts/rebuild_padel_metrics.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.getcwd())
+
+from app import create_app  # noqa: E402
+from app.modules.dataset.models import DataSet  # noqa: E402
+from app.modules.dataset.services_columnar import ColumnarSidecarService  # noqa: E402
+from app.modules.dataset.services_padel import PadelCatalogService, PadelMetricsService  # noqa: E402
+from app.modules.hubfile.services import HubfileService  # noqa: E402
+
+app = create_app()
+with app.app_context():
+    datasets = DataSet.query.all()
+    for dataset in datasets:
+        for hubfile, path in HubfileService().get_paths_by_dataset(dataset):
+            if os.path.exists(path):
+                ColumnarSidecarService().build(hubfile.checksum, path)
+        PadelMetricsService.create_or_update_metrics(dataset)
+    PadelCatalogService().rebuild()
+    print(f"Padel metrics up to date for {len(datasets)} datasets; catalog aggregate rebuilt")
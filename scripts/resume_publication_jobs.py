@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Restart dataset publication jobs that are due (their retry timer was lost with a restarted
+process) or stuck in "publishing" (their worker died). The app already does this from one
+process every PUBLICATION_SWEEP_SECONDS; run this to do it right away (e.g. after a deploy, before
+any request arrives) or when the sweeper is disabled.
+
+Run from the project root: python3 scripts/resume_publication_jobs.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.getcwd())
+
+from app import create_app  # noqa: E402
+from app.modules.dataset.services_publication import DataSetPublicationService  # noqa: E402
+from core.managers.task_manager import get_task_runner  # noqa: E402
+
+app = create_app()
+with app.app_context():
+    resumed = DataSetPublicationService().resume()
+    runner = get_task_runner()
+    if runner is not None:
+        # Wait for this batch; retries scheduled later are picked up by the next run
+        runner.shutdown(wait=True)
+    print(f"Resumed {resumed} publication jobs")